@@ -0,0 +1,152 @@
+"""
+acl.py — Access-control lists (excluded users, superusers, approvers)
+=====================================================================
+Usage:
+    from acl import acl
+    acl.refresh()                      # cheap change check; reloads only what changed
+    acl.is_excluded("John Doe")        # O(1), case-insensitive
+    acl.is_superuser(email)            # exact email match
+    acl.is_approver(email)
+    acl.excluded_users()               # list for the analytics helpers
+    acl.version("excluded")            # bumps only when membership changes
+    acl.subscribe(lambda name, members: ...)
+
+The three SharePoint lists live on /sites/Test. refresh() asks Graph for
+the eTag / lastModifiedDateTime of all three lists in a single $batch call
+and only re-reads a list whose signature moved. Subscribers are notified
+only when a list's membership actually changes, not on every reload.
+
+A failed load keeps the last known membership instead of emptying it.
+"""
+
+import threading
+
+from graph_batch import execute_batch
+from logger import log
+from sharepoint_items import get_access_token, iter_list_items
+from sp_resolver import sp_ids
+
+SITE_DOMAIN = "hamdaz1.sharepoint.com"
+SITE_PATH = "/sites/Test"
+
+# name -> (SharePoint list, column holding the member)
+ACL_LISTS = {
+    "excluded": ("excludeusers", "Usernames"),
+    "superusers": ("superusers", "mail"),
+    "approvers": ("approvers", "mail"),
+}
+
+
+class AccessControl:
+    def __init__(self, lists=ACL_LISTS):
+        self.lists = lists
+        self._lock = threading.Lock()
+        self._members = {name: () for name in lists}         # original values, list order
+        self._sets = {name: frozenset() for name in lists}   # lowercase, stripped
+        self._signatures = {}
+        self._versions = {name: 0 for name in lists}
+        self._subscribers = []
+
+    # ----------------------------
+    # Loading
+    # ----------------------------
+    def _list_signatures(self, access_token, site_id, list_ids):
+        """One $batch round trip for the metadata of every ACL list."""
+        names = list(list_ids)
+        results = execute_batch(
+            [{"method": "GET", "url": f"/sites/{site_id}/lists/{list_ids[n]}?$select=id,eTag,lastModifiedDateTime"}
+             for n in names],
+            access_token=access_token,
+        )
+        signatures = {}
+        for name, r in zip(names, results):
+            if r["status"] == 404:
+                sp_ids.invalidate(site_id, list_ids[name])
+            if r["status"] == 200 and r["body"]:
+                signatures[name] = (r["body"].get("eTag"), r["body"].get("lastModifiedDateTime"))
+        return signatures
+
+    def _load_members(self, access_token, site_id, list_id, column):
+        members = []
+        for item in iter_list_items(access_token, site_id, list_id, fields=[column]):
+            value = item.get("fields", {}).get(column)
+            if value:
+                members.append(str(value).strip())
+        return tuple(members)
+
+    def refresh(self, force=False):
+        """Reloads the lists whose signature changed (all of them with force=True). Returns changed names."""
+        changed = []
+        with self._lock:
+            try:
+                access_token = get_access_token()
+                site_id = sp_ids.site_id(access_token, SITE_DOMAIN, SITE_PATH)
+                list_ids = {name: sp_ids.list_id(access_token, site_id, list_name)
+                            for name, (list_name, _) in self.lists.items()}
+                signatures = {} if force else self._list_signatures(access_token, site_id, list_ids)
+            except Exception as e:
+                log.error("ACL change check failed — keeping current lists", tag="ACL", exc=e)
+                return changed
+
+            for name, (list_name, column) in self.lists.items():
+                signature = signatures.get(name)
+                if signature is not None and signature == self._signatures.get(name):
+                    continue
+                try:
+                    members = self._load_members(access_token, site_id, list_ids[name], column)
+                except Exception as e:
+                    log.error(f"Failed to load {list_name} — keeping current members", tag="ACL", exc=e)
+                    continue
+                if signature is not None:
+                    self._signatures[name] = signature
+
+                normalized = frozenset(m.lower() for m in members)
+                if normalized != self._sets[name]:
+                    self._members[name] = members
+                    self._sets[name] = normalized
+                    self._versions[name] += 1
+                    changed.append(name)
+                    log.info(f"ACL '{name}' changed: {len(members)} member(s).", tag="ACL")
+
+        for name in changed:
+            self._publish(name)
+        return changed
+
+    # ----------------------------
+    # Change events
+    # ----------------------------
+    def subscribe(self, callback):
+        """callback(name, members) runs after a list's membership changes."""
+        self._subscribers.append(callback)
+
+    def _publish(self, name):
+        members = self._members[name]
+        for callback in list(self._subscribers):
+            try:
+                callback(name, members)
+            except Exception as e:
+                log.error(f"ACL subscriber failed for '{name}'", tag="ACL", exc=e)
+
+    # ----------------------------
+    # Checks
+    # ----------------------------
+    def version(self, name):
+        return self._versions[name]
+
+    def members(self, name):
+        return list(self._members[name])
+
+    def excluded_users(self):
+        return self.members("excluded")
+
+    def is_excluded(self, username):
+        return bool(username) and str(username).strip().lower() in self._sets["excluded"]
+
+    def is_superuser(self, email):
+        return bool(email) and email.strip().lower() in self._sets["superusers"]
+
+    def is_approver(self, email):
+        return bool(email) and email.strip().lower() in self._sets["approvers"]
+
+
+acl = AccessControl()
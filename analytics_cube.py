@@ -0,0 +1,259 @@
+"""
+analytics_cube.py — Proposals counts pre-aggregated by user × year × month
+=========================================================================
+Usage:
+    from analytics_cube import analytics_cube
+    proposals.subscribe(analytics_cube.on_snapshot)    # keep it in step with the snapshot
+
+    period = {"type": "month", "year": 2025, "month": 6}   # or "year" / None for all
+    analytics_cube.overall(period, excluded_users)      # same shape as compute_overall_analytics
+    analytics_cube.per_user(period, excluded_users)     # same shape as compute_user_analytics_with_last_date
+
+Every proposal contributes to exactly one cell, keyed by (AssignedTo, year,
+month of Created in Asia/Dubai). A cell keeps the total, submitted and
+received counts, the BCDs of its open (not submitted) proposals, and the
+Start Dates of its proposals. BCD and Start Date are kept sorted. Pending
+vs missed depends on the current time, so it is answered at query time
+with a bisect over the open BCDs. Delta changes move one item's
+contribution out of its old cell and into its new one, so a refresh
+touches only the proposals that changed. A period query is a rollup over
+at most users × months cells.
+"""
+
+import threading
+from bisect import bisect_left, insort
+
+import pandas as pd
+import pytz
+
+from sharepoint_items import exclusion_mask, normalize_assignees
+
+UAE_TZ = pytz.timezone("Asia/Dubai")
+
+
+def _start_value(item):
+    # Same column detection as compute_user_analytics_with_last_date (case/space tolerant)
+    key = next((k for k in item if k.lower().replace(" ", "") == "startdate"), None)
+    return item.get(key) if key else None
+
+
+def _to_ns(series):
+    """UTC nanoseconds per row, None where the date is missing or unparseable."""
+    parsed = pd.to_datetime(series, errors="coerce", utc=True)
+    return [None if pd.isna(v) else v.value for v in parsed]
+
+
+class _Cell:
+    __slots__ = ("total", "submitted", "received", "open_bcds", "starts")
+
+    def __init__(self):
+        self.total = 0
+        self.submitted = 0
+        self.received = 0
+        self.open_bcds = []     # sorted UTC ns of not-submitted proposals
+        self.starts = []        # sorted UTC ns of Start Dates
+
+
+class AnalyticsCube:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells = {}            # (user, year, month) -> _Cell
+        self._contrib = {}          # item id -> (key, submitted, received, open_bcd, start)
+        self.version = 0
+
+    # ----------------------------
+    # Maintenance
+    # ----------------------------
+    @staticmethod
+    def _contributions(items):
+        """[(item id, contribution)] with dates parsed in one vectorized pass."""
+        if not items:
+            return []
+        frame = pd.DataFrame({
+            "user": [t.get("AssignedTo") for t in items],
+            "created": [t.get("Created") for t in items],
+            "bcd": [t.get("BCD") for t in items],
+            "start": [_start_value(t) for t in items],
+        })
+        created = pd.to_datetime(frame["created"], errors="coerce", utc=True).dt.tz_convert(UAE_TZ)
+        users = normalize_assignees(frame["user"]).tolist()     # same keys as the ingest frame
+        years = [None if pd.isna(y) else int(y) for y in created.dt.year]
+        months = [None if pd.isna(m) else int(m) for m in created.dt.month]
+        bcds = _to_ns(frame["bcd"])
+        starts = _to_ns(frame["start"])
+
+        out = []
+        for i, t in enumerate(items):
+            submitted = t.get("SubmissionStatus") == "Submitted"
+            out.append((t.get("id"), (
+                (users[i], years[i], months[i]),
+                submitted,
+                t.get("Status") == "Received",
+                None if submitted else bcds[i],
+                starts[i],
+            )))
+        return out
+
+    def _add(self, contribution):
+        key, submitted, received, open_bcd, start = contribution
+        cell = self._cells.get(key)
+        if cell is None:
+            cell = self._cells[key] = _Cell()
+        cell.total += 1
+        cell.submitted += submitted
+        cell.received += received
+        if open_bcd is not None:
+            insort(cell.open_bcds, open_bcd)
+        if start is not None:
+            insort(cell.starts, start)
+
+    def _remove(self, contribution):
+        key, submitted, received, open_bcd, start = contribution
+        cell = self._cells.get(key)
+        if cell is None:
+            return
+        cell.total -= 1
+        cell.submitted -= submitted
+        cell.received -= received
+        for values, v in ((cell.open_bcds, open_bcd), (cell.starts, start)):
+            if v is not None:
+                pos = bisect_left(values, v)
+                if pos < len(values) and values[pos] == v:
+                    values.pop(pos)
+        if cell.total <= 0:
+            del self._cells[key]
+
+    def rebuild(self, items):
+        """Recomputes every cell from a full item list."""
+        contributions = self._contributions(list(items))
+        with self._lock:
+            self._cells = {}
+            self._contrib = {}
+            for item_id, c in contributions:
+                self._contrib[item_id] = c
+                self._add(c)
+            self.version += 1
+
+    def apply_delta(self, changed, removed_ids=()):
+        """Moves the contributions of changed / removed items only."""
+        contributions = self._contributions(list(changed))
+        with self._lock:
+            for item_id in removed_ids:
+                old = self._contrib.pop(item_id, None)
+                if old:
+                    self._remove(old)
+            for item_id, c in contributions:
+                old = self._contrib.get(item_id)
+                if old:
+                    self._remove(old)
+                self._contrib[item_id] = c
+                self._add(c)
+            self.version += 1
+
+    def on_snapshot(self, snapshot, changed=None, removed_ids=()):
+        """proposals subscriber: full rebuild on a publish, incremental on a delta."""
+        if changed is None:
+            self.rebuild(snapshot.items)
+        else:
+            self.apply_delta(changed, removed_ids)
+
+    # ----------------------------
+    # Queries
+    # ----------------------------
+    def years(self):
+        """Sorted years (Asia/Dubai) that have at least one proposal."""
+        with self._lock:
+            return sorted({y for _, y, _ in self._cells if y is not None})
+
+    def _selected(self, period, excluded_users, year=None, month=None):
+        """Cells in the period (or the given year/month) whose user is not excluded."""
+        cells = list(self._cells.items())
+        users = pd.Series([key[0] for key, _ in cells], dtype=object)
+        excluded = exclusion_mask(users, excluded_users).tolist() if excluded_users else [False] * len(cells)
+
+        if year is None and period and period.get("type") != "all":
+            year = period["year"]
+            month = period["month"] if period["type"] == "month" else None
+        out = []
+        for ((user, y, m), cell), skip in zip(cells, excluded):
+            if skip:
+                continue
+            if year is not None and (y != year or (month is not None and m != month)):
+                continue
+            out.append((user, cell))
+        return out
+
+    @staticmethod
+    def _open_split(cell, now_ns):
+        """(pending, missed) — open proposals due from now on vs already past due."""
+        missed = bisect_left(cell.open_bcds, now_ns)
+        return len(cell.open_bcds) - missed, missed
+
+    def overall(self, period=None, excluded_users=None):
+        now_ns = pd.Timestamp.now(tz="UTC").value
+        with self._lock:
+            if not self._selected(None, excluded_users):
+                return {"total_users": 0, "total_tasks": 0, "tasks_completed": 0, "tasks_pending": 0,
+                        "tasks_missed": 0, "orders_received": 0, "changes": {}}
+
+            selected = self._selected(period, excluded_users)
+            totals = {"total_tasks": 0, "tasks_completed": 0, "tasks_pending": 0, "tasks_missed": 0, "orders_received": 0}
+            users = set()
+            for user, cell in selected:
+                pending, missed = self._open_split(cell, now_ns)
+                totals["total_tasks"] += cell.total
+                totals["tasks_completed"] += cell.submitted
+                totals["tasks_pending"] += pending
+                totals["tasks_missed"] += missed
+                totals["orders_received"] += cell.received
+                if user is not None:
+                    users.add(user)
+
+            changes = {}
+            if period and period["type"] == "month":
+                last_month, last_year = period["month"] - 1, period["year"]
+                if last_month == 0:
+                    last_month, last_year = 12, last_year - 1
+                previous = self._selected(None, excluded_users, year=last_year, month=last_month)
+                prev_total = sum(c.total for _, c in previous)
+                if prev_total:
+                    prev_completed = sum(c.submitted for _, c in previous)
+                    prev_received = sum(c.received for _, c in previous)
+                    changes = {
+                        "total_tasks_change": ((totals["total_tasks"] - prev_total) / prev_total * 100),
+                        "completed_tasks_change": ((totals["tasks_completed"] - prev_completed) / prev_completed * 100) if prev_completed > 0 else 0,
+                        "orders_received_change": ((totals["orders_received"] - prev_received) / prev_received * 100) if prev_received > 0 else 0,
+                    }
+
+        return {"total_users": len(users), **totals, "changes": changes}
+
+    def per_user(self, period=None, excluded_users=None):
+        now_ns = pd.Timestamp.now(tz="UTC").value
+        rollup = {}
+        with self._lock:
+            for user, cell in self._selected(period, excluded_users):
+                if user is None:
+                    continue
+                pending, missed = self._open_split(cell, now_ns)
+                r = rollup.setdefault(user, {"total_tasks": 0, "tasks_completed": 0, "tasks_pending": 0,
+                                             "tasks_missed": 0, "orders_received": 0, "_last": None})
+                r["total_tasks"] += cell.total
+                r["tasks_completed"] += cell.submitted
+                r["tasks_pending"] += pending
+                r["tasks_missed"] += missed
+                r["orders_received"] += cell.received
+                if cell.starts and (r["_last"] is None or cell.starts[-1] > r["_last"]):
+                    r["_last"] = cell.starts[-1]
+
+        analytics = {}
+        for user in sorted(rollup):
+            r = rollup[user]
+            last = r.pop("_last")
+            r["last_assigned_date"] = (
+                pd.Timestamp(last, tz="UTC").tz_convert(UAE_TZ).strftime("%Y-%m-%d %H:%M") if last is not None else None
+            )
+            analytics[user] = r
+        return analytics
+
+
+analytics_cube = AnalyticsCube()
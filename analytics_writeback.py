@@ -0,0 +1,126 @@
+"""
+analytics_writeback.py — Diff-only, batched write-back of per-user analytics
+===========================================================================
+Usage:
+    from analytics_writeback import analytics_writeback
+    analytics_writeback.flush([
+        {"Username": "JohnDoe", "ActiveTasks": 3, "RecentDate": "...", "Priority": 2},
+        ...
+    ])  # -> {"patched": n, "created": n, "unchanged": n, "failed": n}
+
+Each row is compared field by field against what was last written for that
+user. That state is persisted to .cache/analytics_writeback.json, so a
+restart does not re-send everything. For users with no saved state the
+current SharePoint row is the baseline. Only the fields that differ are
+sent. Updates (PATCH) and new users (POST) go out together through Graph
+$batch, so a tick where nothing changed makes no writes at all.
+"""
+
+import threading
+
+import pandas as pd
+
+from graph_auth import token_manager
+from graph_batch import execute_batch
+from local_store import load_json, save_json
+from logger import log
+from sp_resolver import sp_ids
+from useranalytics_store import useranalytics, SITE_DOMAIN, SITE_PATH, LIST_NAME
+
+STATE_FILE = "analytics_writeback.json"
+
+
+def _same(a, b):
+    """Loose equality for SharePoint round-trips (1 vs 1.0, ISO date formats)."""
+    if a == b:
+        return True
+    if a is None or b is None:
+        return False
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        pass
+    if isinstance(a, str) and isinstance(b, str) and "T" in a and "T" in b:
+        try:
+            return pd.Timestamp(a) == pd.Timestamp(b)
+        except (TypeError, ValueError):
+            return False
+    return str(a) == str(b)
+
+
+class AnalyticsWriteback:
+    def __init__(self, state_file=STATE_FILE):
+        self.state_file = state_file
+        self._lock = threading.Lock()
+        self._written = load_json(state_file, default={}) or {}    # lowercase username -> fields
+
+    @staticmethod
+    def _diff(fields, baseline):
+        return {k: v for k, v in fields.items() if k != "Username" and not _same(v, baseline.get(k))}
+
+    def flush(self, rows):
+        """Writes only what changed since the last successful write. Returns counters."""
+        counts = {"patched": 0, "created": 0, "unchanged": 0, "failed": 0}
+        plan = []      # (lowercase username, item_id or None, payload)
+        dirty = False
+        with self._lock:
+            for fields in rows:
+                username = str(fields.get("Username") or "").strip()
+                if not username:
+                    continue
+                key = username.lower()
+                row = useranalytics.row_for(username)
+                if row is None:
+                    plan.append((key, None, dict(fields)))
+                    continue
+                baseline = self._written.get(key) or row.fields
+                changed = self._diff(fields, baseline)
+                if changed:
+                    plan.append((key, row.item_id, changed))
+                else:
+                    counts["unchanged"] += 1
+                    if key not in self._written:
+                        self._written[key] = dict(fields)
+                        dirty = True
+
+            if not plan:
+                if dirty:
+                    save_json(self.state_file, self._written)
+                return counts
+
+            access_token = token_manager.get_token()
+            site_id, list_id = sp_ids.resolve(access_token, SITE_DOMAIN, SITE_PATH, LIST_NAME)
+            base = f"/sites/{site_id}/lists/{list_id}/items"
+            results = execute_batch(
+                [{"method": "PATCH", "url": f"{base}/{item_id}/fields", "body": payload} if item_id else
+                 {"method": "POST", "url": base, "body": {"fields": payload}}
+                 for _, item_id, payload in plan],
+                access_token=access_token,
+            )
+
+            for (key, item_id, payload), result in zip(plan, results):
+                status = result["status"]
+                if item_id and status == 200:
+                    useranalytics.apply_update(item_id, payload)
+                    counts["patched"] += 1
+                elif not item_id and status == 201:
+                    useranalytics.apply_insert(result["body"])
+                    counts["created"] += 1
+                    log.info(f"New user added to analytics: {payload.get('Username')}", tag="WRITEBACK")
+                else:
+                    counts["failed"] += 1
+                    if status == 404:
+                        # The row is gone (the list IDs are fine): forget what we wrote to it; the
+                        # next tick's useranalytics.reload() no longer has the row and re-creates it
+                        self._written.pop(key, None)
+                    log.error(f"Analytics write for {key} failed (HTTP {status}): {result['body']}", tag="WRITEBACK")
+                    continue
+                self._written[key] = {**self._written.get(key, {}), **payload}
+
+            save_json(self.state_file, self._written)
+
+        log.debug(f"Analytics write-back: {counts}", tag="WRITEBACK")
+        return counts
+
+
+analytics_writeback = AnalyticsWriteback()
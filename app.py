@@ -2,12 +2,14 @@ import email
 from flask import Flask, redirect, url_for, session, request, render_template, jsonify ,abort ,send_file
 from msal import ConfidentialClientApplication
 import requests
+import http_client
 import os
 from dotenv import load_dotenv
 import msal
 from datetime import datetime, timedelta
 import threading
 import time
+from functools import wraps
 import pandas as pd  # Required for timestamp conversion
 from sharepoint_data import *
 from sharepoint_items import *
@@ -32,6 +34,20 @@ from cosmos import (
     save_tracked_email, get_tracked_emails_for_task, update_tracked_email_reply, get_pending_tracked_emails
 )
 from logger import log
+from proposals_snapshot import proposals
+from quotes_cache import quotes
+from acl import acl
+from useranalytics_store import useranalytics
+from analytics_writeback import analytics_writeback
+from analytics_cube import analytics_cube
+from dashboard_views import dashboard_views
+from warm_state import warm_state
+from startup import warmup
+from leader import leader
+from shared_snapshot import shared_snapshot
+from scheduler import scheduler
+from mail_delta import mail_delta, PendingReplyIndex
+from email_sync import email_sync, openai_limit
 # ================== LOAD ENVIRONMENT ==================
 load_dotenv(override=True)
 app = Flask(__name__)
@@ -57,37 +73,116 @@ SITE_PATH = "/sites/ProposalTeam"
 LIST_NAME = "Proposals"
 test_path = "/sites/Test"
 test_proposals_list = "testproposals"
-EXCLUDED_USERS = excludeusers_from_sl() 
-fetched_superusers = superusers_from_sl()
-if fetched_superusers:
-    SUPERUSERS = fetched_superusers
-fetched_approvers = approvers_from_sl()
-if fetched_approvers:
-    approvers = fetched_approvers
 # ✅ Initialize the OpenAI Client properly
 openai.api_key = os.getenv("OPENAI_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")  
-pc = Pinecone(api_key=PINECONE_API_KEY)
-# Initialize the index
-index = pc.Index("hamdaz")
+pc = None
+pinecone_index = None   # not "index": that name is the "/" view function below
 # ==============================================================
-# Initialize global data (first load)
-log.info("Fetching initial SharePoint data...", tag="INIT")
-tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-delta_link = get_latest_delta_link(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-tasks_dict = {t["id"]: t for t in tasks if "id" in t}
-df = items_to_dataframe(tasks)
-user_analytics = generate_user_analytics(df, exclude_users=EXCLUDED_USERS)
-previous_user_analytics = {}
-log.info("Data loaded successfully.", tag="INIT")
+# Initialize global data — empty until the "proposals" warm-up task fills it
+proposals.subscribe(analytics_cube.on_snapshot)
+proposals.subscribe(dashboard_views.on_snapshot)
+tasks = []
+tasks_dict = {}
+df = pd.DataFrame()
+user_analytics = pd.DataFrame()
+delta_link = None
+shared_stamp = None         # (generation, version) of the shared snapshot this worker is on
+analytics_frame_version = 0 # version of the shared user_analytics frame this worker holds
+FOLLOWER_SYNC_INTERVAL = int(os.getenv("FOLLOWER_SYNC_INTERVAL", "10"))
+WARM_FOLLOWER_WAIT = int(os.getenv("WARM_FOLLOWER_WAIT", "90"))
+# user_analytics columns that drift with the clock every tick (idle days); a frame that
+# differs only there isn't re-published to followers (their PriorityRank is unaffected)
+ANALYTICS_DRIFT_COLUMNS = ("PriorityScore", "PriorityKey")
+# ==============================================================
+# STARTUP WARM-UP (runs in the background; see /healthz and /readyz)
+# ==============================================================
+def warm_pinecone():
+    global pc, pinecone_index
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+    pinecone_index = pc.Index("hamdaz")
+def wait_for_leader_snapshot(timeout):
+    """Follower cold start: the leader's shared snapshot, waiting up to `timeout` for it to appear."""
+    deadline = time.time() + timeout
+    while True:
+        change = shared_snapshot.changes_since(None)
+        if change or leader.is_leader() or time.time() >= deadline:
+            return change
+        time.sleep(2)
+def warm_proposals():
+    global tasks, tasks_dict, df, user_analytics, delta_link, shared_stamp, analytics_frame_version
+    log.info("Fetching initial SharePoint data...", tag="INIT")
+    shared = None if leader.is_leader() else wait_for_leader_snapshot(WARM_FOLLOWER_WAIT)
+    warm = None if shared else warm_state.load()
+    def fetch():
+        global delta_link, shared_stamp
+        if shared:
+            _, items, shared_stamp = shared
+            delta_link = shared_snapshot.delta_link()
+            return items
+        if warm:
+            # Resume from the saved snapshot; the first delta poll catches up on what changed since
+            delta_link = warm.delta_link
+            return warm.items
+        items = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        delta_link = get_latest_delta_link(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        return items
+    snapshot = proposals.load(fetch)
+    if delta_link is None:
+        # A request loaded the list first; start the delta feed from now
+        delta_link = get_latest_delta_link(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+    tasks = list(snapshot.items)
+    tasks_dict = dict(snapshot.by_id)
+    df = snapshot.df
+    frame, analytics_frame_version = shared_snapshot.get_frame("user_analytics") if shared else (None, 0)
+    if frame is not None:
+        user_analytics = frame
+    elif warm and not warm.user_analytics.empty:
+        user_analytics = warm.user_analytics
+    else:
+        warmup.wait("acl")
+        user_analytics = generate_user_analytics(df, exclude_users=acl.excluded_users())
+        if leader.is_leader() and not warm:
+            warm_state.save(snapshot.items, delta_link, user_analytics)
+    if leader.is_leader():
+        # Followers build their snapshot from this; a new generation makes them reload it whole
+        shared_stamp = shared_snapshot.publish(snapshot.items, delta_link)
+        shared_snapshot.put_frame("user_analytics", user_analytics, ignore=ANALYTICS_DRIFT_COLUMNS)
+    log.info("Data loaded successfully.", tag="INIT")
+    scheduler.trigger("proposals_refresh" if leader.is_leader() else "follower_sync")
+warmup.add("acl", lambda: acl.refresh(force=True))
+warmup.add("proposals", warm_proposals)
+warmup.add("pinecone", warm_pinecone, required=False)
+def warming_up_response(feature="proposals", as_json=False):
+    """503 for routes whose data is still loading; the client is told when to retry."""
+    if as_json or request.path.startswith("/api/"):
+        resp = jsonify({"success": False, "error": f"Service warming up ({feature} not loaded yet)"})
+    else:
+        resp = app.response_class("Hamdaz is starting up — data is still loading. This page will be available in a moment.",
+                                  mimetype="text/plain")
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "5"
+    return resp
+def requires_ready(feature, as_json=False):
+    """Route decorator: answer 503 (instead of blocking) until the warm-up task `feature` is ready."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not warmup.is_ready(feature):
+                return warming_up_response(feature, as_json)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
 # ==============================================================
 # HELPER FUNCTIONS
 # ==============================================================
 def is_admin(email_or_name):
     if not email_or_name:
         return False
+    if acl.is_superuser(email_or_name):
+        return True
     identifier_lower = email_or_name.lower().replace(" ", "")
-    for superuser in SUPERUSERS:
+    for superuser in acl.members("superusers"):
         # Check if it matches exactly the email, or just the portion before the @
         superuser_email = superuser.lower()
         superuser_name = superuser_email.split('@')[0].replace(" ", "")
@@ -97,7 +192,7 @@ def is_admin(email_or_name):
             return True
     return False
 def is_approver(email):
-    return email.lower() in approvers if email else False
+    return acl.is_approver(email)
 app.jinja_env.globals.update(is_admin=is_admin, is_approver=is_approver, current_date=datetime.now())
 def greetings():
     now = datetime.now()
@@ -110,7 +205,7 @@ def greetings():
         return "Good Evening"
     else:
         return "Hello"
-def get_analytics_data(df, period_type='month', year=None, month=None):
+def get_analytics_data(period_type='month', year=None, month=None):
     if year is None:
         year = datetime.now().year
     if month is None:
@@ -120,11 +215,13 @@ def get_analytics_data(df, period_type='month', year=None, month=None):
         'year': year,
         'month': month
     } if period_type != 'all' else None
-    analytics = compute_overall_analytics(df, period, excluded_users=EXCLUDED_USERS)
-    per_user = compute_user_analytics_with_last_date(df, EXCLUDED_USERS, period)
+    # Rollups over the pre-aggregated user × year × month cube
+    excluded_users = acl.excluded_users()
+    analytics = analytics_cube.overall(period, excluded_users=excluded_users)
+    per_user = analytics_cube.per_user(period, excluded_users=excluded_users)
     return analytics, per_user
 # ==============================================================
-# LEAVE LIFECYCLE HELPER — called by background_maintenance_updater
+# LEAVE LIFECYCLE HELPER — called by the leave_expiry job
 # ==============================================================
 def check_and_process_expired_leaves():
     """
@@ -174,108 +271,113 @@ def check_and_process_expired_leaves():
     except Exception as e:
         log.error("Leave lifecycle check failed", tag="LEAVE-EXPIRY", exc=e)
 # ==============================================================
-# BACKGROUND DATA UPDATER
+# BACKGROUND JOBS (scheduled at the bottom of this file, see scheduler.py)
 # ==============================================================
-def background_data_updater():
-    """Runs in background to incrementally refresh SharePoint data."""
-    global tasks, tasks_dict, delta_link, df, user_analytics, EXCLUDED_USERS, previous_user_analytics, SUPERUSERS, approvers
-    while True:
-        try:
-            # log.debug("Refreshing SharePoint data...", tag="BG-DATA")
-            
-            new_excluded_users = excludeusers_from_sl()
-            if new_excluded_users is not None and isinstance(new_excluded_users, list):
-                EXCLUDED_USERS = new_excluded_users
-                
-            new_superusers = superusers_from_sl()
-            if new_superusers:
-                SUPERUSERS = new_superusers
-                
-            new_approvers = approvers_from_sl()
-            if new_approvers:
-                approvers = new_approvers
-            
-            raw_tasks, removed_ids, next_delta = fetch_sharepoint_delta(SITE_DOMAIN, SITE_PATH, LIST_NAME, delta_link=delta_link)
-            delta_link = next_delta
-            
-            # If there are changes, update local dictionary and dataframe
-            if raw_tasks or removed_ids:
-                log.info(f"Delta: {len(raw_tasks)} changed, {len(removed_ids)} removed.", tag="BG-DATA")
-                for t in raw_tasks:
-                    tasks_dict[t["id"]] = t
-                for rid in removed_ids:
-                    tasks_dict.pop(rid, None)
-                tasks = list(tasks_dict.values())
-                df = items_to_dataframe(tasks)
-            
-            # We recalculate user analytics every time since it's driven 
-            # by current date/time (e.g., missed vs ongoing)
-            user_analytics = generate_user_analytics(df, exclude_users=EXCLUDED_USERS)
-            user_analytics = calculate_priority_score(user_analytics)
-            user_analytics = assign_priority_rank(user_analytics)
-            
-            existing_items = get_existing_useranalytics_items()
-            
-            for _, row in user_analytics.iterrows():
-                username = row["User"]
-                item_fields = {
-                    "Username": username,
-                    "ActiveTasks": int(row["OngoingTasksCount"]),
-                    "RecentDate": row["LastAssignedDate"].isoformat() if isinstance(row["LastAssignedDate"], datetime) else row["LastAssignedDate"],
-                    "Priority": int(row["PriorityRank"]),
-                }
-                
-                # Compare against cached state to avoid unnecessary PATCH requests
-                prev_state = previous_user_analytics.get(username)
-                if prev_state != item_fields:
-                    existing_item = find_existing_user_item(existing_items, username)
-                    if existing_item:
-                        update_user_analytics_in_sharepoint(existing_item["id"], item_fields)
-                        log.debug(f"Updated analytics for {username}", tag="BG-DATA")
-                    else:
-                        add_item_to_sharepoint(item_fields)  
-                        log.info(f"New user added to analytics: {username}", tag="BG-DATA")
-                    previous_user_analytics[username] = item_fields.copy()
-            
-            # Perform smart rotation
-            swp()
-            
-            # log.info(f"Data refresh complete.", tag="BG-DATA")
-        except Exception as e:
-            log.error("Data update failed", tag="BG-DATA", exc=e)
-            
-        time.sleep(60)
+# Every worker registers the same jobs, but only the lease holder (leader.py)
+# runs the Graph / Cosmos / OpenAI ones. Followers catch up from the shared
+# SQLite snapshot the leader writes (shared_snapshot.py), so background
+# traffic does not grow with the worker count.
+_follower_acl_at = 0.0
+def follow_leader_snapshot():
+    """Follower tick: apply whatever the leader committed to the shared snapshot since our stamp."""
+    global tasks, tasks_dict, delta_link, df, user_analytics, shared_stamp, analytics_frame_version, _follower_acl_at
+    if time.time() - _follower_acl_at >= 60:
+        acl.refresh()
+        _follower_acl_at = time.time()
+    change = shared_snapshot.changes_since(shared_stamp)
+    if change:
+        if change[0] == "full":
+            _, items, stamp = change
+            snapshot = proposals.publish(items)
+        else:
+            _, changed, removed_ids, stamp = change
+            snapshot = proposals.apply_delta(changed, removed_ids)
+        tasks = list(snapshot.items)
+        tasks_dict = dict(snapshot.by_id)
+        df = snapshot.df
+        delta_link = shared_snapshot.delta_link()   # where to resume if this worker becomes leader
+        log.debug(f"Follower {shared_stamp} -> {stamp} ({change[0]})", tag="BG-DATA")
+        shared_stamp = stamp
+    frame, analytics_frame_version = shared_snapshot.get_frame("user_analytics", analytics_frame_version)
+    if frame is not None:
+        user_analytics = frame
+def refresh_proposals():
+    """Leader job: one incremental refresh of the Proposals data plus the analytics write-back."""
+    global tasks, tasks_dict, delta_link, df, user_analytics, shared_stamp
+    # log.debug("Refreshing SharePoint data...", tag="BG-DATA")
 
-def background_email_updater():
-    """Runs in background to sync supplier emails."""
-    while True:
-        try:
-            sync_all_pending_supplier_emails()
-        except Exception as e:
-            log.error("Email sync failed", tag="BG-EMAIL", exc=e)
-        time.sleep(45)
+    # One $batch metadata check; lists are only re-read when they changed
+    acl.refresh()
 
-def background_maintenance_updater():
-    """Runs every half hour to expire old leaves."""
-    while True:
-        try:
-            check_and_process_expired_leaves()
-        except Exception as e:
-            log.error("Leave expiry check failed", tag="BG-MAINT", exc=e)
-        time.sleep(1800)
+    try:
+        raw_tasks, removed_ids, next_delta = fetch_sharepoint_delta(SITE_DOMAIN, SITE_PATH, LIST_NAME, delta_link=delta_link)
+        resynced = False
+    except ValueError:
+        # Delta token expired (e.g. resumed from an old warm state): full reload
+        log.warn("Delta token expired, reloading the full list.", tag="BG-DATA")
+        snapshot = proposals.publish(fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME))
+        raw_tasks, removed_ids = [], []
+        next_delta = get_latest_delta_link(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        resynced = True
+    delta_link = next_delta
+
+    # If there are changes, update local dictionary and dataframe
+    if raw_tasks or removed_ids:
+        log.info(f"Delta: {len(raw_tasks)} changed, {len(removed_ids)} removed.", tag="BG-DATA")
+        snapshot = proposals.apply_delta(raw_tasks, removed_ids)
+    if raw_tasks or removed_ids or resynced:
+        tasks = list(snapshot.items)
+        tasks_dict = dict(snapshot.by_id)
+        df = snapshot.df
+
+    # We recalculate user analytics every time since it's driven 
+    # by current date/time (e.g., missed vs ongoing)
+    user_analytics = generate_user_analytics(df, exclude_users=acl.excluded_users())
+    user_analytics = calculate_priority_score(user_analytics)
+    user_analytics = assign_priority_rank(user_analytics)
+    # A newly promoted leader may find the store empty (it loaded the list itself after
+    # wait_for_leader_snapshot timed out) or on a stamp it never followed: it republishes
+    # its own state once, then goes on with deltas
+    if resynced or shared_stamp is None or shared_stamp != shared_snapshot.stamp():
+        shared_stamp = shared_snapshot.publish(proposals.current().items, delta_link)
+    elif raw_tasks or removed_ids:
+        shared_stamp = shared_snapshot.apply_delta(raw_tasks, removed_ids, delta_link)
+    shared_snapshot.put_frame("user_analytics", user_analytics, ignore=ANALYTICS_DRIFT_COLUMNS)
+    if raw_tasks or removed_ids or resynced:
+        warm_state.save(snapshot.items, delta_link, user_analytics)
+
+    # One useranalytics read per tick; write-backs and swp() below reuse it
+    useranalytics.reload()
+
+    rows = []
+    for _, row in user_analytics.iterrows():
+        rows.append({
+            "Username": row["User"],
+            "ActiveTasks": int(row["OngoingTasksCount"]),
+            "RecentDate": row["LastAssignedDate"].isoformat() if isinstance(row["LastAssignedDate"], datetime) else row["LastAssignedDate"],
+            "Priority": int(row["PriorityRank"]),
+        })
+
+    # Field-level diff against the last written state; changes go out in one $batch round
+    analytics_writeback.flush(rows)
+
+    # Perform smart rotation
+    swp()
+def sync_leave_expiry():
+    """Leader job: expire old leaves."""
+    check_and_process_expired_leaves()
 # ==============================================================
 # ROUTES
 # ==============================================================
 @app.route("/update_analytics")
+@requires_ready("proposals", as_json=True)
 def update_analytics():
     if "user" not in session:
         return jsonify({"error": "Unauthorized"}), 401
     period_type = request.args.get('period', 'month')
     year = int(request.args.get('year', datetime.now().year))
     month = int(request.args.get('month', datetime.now().month))
-    tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-    df = items_to_dataframe(tasks)
-    analytics, per_user = get_analytics_data(df, period_type, year, month)
+    analytics, per_user = get_analytics_data(period_type, year, month)
     return jsonify({
         "analytics": analytics,
         "per_user": per_user
@@ -283,6 +385,8 @@ def update_analytics():
 @app.route("/")
 def index():
     if "user" in session:
+        if not warmup.is_ready("proposals"):
+            return warming_up_response()
         user = session["user"]
         email = user.get("mail") or user.get("userPrincipalName")
         user_id = user.get("id")
@@ -295,7 +399,7 @@ def index():
             flag = 0
         if not current_user or flag != 1:
             return redirect(url_for("user_form"))
-        if email.lower() in SUPERUSERS:
+        if acl.is_superuser(email):
             dashboard_role = "admin_dashboard"
             excel_role = "admin"
             app.jinja_env.globals.update(excel_role="admin")
@@ -319,21 +423,14 @@ def index():
         year = int(request.args.get('year') or datetime.now().year)
         month = int(request.args.get('month') or datetime.now().month)
         greeting = greetings()
-        analytics, per_user = get_analytics_data(df, period_type, year, month)
+        analytics, per_user = get_analytics_data(period_type, year, month)
         username = user.get("displayName", "").replace(" ", "")
-        user_analytics_specific = get_user_analytics_specific(df, username)
-        now_utc = pd.Timestamp.utcnow()
-        ongoing_filtered = [
-            t for t in user_analytics_specific['OngoingTasks']
-            if pd.to_datetime(t['BCD']) > now_utc and t.get('SubmissionStatus','') != 'Submitted'
-        ]
-        user_analytics_specific['OngoingTasks'] = ongoing_filtered
-        ongoing_tasks_count = len(ongoing_filtered)
-        if 'Created' in df.columns:
-            df['Created'] = pd.to_datetime(df['Created'])
-            available_years = sorted(df['Created'].dt.year.unique().tolist())
-        else:
-            available_years = [datetime.now().year]
+        # Precomputed per-user view; no DataFrame work on the request path
+        now_utc = pd.Timestamp.now(tz='UTC')
+        user_view = dashboard_views.for_user(username)
+        user_analytics_specific = user_view.dashboard(now_utc)
+        ongoing_tasks_count = user_analytics_specific['OngoingTasksCount']
+        available_years = analytics_cube.years() or [datetime.now().year]
         return render_template(
             f"{dashboard_role}.html",
             role=excel_role,
@@ -349,10 +446,7 @@ def index():
             user_analytics=user_analytics_specific,
             email=email,
             ongoing_tasks_count=ongoing_tasks_count,
-            due_today_tasks_count=len([
-                t for t in user_analytics_specific['OngoingTasks']
-                if pd.to_datetime(t['BCD']).date() == now_utc.date()
-            ]),
+            due_today_tasks_count=user_view.due_today_count(now_utc),
             user_flag_data=user_flag_data, 
         )
     return render_template("login.html")
@@ -375,6 +469,7 @@ def user_form():
 def dashboard():
     return redirect("/")
 @app.route("/teams")
+@requires_ready("proposals")
 def teams():
     user = session["user"]
     email = user.get("mail") or user.get("userPrincipalName")
@@ -480,17 +575,9 @@ def cs():
     user = session["user"]
     return render_template("customer_success_team.html", user =user)
 @app.route("/user/<username>")
+@requires_ready("proposals")
 def user_profile(username):
-    tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-    df = items_to_dataframe(tasks)
-    user_analytics_specific = get_user_analytics_specific(df, username)
-    now_utc = pd.Timestamp.utcnow()
-    ongoing_filtered = [
-        t for t in user_analytics_specific['OngoingTasks']
-        if pd.to_datetime(t['BCD']) > now_utc and t.get('SubmissionStatus','') != 'Submitted'
-    ]
-    user_analytics_specific['OngoingTasks'] = ongoing_filtered
-    user_analytics_specific['OngoingTasksCount'] = len(ongoing_filtered)
+    user_analytics_specific = dashboard_views.for_user(username).dashboard()
     user = session["user"]
     email = user.get("mail") or user.get("userPrincipalName")
     if username in ["dashboard", "customer", "businesscard", "orders", "payments", "reports"]:
@@ -514,7 +601,7 @@ def authorized():
         )
         if "access_token" in result:
             access_token = result["access_token"]
-            graph_data = requests.get(
+            graph_data = http_client.get(
                 "https://graph.microsoft.com/v1.0/me",
                 headers={"Authorization": f"Bearer {access_token}"}
             ).json()
@@ -527,11 +614,12 @@ def logout():
     session.clear()
     return redirect("/")
 @app.route("/task_details/<title>")
+@requires_ready("proposals")
 def task_details(title):
     if "user" not in session:
         return redirect(url_for('login'))
     user = session.get("user")
-    df = items_to_dataframe(fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME))
+    df = proposals.current().df
     task = get_task_details(df, title)
     return render_template("pages/task_details.html", task=task, user=user)
 @app.route("/businesscard")
@@ -614,104 +702,102 @@ def generate_temp_quote_docx(summary, reply_content, tracking_id):
     except Exception as e:
         log.error("Failed to generate quote DOCX", tag="QUOTE", exc=e)
         return None
-def sync_supplier_emails_for_user(user_email):
-    """Refactored to perform targeted searches for each pending email in Cosmos DB."""
-    from sharepoint_items import get_access_token
-    from cosmos import get_pending_tracked_emails, update_tracked_email_reply, save_session_message, save_task_supplier_quote
-    import requests, re, json
+def record_supplier_reply(user_email, pe, msg, headers):
+    """Marks the reply read, extracts the quote with GPT-4o and records it against the tracked email. True on success."""
+    from cosmos import update_tracked_email_reply, save_session_message, save_task_supplier_quote
     from bs4 import BeautifulSoup
+    tracking_id = pe['id']
+    supplier_email = pe.get('to_email', '')
+    task_id = pe['task_id']
+    session_id = pe.get('session_id')
+    html_body = msg.get("body", {}).get("content", "")
+    plainTextPreview = msg.get("bodyPreview", "")
     try:
-        app_access_token = get_access_token()
-        pending_emails = get_pending_tracked_emails(user_email=user_email)
-        if not pending_emails:
-            return 0
-        headers = {"Authorization": f"Bearer {app_access_token}"}
-        matched = 0
-        for pe in pending_emails:
-            tracking_id = pe['id']
-            subject = pe.get('subject', '')
-            supplier_email = pe.get('to_email', '')
-            task_id = pe['task_id']
-            session_id = pe.get('session_id')
-            # 1. Perform resilient keyword extraction for search
-            # Remove common prefixes/noise to get core keywords
-            clean_subject = subject.replace("Re:", "").replace("RE:", "").replace("Fwd:", "").replace("Procurement Inquiry for", "").strip()
-            # Split into keywords and take first 3-4 to avoid overly specific queries
-            keywords = [k for k in clean_subject.split() if len(k) > 2][:4]
-            keyword_search = " ".join(keywords)
-            # 2. Perform targeted search in Graph API
-            # IMPORTANT: The entire query must be wrapped in double quotes for KQL prefixes like 'from:' to work properly
-            search_query = f'from:{supplier_email}'
-            if keyword_search:
-                search_query += f' {keyword_search}'
-            # Wrap the whole thing in double-quotes and then URL encode
-            quoted_search = f'"{search_query}"'
-            log.debug(f"Email search for {tracking_id[:8]}... | KQL: {quoted_search}", tag="SYNC")
-            url = f"{GRAPH_API_ENDPOINT}/users/{user_email}/messages?$search={requests.utils.quote(quoted_search)}&$top=10&$select=id,subject,bodyPreview,body,from"
-            resp = requests.get(url, headers=headers)
-            if resp.status_code != 200:
-                log.error(f"Email search failed for tracking {tracking_id[:8]}...: {resp.status_code}", tag="SYNC")
-                continue
-            messages = resp.json().get("value", [])
-            for msg in messages:
-                html_body = msg.get("body", {}).get("content", "")
-                plainTextPreview = msg.get("bodyPreview", "")
-                # Verify match: Either REF ID is present OR Subject/Sender match is strong
-                found_ref = re.search(r'REF:([a-f0-9\-]{36})', html_body)
-                is_direct_match = (found_ref and found_ref.group(1) == tracking_id)
-                # Fallback: if no REF found, check if sender matches (search already filtered subject)
-                is_fallback_match = False
-                if not found_ref:
-                    msg_sender = msg.get('from', {}).get('emailAddress', {}).get('address', '').lower()
-                    if msg_sender == supplier_email.lower():
-                        is_fallback_match = True
-                if is_direct_match or is_fallback_match:
-                    try:
-                        soup = BeautifulSoup(html_body, "html.parser")
-                        clean_text = soup.get_text(separator=' ').strip()
-                    except:
-                        clean_text = plainTextPreview
-                    # Mark read
-                    requests.post(f"{GRAPH_API_ENDPOINT}/users/{user_email}/messages/{msg['id']}", headers=headers, json={"isRead": True})
-                    # AI Extraction
-                    ai_prompt = f"""
-                    Analyze this supplier reply for procurement context. Extract pricing/quote details into JSON.
-                    {{
-                        "is_quote": true,
-                        "bill_to": "Recipient name",
-                        "items": [{{"description": "...", "qty": 1, "rate": 0}}],
-                        "summary": "1-sentence summary of the reply",
-                        "notes": "..."
-                    }}
-                    Reply content: {clean_text[:5000]}
-                    """
-                    try:
-                        from openai import OpenAI
-                        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-                        ai_res = client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[{"role": "system", "content": "Return raw JSON only."}, {"role": "user", "content": ai_prompt}],
-                            temperature=0.1
-                        )
-                        raw_ai = ai_res.choices[0].message.content.strip().replace("```json","").replace("```","")
-                        parsed = json.loads(raw_ai)
-                        summary = parsed.get("summary", "New reply received.")
-                        quote_doc_path = f'/api/quotes/download/{tracking_id}' if parsed.get("is_quote") else None
-                        if parsed.get("is_quote"):
-                            save_task_supplier_quote(task_id, tracking_id, supplier_email, summary, parsed)
-                        update_tracked_email_reply(tracking_id, task_id, clean_text, summary, quote_doc_path, ai_parsed_data=parsed)
-                        if session_id:
-                            msg_content = f"**Supplier Reply Received ({supplier_email})!**\n\n{summary}"
-                            if quote_doc_path: msg_content += f"\n\n[ðŸ“¥ Download Commercial Proposal]({quote_doc_path})"
-                            save_session_message(session_id, user_email, "assistant", msg_content, agent_type="procurement", task_id=task_id)
-                        matched += 1
-                        break # Found the reply for this specific tracked item
-                    except Exception as e:
-                        log.error(f"AI extraction failed for {tracking_id[:8]}...", tag="SYNC", exc=e)
-        return matched
+        soup = BeautifulSoup(html_body, "html.parser")
+        clean_text = soup.get_text(separator=' ').strip()
+    except:
+        clean_text = plainTextPreview
+    # Mark read
+    http_client.patch(mail_delta.message_url(user_email, msg['id']), headers=headers, json={"isRead": True})
+    # AI Extraction
+    ai_prompt = f"""
+    Analyze this supplier reply for procurement context. Extract pricing/quote details into JSON.
+    {{
+        "is_quote": true,
+        "bill_to": "Recipient name",
+        "items": [{{"description": "...", "qty": 1, "rate": 0}}],
+        "summary": "1-sentence summary of the reply",
+        "notes": "..."
+    }}
+    Reply content: {clean_text[:5000]}
+    """
+    try:
+        from openai import OpenAI
+        client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        with openai_limit:
+            ai_res = client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "system", "content": "Return raw JSON only."}, {"role": "user", "content": ai_prompt}],
+                temperature=0.1
+            )
+        raw_ai = ai_res.choices[0].message.content.strip().replace("```json","").replace("```","")
+        parsed = json.loads(raw_ai)
+        summary = parsed.get("summary", "New reply received.")
+        quote_doc_path = f'/api/quotes/download/{tracking_id}' if parsed.get("is_quote") else None
+        if parsed.get("is_quote"):
+            save_task_supplier_quote(task_id, tracking_id, supplier_email, summary, parsed)
+        update_tracked_email_reply(tracking_id, task_id, clean_text, summary, quote_doc_path, ai_parsed_data=parsed)
+        if session_id:
+            msg_content = f"**Supplier Reply Received ({supplier_email})!**\n\n{summary}"
+            if quote_doc_path: msg_content += f"\n\n[📥 Download Commercial Proposal]({quote_doc_path})"
+            save_session_message(session_id, user_email, "assistant", msg_content, agent_type="procurement", task_id=task_id)
+        return True
     except Exception as e:
-        log.error(f"Email sync error for {user_email}", tag="SYNC", exc=e)
-        return 0
+        log.error(f"AI extraction failed for {tracking_id[:8]}...", tag="SYNC", exc=e)
+        return False
+def collect_supplier_replies(user_email):
+    """One incremental inbox read (mail_delta), matched locally against the user's pending tracked emails.
+    Returns (carried, fresh): [(tracked_email, message)] for replies re-read from last cycle's
+    deferred/failed queues and for new ones; each tracked email is claimed by at most one reply."""
+    from sharepoint_items import get_access_token
+    from cosmos import get_pending_tracked_emails
+    pending_emails = get_pending_tracked_emails(user_email=user_email)
+    if not pending_emails:
+        return [], []
+    app_access_token = get_access_token()
+    index = PendingReplyIndex(pending_emails)
+    # Replies whose processing failed (or ran out of budget) last cycle come first, then whatever arrived since
+    messages, queued = {}, set()
+    for msg in mail_delta.take_retries(user_email, app_access_token):
+        messages[msg["id"]] = msg
+        queued.add(msg["id"])
+    for msg in mail_delta.poll(user_email, app_access_token, since=index.oldest_created()):
+        messages[msg["id"]] = msg
+    carried, fresh = [], []
+    for msg in messages.values():
+        pe = index.match(msg)
+        if pe is None:
+            continue
+        log.debug(f"Supplier reply for {pe['id'][:8]}... in {user_email}", tag="SYNC")
+        index.resolve(pe['id'])
+        (carried if msg["id"] in queued else fresh).append((pe, msg))
+    return carried, fresh
+def process_supplier_reply(user_email, reply):
+    from sharepoint_items import get_access_token
+    pe, msg = reply
+    headers = {"Authorization": f"Bearer {get_access_token()}"}
+    if record_supplier_reply(user_email, pe, msg, headers):
+        return True
+    mail_delta.retry_later(user_email, msg["id"])
+    return False
+def defer_supplier_reply(user_email, reply):
+    mail_delta.defer(user_email, reply[1]["id"])
+def sync_supplier_emails(users):
+    """Runs the supplier-reply pipeline (email_sync) over `users`; returns the run report."""
+    return email_sync.run(users, collect_supplier_replies, process_supplier_reply, defer_supplier_reply)
+def sync_supplier_emails_for_user(user_email):
+    report = sync_supplier_emails([user_email])
+    return report["matched"]
 @app.route("/api/check_email_replies", methods=["POST"])
 def check_email_replies():
     if "user" not in session:
@@ -726,15 +812,15 @@ def sync_all_pending_supplier_emails():
         pending = get_pending_tracked_emails(user_email=None) # Get all pending
         if not pending:
             return
-        unique_users = {pe['user_email'] for pe in pending if 'user_email' in pe}
-        log.debug(f"Checking email replies for {len(unique_users)} user(s)", tag="BG-SYNC")
-        for user_email in unique_users:
-            try:
-                count = sync_supplier_emails_for_user(user_email)
-                if count > 0:
-                    log.info(f"Found {count} new supplier reply/replies for {user_email}", tag="BG-SYNC")
-            except Exception as e:
-                log.error(f"Email sync error for {user_email}", tag="BG-SYNC", exc=e)
+        unique_users = sorted({pe['user_email'] for pe in pending if 'user_email' in pe})
+        report = sync_supplier_emails(unique_users)
+        for user_email, counts in report["by_user"].items():
+            if counts["matched"] > 0:
+                log.info(f"Found {counts['matched']} new supplier reply/replies for {user_email}", tag="BG-SYNC")
+        log.debug(
+            f"Email sync: {report['users']} user(s), {report['replies']} reply/replies, {report['matched']} recorded, "
+            f"{report['deferred']} deferred, {report['failed']} failed in {report['duration_s']}s "
+            f"({report['replies_per_s']}/s)", tag="BG-SYNC")
     except Exception as e:
         log.error("Global email sync loop failed", tag="BG-SYNC", exc=e)
 # ==============================================================
@@ -841,6 +927,7 @@ def send_for_approval():
             update_sharepoint_item_with_link(item_id, share_link)
         else:
             log.debug("No supplier file attached to quote submission.", tag="QUOTE")
+        scheduler.trigger("quotes_sync")
         return render_template("pages/quote_success.html", user=user, added_items=1)
     except Exception as e:
         log.error("Failed to add quote to SharePoint", tag="QUOTE", exc=e)
@@ -852,12 +939,8 @@ def quote_decision():
     user = session.get("user")
     user_name = user.get("displayName")  # user's name in session
     try:
-        site_domain = "hamdaz1.sharepoint.com"
-        site_path = "/sites/Test"
-        list_name = "Quotes"
-        quote_items = fetch_sharepoint_list(site_domain, site_path, list_name)
-        # Filter only quotes created by this user
-        quote_items = [q for q in quote_items if q.get("QuoteCreator") == user_name]
+        # Only quotes created by this user
+        quote_items = quotes.by_creator(user_name)
     except Exception as e:
         log.error("Failed to fetch SharePoint list items", tag="SP", exc=e)
         quote_items = []
@@ -867,14 +950,11 @@ def quote_details(quote_id):
     if "user" not in session:                                   
         return redirect(url_for("login"))
     user = session.get("user")
-    # Fetch quote by ID from SharePoint
-    site_domain = "hamdaz1.sharepoint.com"
-    site_path = "/sites/Test"
-    list_name = "Quotes"
-    quote_items = fetch_sharepoint_list(site_domain, site_path, list_name)
-    quote = next((q for q in quote_items if str(q.get("id")) == str(quote_id)), None)
+    # Look up the quote in the Quotes replica
+    quote = quotes.get(quote_id)
     if not quote:
         return "Quote not found", 404
+    quote = dict(quote)  # replica entries are shared — decorate a copy
     # Get customer name from Zoho
     customer_id = quote.get("CustomerID", "")
     customer_name = get_customer_name_from_zoho(customer_id) or ""
@@ -969,13 +1049,10 @@ def export_quote(quote_id):
         return redirect(url_for("login"))
     # --- REUSE YOUR EXISTING FETCH LOGIC HERE ---
     # (Copy the logic from quote_details to fetch and parse the quote)
-    site_domain = "hamdaz1.sharepoint.com"
-    site_path = "/sites/Test"
-    list_name = "Quotes"
-    quote_items = fetch_sharepoint_list(site_domain, site_path, list_name)
-    quote = next((q for q in quote_items if str(q.get("id")) == str(quote_id)), None)
+    quote = quotes.get(quote_id)
     if not quote:
         return "Quote not found", 404
+    quote = dict(quote)
     # Fetch Customer Name
     customer_id = quote.get("CustomerID", "")
     customer_name = get_customer_name_from_zoho(customer_id) or ""
@@ -1042,12 +1119,8 @@ def approvals():
     if "user" not in session:
         return redirect(url_for('login'))
     user = session.get("user")
-    site_domain = "hamdaz1.sharepoint.com"
-    site_path = "/sites/Test"
-    list_name = "Quotes"
-    quote_items = fetch_sharepoint_list(site_domain, site_path, list_name)
     # Show all the quotes with ApprovalStatus as both 'Pending' and 'Approved'
-    quote_items = [q for q in quote_items if q.get("ApprovalStatus") in ["Pending", "Approved"]]
+    quote_items = quotes.by_status("Pending", "Approved")
     return render_template("pages/quote_decision.html", user=user, quote_items=quote_items)
 # ==============================================================
 # ==============================================================
@@ -1242,7 +1315,7 @@ def send_email_api():
             },
             "saveToSentItems": "true"
         }
-        response = requests.post(f"{GRAPH_API_ENDPOINT}/me/sendMail", headers=headers, json=email_data)
+        response = http_client.post(f"{GRAPH_API_ENDPOINT}/me/sendMail", headers=headers, json=email_data)
         if response.status_code == 202:
             if task_id:
                 save_tracked_email(task_id, session_id, to_email, subject, tracking_id, user_email, body)
@@ -1261,23 +1334,21 @@ def send_email_api():
 # ==============================================================
 # ==============================================================
 @app.route("/user_report")
+@requires_ready("proposals")
 def user_report():
     if "user" not in session:
         return redirect(url_for('login'))
     user = session.get("user")
     user_name = user.get("displayName").replace(" ", "")
-    tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-    df = items_to_dataframe(tasks)
-    user_analytics_specific = get_user_analytics_specific(df, user_name)
+    user_analytics_specific = dashboard_views.for_user(user_name).analytics()
     return render_template("pages/user_report.html", user=user, user_analytics=user_analytics_specific)
 @app.route("/admin_report")
+@requires_ready("proposals")
 def admin_report():
     if "user" not in session:
         return redirect(url_for('login'))
     user = session.get("user")
-    tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-    df = items_to_dataframe(tasks)
-    overall_analytics, per_user_analytics = get_analytics_data(df, period_type='all')
+    overall_analytics, per_user_analytics = get_analytics_data(period_type='all')
     return render_template("pages/admin_report.html", user=user, overall_analytics=overall_analytics, per_user_analytics=per_user_analytics)
 # ==============================================================
 from PyPDF2 import PdfMerger
@@ -1663,20 +1734,19 @@ def metadata_test():
     log.debug(f"Received payload keys: {list(data.keys()) if isinstance(data, dict) else type(data).__name__}", tag="API")
     return jsonify({"status": "success", "received": data}), 200
 @app.route('/assist')
+@requires_ready("proposals")
 def assist():
     user=session.get("user")
     if not user:
         return redirect(url_for('login'))
     user_name = user.get("displayName").replace(" ", "")
-    tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
-    df = items_to_dataframe(tasks)
     # Filter for the current user and set fallbacks for Title
     user_items = []
-    for t in tasks:
-        if t.get("AssignedTo", "").replace(" ", "") == user_name:
-            if not t.get('Title'):
-                t['Title'] = t.get('ProjectName') or t.get('ProposalName') or t.get('Name') or t.get('ItemName') or 'Unnamed Task'
-            user_items.append(t)
+    for t in proposals.current().where_match("AssignedTo", lambda v: str(v).replace(" ", "") == user_name):
+        t = dict(t)  # snapshot items are shared — decorate a copy
+        if not t.get('Title'):
+            t['Title'] = t.get('ProjectName') or t.get('ProposalName') or t.get('Name') or t.get('ItemName') or 'Unnamed Task'
+        user_items.append(t)
     log.debug(f"{user_name} has {len(user_items)} assigned item(s)", tag="DATA")
     return render_template("assist.html", user=user, tasks=user_items)
 # @app.route("/line_items")
@@ -1689,6 +1759,7 @@ def assist():
 # PROCUREMENT AGENT API ROUTES
 # ==============================================================
 @app.route('/api/procurement/tasks', methods=['GET'])
+@requires_ready("proposals")
 def get_procurement_tasks():
     if "user" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -1696,13 +1767,15 @@ def get_procurement_tasks():
     display_name = user.get("displayName", "").replace(" ", "")
     try:
         # Using the main Proposals list
-        tasks_list = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        snap = proposals.current()
         email = user.get("mail") or user.get("userPrincipalName", "")
         # Filter comprehensively
         if is_admin(email):
-            user_tasks = tasks_list
+            user_tasks = list(snap.items)
         else:
-            user_tasks = [t for t in tasks_list if str(t.get("AssignedTo", "")).replace(" ", "").lower() == display_name.lower() or display_name.lower() in str(t.get("AssignedTo", "")).lower() or str(t.get("AssignedTo", "")).lower() in display_name.lower()]
+            user_tasks = snap.where_match("AssignedTo", lambda v: str(v).replace(" ", "").lower() == display_name.lower() or display_name.lower() in str(v).lower() or str(v).lower() in display_name.lower())
+        # Snapshot items are shared — decorate copies
+        user_tasks = [dict(t) for t in user_tasks]
         # Add basic priority and step data for the UI
         for t in user_tasks:
             if 'Priority' not in t: t['Priority'] = 'Medium'
@@ -1722,6 +1795,7 @@ def get_procurement_tasks():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 @app.route('/api/procurement/tasks/<task_id>', methods=['GET'])
+@requires_ready("proposals")
 def get_procurement_task_details(task_id):
     if "user" not in session:
         return jsonify({"error": "Unauthorized"}), 401
@@ -1760,7 +1834,7 @@ def analyze_procurement_requirements(task_id):
             for att in attachments:
                 name = att['name'].lower()
                 if any(name.endswith(ext) for ext in ['.pdf', '.xlsx', '.xls', '.docx', '.txt', '.csv']):
-                    resp = requests.get(att['url'], headers=headers)
+                    resp = http_client.get(att['url'], headers=headers)
                     if resp.status_code == 200:
                         content_to_analyze += _parse_file_content(name.split('.')[-1], resp.content, name)
         if not content_to_analyze.strip():
@@ -1837,7 +1911,7 @@ def analyze_shared_project(project_id):
                     for att in attachments:
                         name = att['name'].lower()
                         if any(name.endswith(ext) for ext in ['.pdf', '.xlsx', '.xls', '.docx', '.txt', '.csv']):
-                            resp = requests.get(att['url'], headers=headers)
+                            resp = http_client.get(att['url'], headers=headers)
                             if resp.status_code == 200:
                                 content += _parse_file_content(name.split('.')[-1], resp.content, name)
                 except: pass
@@ -2007,7 +2081,7 @@ def get_mails():
             url = f"{GRAPH_API_ENDPOINT}/users/{email}/mailFolders/{folder}/messages?$top=50&$select=id,subject,bodyPreview,sender,receivedDateTime,isRead,inferenceClassification"
         else:
             url = f"{GRAPH_API_ENDPOINT}/users/{email}/messages?$top=50&$select=id,subject,bodyPreview,sender,receivedDateTime,isRead,inferenceClassification"
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -2031,7 +2105,7 @@ def get_mail_details(message_id):
     }
     try:
         url = f"{GRAPH_API_ENDPOINT}/users/{email}/messages/{message_id}?$select=id,subject,body,sender,toRecipients,receivedDateTime,isRead"
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         if response.status_code == 200:
             return jsonify(response.json())
         else:
@@ -2052,7 +2126,7 @@ def delete_mail(message_id):
     headers = {"Authorization": f"Bearer {access_token}"}
     try:
         url = f"{GRAPH_API_ENDPOINT}/users/{email}/messages/{message_id}"
-        response = requests.delete(url, headers=headers)
+        response = http_client.delete(url, headers=headers)
         if response.status_code == 204:
             return jsonify({"success": True})
         else:
@@ -2092,7 +2166,7 @@ def mail_action(message_id, action):
         payload["message"]["toRecipients"] = [{"emailAddress": {"address": addr}} for addr in to_recipients]
     try:
         url = f"{GRAPH_API_ENDPOINT}/users/{email_addr}/messages/{message_id}/{action}"
-        response = requests.post(url, headers=headers, json=payload)
+        response = http_client.post(url, headers=headers, json=payload)
         if response.status_code == 202:
             return jsonify({"success": True})
         else:
@@ -2169,7 +2243,7 @@ def send_mail():
             mail_payload["message"]["attachments"] = attachments_list
     try:
         url = f"{GRAPH_API_ENDPOINT}/users/{user_email}/sendMail"
-        response = requests.post(url, headers=headers, json=mail_payload)
+        response = http_client.post(url, headers=headers, json=mail_payload)
         if response.status_code == 202:
             if task_id:
                 save_tracked_email(task_id, session_id, to_email, subject, tracking_id, user_email, body_content)
@@ -2240,7 +2314,7 @@ def save_mail_draft():
     try:
         if draft_id and draft_id != "null" and draft_id != "undefined":
             url = f"{GRAPH_API_ENDPOINT}/users/{user_email}/messages/{draft_id}"
-            response = requests.patch(url, headers=headers, json=mail_payload)
+            response = http_client.patch(url, headers=headers, json=mail_payload)
             if response.status_code == 200:
                 data = response.json()
                 return jsonify({"success": True, "webLink": data.get("webLink", ""), "id": data.get("id")})
@@ -2248,7 +2322,7 @@ def save_mail_draft():
                 return jsonify({"error": "Failed to update draft", "details": response.text}), response.status_code
         else:
             url = f"{GRAPH_API_ENDPOINT}/users/{user_email}/messages"
-            response = requests.post(url, headers=headers, json=mail_payload)
+            response = http_client.post(url, headers=headers, json=mail_payload)
             if response.status_code == 201:
                 data = response.json()
                 return jsonify({"success": True, "webLink": data.get("webLink", ""), "id": data.get("id")})
@@ -2270,7 +2344,7 @@ def search_users():
         token = get_access_token()
         headers = {"Authorization": f"Bearer {token}"}
         url = f"{GRAPH_API_ENDPOINT}/users?$filter=startswith(displayName,'{query}') or startswith(mail,'{query}') or startswith(userPrincipalName,'{query}')&$select=displayName,mail,userPrincipalName&$top=10"
-        resp = requests.get(url, headers=headers)
+        resp = http_client.get(url, headers=headers)
         if resp.status_code == 200:
             users_data = resp.json().get('value', [])
             return jsonify({"users": users_data})
@@ -2337,7 +2411,7 @@ def invite_to_project(project_id):
                         "toRecipients": [{"emailAddress": {"address": email}}]
                     }
                 }
-                requests.post(f"{GRAPH_API_ENDPOINT}/users/{user_email}/sendMail", headers=headers, json=mail_payload)
+                http_client.post(f"{GRAPH_API_ENDPOINT}/users/{user_email}/sendMail", headers=headers, json=mail_payload)
             except Exception as e:
                 log.error(f"Failed to send invite email to {email}", tag="MAIL", exc=e)
             success_count += 1
@@ -2786,6 +2860,16 @@ def api_admin_leaves():
         return jsonify({"success": True, "leaves": leaves})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
+@app.route("/api/admin/graph_stats", methods=["GET"])
+def api_admin_graph_stats():
+    """Graph throttling counters and per-host HTTP metrics. Admin-only."""
+    if "user" not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    email = session["user"].get("mail") or session["user"].get("userPrincipalName")
+    if not is_admin(email):
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    from graph_throttle import graph_throttle
+    return jsonify({"success": True, "throttle": graph_throttle.stats(), "http": http_client.stats()})
 # ==============================================================
 # ==============================================================
 # ==============================================================
@@ -2818,7 +2902,7 @@ def send_graph_email(to_email, subject, html_body):
             }
         }
         url = f"{GRAPH_API_ENDPOINT}/users/{from_email}/sendMail"
-        response = requests.post(url, headers=headers, json=message)
+        response = http_client.post(url, headers=headers, json=message)
         if response.status_code == 202:
             log.info(f"Leave email sent: '{subject}' → {to_email}", tag="LEAVE-MAIL")
             return True
@@ -2909,10 +2993,55 @@ def api_admin_reject_leave(doc_id):
         html_body = f"<p>Your leave request has been <b>Rejected</b>.</p><p>Remarks: {remarks}</p>"
         send_graph_email(target_user_email, "Leave Rejected — Hamdaz", html_body)
     return jsonify({"success": res})
+# HEALTH / READINESS / JOBS
+# ==============================================================
+@app.route("/api/admin/jobs", methods=["GET"])
+def api_admin_jobs():
+    """Background job metrics: runs, skips, failures, duration histogram, last success / error. Admin-only."""
+    if "user" not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    email = session["user"].get("mail") or session["user"].get("userPrincipalName")
+    if not is_admin(email):
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    return jsonify({"success": True, "leader": leader.is_leader(), "jobs": scheduler.stats(),
+                    "email_sync": email_sync.stats(), "mail_delta": mail_delta.stats()})
+@app.route("/api/admin/jobs/<name>/run", methods=["POST"])
+def api_admin_run_job(name):
+    """Runs a background job now (subject to its overlap guard and leader condition). Admin-only."""
+    if "user" not in session:
+        return jsonify({"success": False, "error": "Unauthorized"}), 401
+    email = session["user"].get("mail") or session["user"].get("userPrincipalName")
+    if not is_admin(email):
+        return jsonify({"success": False, "error": "Admin access required"}), 403
+    if not scheduler.trigger(name):
+        return jsonify({"success": False, "error": f"Unknown job '{name}'"}), 404
+    return jsonify({"success": True, "triggered": name})
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving, whatever the state of the warm-up."""
+    return jsonify({"status": "ok", "uptime_s": warmup.status()["uptime_s"]})
+@app.route("/readyz")
+def readyz():
+    """Readiness: 200 once every required warm-up task is ready, 503 (with per-task detail) before."""
+    status = warmup.status()
+    status["leader"] = leader.status()
+    return jsonify(status), (200 if status["ready"] else 503)
+# ==============================================================
 # START FLASK + BACKGROUND UPDATER
 # ==============================================================
-threading.Thread(target=background_data_updater, daemon=True).start()
-threading.Thread(target=background_email_updater, daemon=True).start()
-threading.Thread(target=background_maintenance_updater, daemon=True).start()
+# Jobs with a leader condition run in the lease holder only (leader.py)
+def _leader_with(feature):
+    return lambda: leader.is_leader() and warmup.is_ready(feature)
+scheduler.add("proposals_refresh", refresh_proposals, every=60, condition=_leader_with("proposals"))
+scheduler.add("follower_sync", follow_leader_snapshot, every=FOLLOWER_SYNC_INTERVAL,
+              condition=lambda: not leader.is_leader() and warmup.is_ready("proposals"))
+scheduler.add("supplier_email_sync", sync_all_pending_supplier_emails, every=45, mode="rate",
+              condition=leader.is_leader)
+scheduler.add("leave_expiry", sync_leave_expiry, every=1800, mode="rate", initial_delay=60,
+              condition=_leader_with("acl"))
+scheduler.add("quotes_sync", quotes.sync)      # on demand, e.g. right after a quote submit
+leader.start()
+warmup.start()
+scheduler.start()
 if __name__ == "__main__":
     app.run(debug=True)
@@ -5,16 +5,16 @@ import openai
 import pandas as pd
 from datetime import datetime
 from cosmos import search_quotes_by_item, search_item_distributors, search_procurement_knowledge
-from sharepoint_items import fetch_sharepoint_list
+from proposals_snapshot import proposals
 
 SITE_DOMAIN = "hamdaz1.sharepoint.com"
 SITE_PATH = "/sites/ProposalTeam"
 LIST_NAME = "Proposals"
 
 def get_user_tasks(current_username, is_admin_user=False, target_username=None, search_keyword=None):
-    """Fetches tasks from SharePoint."""
+    """Reads tasks from the shared Proposals snapshot."""
     try:
-        tasks = fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        tasks = list(proposals.current().items)
         
         if search_keyword:
             keyword = search_keyword.lower()
@@ -0,0 +1,201 @@
+"""
+dashboard_views.py — Per-user task lists, materialized from the Proposals snapshot
+==================================================================================
+Usage:
+    from dashboard_views import dashboard_views
+    proposals.subscribe(dashboard_views.on_snapshot)    # keep it in step with the snapshot
+
+    view = dashboard_views.for_user("JohnDoe")          # exact AssignedTo match
+    view.analytics()          # same shape as get_user_analytics_specific(df, "JohnDoe")
+    view.dashboard()          # analytics() narrowed for the dashboard (ongoing, BCD still ahead)
+    view.due_today_count()    # those dashboard tasks whose BCD falls on today (Asia/Dubai)
+
+A view holds one user's task records, already split into submitted and
+open, with each open task's DueDate and BCD reduced to UTC nanoseconds.
+Ongoing vs missed depends on the current time, so it is decided when the
+view is read, with plain comparisons over those numbers. Rendering a
+dashboard therefore does no DataFrame work at all.
+
+On a full publish every view is rebuilt from the snapshot frame. A delta
+rebuilds only the users it touches: the previous and the new assignee of
+every changed or removed item. Views are immutable and the user -> view
+map is swapped as a whole, so a request never sees a half-built view.
+"""
+
+import threading
+
+import pandas as pd
+import pytz
+
+from logger import log
+from sharepoint_items import normalize_assignees
+
+UAE_TZ = pytz.timezone("Asia/Dubai")
+
+
+def _ns(series):
+    """UTC nanoseconds per row, None for NaT."""
+    return [None if pd.isna(v) else v.value for v in series]
+
+
+def _now_ns(now=None):
+    return (now if now is not None else pd.Timestamp.now(tz="UTC")).value
+
+
+class UserDashboardView:
+    """One user's tasks, split once; time-dependent lists are cut on read."""
+
+    __slots__ = ("username", "user_tasks", "completed", "open_tasks", "orders_received")
+
+    def __init__(self, username, user_tasks=(), completed=(), open_tasks=(), orders_received=0):
+        self.username = username
+        self.user_tasks = tuple(user_tasks)     # records, snapshot order
+        self.completed = tuple(completed)       # records with SubmissionStatus == Submitted
+        self.open_tasks = tuple(open_tasks)     # (record, due_ns, bcd_ns, bcd_date), snapshot order
+        self.orders_received = orders_received
+
+    def _open_ongoing(self, now_ns):
+        return [entry for entry in self.open_tasks if entry[1] is not None and entry[1] >= now_ns]
+
+    def _ongoing(self, now_ns):
+        return [t for t, _, _, _ in self._open_ongoing(now_ns)]
+
+    def _missed(self, now_ns):
+        return [t for t, due, _, _ in self.open_tasks if due is not None and due < now_ns]
+
+    def _upcoming(self, now_ns):
+        """Ongoing tasks (DueDate not passed) whose BCD is still ahead, with the BCD's Dubai date."""
+        return [(t, day) for t, _, bcd, day in self._open_ongoing(now_ns) if bcd is not None and bcd > now_ns]
+
+    def analytics(self, now=None):
+        """Same dict get_user_analytics_specific builds from the DataFrame."""
+        now_ns = _now_ns(now)
+        ongoing = self._ongoing(now_ns)
+        missed = self._missed(now_ns)
+        return {
+            'Username': self.username,
+            'TotalTasks': len(self.user_tasks),
+            'OngoingTasksCount': len(ongoing),
+            'CompletedTasksCount': len(self.completed),
+            'MissedTasksCount': len(missed),
+            'OngoingTasks': ongoing,
+            'CompletedTasks': list(self.completed),
+            'MissedTasks': missed,
+            'OrdersReceived': self.orders_received,
+            'user_tasks': list(self.user_tasks),
+        }
+
+    def dashboard(self, now=None):
+        """analytics() with OngoingTasks further limited to tasks whose BCD is still ahead."""
+        now_ns = _now_ns(now)
+        data = self.analytics(now)
+        upcoming = [t for t, _ in self._upcoming(now_ns)]
+        data['OngoingTasks'] = upcoming
+        data['OngoingTasksCount'] = len(upcoming)
+        return data
+
+    def due_today_count(self, now=None):
+        now = now if now is not None else pd.Timestamp.now(tz="UTC")
+        today = now.tz_convert(UAE_TZ).date()
+        return sum(1 for _, day in self._upcoming(now.value) if day == today)
+
+
+class DashboardViews:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}            # AssignedTo -> UserDashboardView
+        self._owner = {}            # item id -> AssignedTo it was filed under
+        self.version = 0
+
+    # ----------------------------
+    # Maintenance
+    # ----------------------------
+    @staticmethod
+    def _build(frame):
+        """{AssignedTo: view} for every user in `frame` (a typed ingest frame)."""
+        if frame.empty or 'AssignedTo' not in frame.columns:
+            return {}
+        missing = pd.Series(pd.NaT, index=frame.index, dtype="datetime64[ns, UTC]")
+        due = pd.to_datetime(frame['DueDate'], utc=True) if 'DueDate' in frame.columns else missing
+        bcd = pd.to_datetime(frame['BCD'], utc=True) if 'BCD' in frame.columns else missing
+        due_ns, bcd_ns = _ns(due), _ns(bcd)
+        bcd_days = [None if pd.isna(v) else v.date() for v in bcd.dt.tz_convert(UAE_TZ)]
+        submitted = (frame['SubmissionStatus'] == 'Submitted').tolist() if 'SubmissionStatus' in frame.columns \
+            else [False] * len(frame)
+        # Same test as get_user_analytics_specific, which only counts when an 'Order status' column exists
+        if 'Order status' in frame.columns:
+            received = (frame['Order Status'] == 'Received').tolist()
+        else:
+            received = [False] * len(frame)
+        records = frame.to_dict('records')
+
+        views = {}
+        for user, positions in frame.groupby('AssignedTo', sort=False).indices.items():
+            user_tasks, completed, open_tasks = [], [], []
+            for p in positions:
+                user_tasks.append(records[p])
+                if submitted[p]:
+                    completed.append(records[p])
+                else:
+                    open_tasks.append((records[p], due_ns[p], bcd_ns[p], bcd_days[p]))
+            orders_received = sum(received[p] for p in positions)
+            views[user] = UserDashboardView(user, user_tasks, completed, open_tasks, orders_received)
+        return views
+
+    def rebuild(self, snapshot):
+        views = self._build(snapshot.df)
+        owner = dict(zip(snapshot.df['id'], snapshot.df['AssignedTo'])) \
+            if {'id', 'AssignedTo'} <= set(snapshot.df.columns) else {}
+        with self._lock:
+            self._views = views
+            self._owner = owner
+            self.version += 1
+
+    def apply_delta(self, snapshot, changed, removed_ids=()):
+        """Rebuilds only the views of users who gained or lost an item."""
+        df = snapshot.df
+        new_users = normalize_assignees(pd.Series([t.get('AssignedTo') for t in changed], dtype=object)).tolist()
+        with self._lock:
+            touched = {self._owner.get(t.get('id')) for t in changed}
+            touched.update(self._owner.get(rid) for rid in removed_ids)
+            touched.update(new_users)
+            touched.discard(None)
+            if not touched:
+                return
+
+            rows = df[df['AssignedTo'].isin(touched)] if 'AssignedTo' in df.columns else df.iloc[0:0]
+            rebuilt = self._build(rows)
+            views = dict(self._views)
+            for user in touched:
+                if user in rebuilt:
+                    views[user] = rebuilt[user]
+                else:
+                    views.pop(user, None)
+
+            owner = dict(self._owner)
+            for rid in removed_ids:
+                owner.pop(rid, None)
+            for t, user in zip(changed, new_users):
+                owner[t.get('id')] = user
+
+            self._views = views
+            self._owner = owner
+            self.version += 1
+        log.debug(f"Dashboard views rebuilt for {len(touched)} user(s)", tag="VIEWS")
+
+    def on_snapshot(self, snapshot, changed=None, removed_ids=()):
+        """proposals subscriber: full rebuild on a publish, touched users only on a delta."""
+        if changed is None:
+            self.rebuild(snapshot)
+        else:
+            self.apply_delta(snapshot, changed, removed_ids)
+
+    # ----------------------------
+    # Reads
+    # ----------------------------
+    def for_user(self, username):
+        """The user's view; an empty one if nothing is assigned to them."""
+        return self._views.get(username) or UserDashboardView(username)
+
+
+dashboard_views = DashboardViews()
@@ -0,0 +1,119 @@
+"""
+directory_cache.py — Shared org-directory cache (user id → display name)
+=======================================================================
+Usage:
+    from directory_cache import org_directory
+    user_cache = org_directory.names()          # {user_id: displayName}
+    flat = flatten_fields(item["fields"], user_cache)
+
+The first call pages through Graph `users/delta` once; afterwards only the
+saved deltaLink is followed, at most every DIRECTORY_SYNC_INTERVAL seconds,
+so steady-state callers read a dict and make no Graph calls. The map and
+deltaLink are persisted to .cache/user_directory.json for fast restarts.
+"""
+
+import os
+import threading
+import time
+
+import http_client
+from graph_auth import token_manager
+from local_store import load_json, save_json
+from logger import log
+
+GRAPH_API = "https://graph.microsoft.com/v1.0"
+CACHE_FILE = "user_directory.json"
+DIRECTORY_SYNC_INTERVAL = int(os.getenv("DIRECTORY_SYNC_INTERVAL", "900"))
+
+
+class OrgDirectory:
+    def __init__(self, cache_file=CACHE_FILE, sync_interval=DIRECTORY_SYNC_INTERVAL):
+        self.cache_file = cache_file
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()         # guards the swap of names / delta link
+        self._sync_lock = threading.Lock()    # one Graph sync at a time
+        self._last_sync = 0.0
+
+        saved = load_json(cache_file, default={}) or {}
+        self._names = saved.get("names", {})
+        self._delta_link = saved.get("delta_link")
+
+    def _page(self, url, headers):
+        """Follows one delta round to its deltaLink. Returns (changes, delta_link)."""
+        changes = []
+        while url:
+            resp = http_client.get(url, headers=headers)
+            if resp.status_code == 410:
+                raise ValueError("Directory delta token expired")
+            if resp.status_code != 200:
+                raise Exception(f"Error fetching users: {resp.text}")
+            data = resp.json()
+            changes.extend(data.get("value", []))
+            url = data.get("@odata.nextLink")
+            if not url:
+                return changes, data.get("@odata.deltaLink")
+        return changes, None
+
+    def sync(self, access_token=None):
+        """Applies directory changes since the last deltaLink (full load on first run)."""
+        with self._sync_lock:
+            return self._sync(access_token)
+
+    def _sync(self, access_token):
+        # Graph round trips run outside self._lock; only one sync at a time (caller holds _sync_lock)
+        headers = {"Authorization": f"Bearer {access_token or token_manager.get_token()}"}
+        with self._lock:
+            delta_link = self._delta_link
+        full = delta_link is None
+        url = delta_link or f"{GRAPH_API}/users/delta?$select=id,displayName,mail"
+        try:
+            changes, delta_link = self._page(url, headers)
+        except ValueError:
+            log.warn("Directory delta token expired — reloading all users.", tag="DIR")
+            full = True
+            changes, delta_link = self._page(f"{GRAPH_API}/users/delta?$select=id,displayName,mail", headers)
+
+        with self._lock:
+            # Copy-on-write so readers holding the old dict are never mutated mid-iteration
+            names = {} if full else dict(self._names)
+            for u in changes:
+                uid = u.get("id")
+                if "@removed" in u:
+                    names.pop(uid, None)
+                elif uid:
+                    # Delta rounds may carry only the changed properties: keep the cached name
+                    # unless a displayName came back; mail is only a fallback for a nameless entry
+                    if u.get("displayName"):
+                        names[uid] = u["displayName"]
+                    elif not names.get(uid):
+                        names[uid] = u.get("mail")
+            self._names = names
+            self._delta_link = delta_link
+            self._last_sync = time.time()
+        save_json(self.cache_file, {"names": names, "delta_link": delta_link})
+
+        if full:
+            log.info(f"Org directory loaded: {len(names)} users.", tag="DIR")
+        elif changes:
+            log.debug(f"Org directory: {len(changes)} change(s) applied.", tag="DIR")
+        return names
+
+    def names(self, access_token=None):
+        """Returns the current {user_id: displayName} map, syncing only when it is stale."""
+        if not self._names or time.time() - self._last_sync > self.sync_interval:
+            # With names cached, a caller never queues behind a sync another thread is running
+            if not self._sync_lock.acquire(blocking=not self._names):
+                return self._names
+            try:
+                if not self._names or time.time() - self._last_sync > self.sync_interval:
+                    return self._sync(access_token)
+            except Exception as e:
+                if not self._names:
+                    raise
+                log.error("Org directory sync failed — serving cached names", tag="DIR", exc=e)
+            finally:
+                self._sync_lock.release()
+        return self._names
+
+
+org_directory = OrgDirectory()
@@ -0,0 +1,170 @@
+"""
+email_sync.py — Bounded-concurrency supplier-reply sync across mailboxes
+========================================================================
+Usage:
+    from email_sync import email_sync, openai_limit
+
+    report = email_sync.run(
+        users,
+        collect=lambda user: ([...], [...]), # one mailbox read -> (carried-over replies, new replies)
+        process=lambda user, task: True,     # record one reply; True when it matched
+        defer=lambda user, task: None,       # reply left over when the user's budget ran out
+    )
+    with openai_limit:                       # around every OpenAI call made by the sync
+        client.chat.completions.create(...)
+    email_sync.stats()                       # last run + totals, for /api/admin/jobs
+
+A run is a two-stage pipeline on one worker pool (EMAIL_SYNC_WORKERS). Every
+user's collect() is submitted at once; as each finishes, its replies are
+fanned out as separate process() tasks on the same pool, so a slow mailbox
+or a long GPT extraction only holds up its own tasks. Tasks never wait on
+other tasks, so the pool can't deadlock on itself.
+
+Each user gets EMAIL_SYNC_USER_BUDGET seconds of processing, counted from
+the moment its collect() returns, so a slow mailbox read doesn't eat the
+budget. New replies still queued when the budget is spent go to defer()
+(the app hands them to mail_delta.defer(), which keeps every one for the
+next cycle) instead of running, so one busy mailbox can't stretch the cycle
+for everyone. Carried-over replies (deferred or failed last cycle) are
+submitted first and always run, so a mailbox that is always busy can't
+defer the same replies forever; mail_delta caps how many of those are
+re-read per cycle (MAIL_DELTA_MAX_REREAD), which bounds that extra work.
+
+Graph calls are already capped globally by graph_throttle
+(GRAPH_MAX_CONCURRENCY). OpenAI calls have no such limiter of their own, so
+openai_limit caps them at OPENAI_MAX_CONCURRENCY across every thread.
+
+Each run reports users, replies, matches, deferrals, failures, wall time
+and throughput (replies per second); the last run and running totals are
+kept for stats().
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from logger import log
+
+EMAIL_SYNC_WORKERS = int(os.getenv("EMAIL_SYNC_WORKERS", "8"))
+EMAIL_SYNC_USER_BUDGET = float(os.getenv("EMAIL_SYNC_USER_BUDGET", "30"))
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+
+
+class ConcurrencyLimit:
+    """A counting semaphore used as a context manager, with wait / peak metrics."""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._metrics = {"calls": 0, "peak_in_flight": 0, "queued_seconds": 0.0}
+
+    def __enter__(self):
+        started = time.monotonic()
+        self._slots.acquire()
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_flight += 1
+            self._metrics["calls"] += 1
+            self._metrics["queued_seconds"] += waited
+            self._metrics["peak_in_flight"] = max(self._metrics["peak_in_flight"], self._in_flight)
+        return self
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        return False
+
+    def stats(self):
+        with self._lock:
+            report = dict(self._metrics, in_flight=self._in_flight, limit=self.limit)
+        report["queued_seconds"] = round(report["queued_seconds"], 2)
+        return report
+
+
+class SupplierEmailSync:
+    def __init__(self, workers=EMAIL_SYNC_WORKERS, user_budget=EMAIL_SYNC_USER_BUDGET):
+        self.workers = workers
+        self.user_budget = user_budget
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="email-sync")
+        self._lock = threading.Lock()
+        self._last = None
+        self._totals = {"runs": 0, "users": 0, "replies": 0, "matched": 0, "deferred": 0, "failed": 0}
+
+    def _collect(self, user, collect):
+        carried, fresh = collect(user)
+        return carried, fresh, time.monotonic() + self.user_budget
+
+    def _process(self, user, task, deadline, process, defer):
+        if deadline is not None and time.monotonic() > deadline:
+            defer(user, task)
+            return "deferred"
+        return "matched" if process(user, task) else "failed"
+
+    def run(self, users, collect, process, defer):
+        """Syncs every user in `users`; returns the run report (also kept for stats())."""
+        started = time.monotonic()
+        report = {"users": len(users), "replies": 0, "matched": 0, "deferred": 0, "failed": 0,
+                  "collect_errors": 0, "by_user": {}}
+
+        collects = {self._pool.submit(self._collect, user, collect): user for user in users}
+        tasks = {}
+        for future in as_completed(collects):
+            user = collects[future]
+            try:
+                carried, fresh, deadline = future.result()
+            except Exception as e:
+                report["collect_errors"] += 1
+                log.error(f"Email sync error for {user}", tag="BG-SYNC", exc=e)
+                continue
+            replies = len(carried) + len(fresh)
+            report["replies"] += replies
+            report["by_user"][user] = {"replies": replies, "matched": 0}
+            for task in carried:
+                tasks[self._pool.submit(self._process, user, task, None, process, defer)] = user
+            for task in fresh:
+                tasks[self._pool.submit(self._process, user, task, deadline, process, defer)] = user
+
+        for future in as_completed(tasks):
+            user = tasks[future]
+            try:
+                outcome = future.result()
+            except Exception as e:
+                outcome = "failed"
+                log.error(f"Supplier reply processing failed for {user}", tag="BG-SYNC", exc=e)
+            report[outcome] += 1
+            if outcome == "matched":
+                report["by_user"][user]["matched"] += 1
+
+        elapsed = time.monotonic() - started
+        report["duration_s"] = round(elapsed, 3)
+        report["replies_per_s"] = round(report["replies"] / elapsed, 2) if elapsed > 0 else None
+        report["finished_at"] = time.time()
+        with self._lock:
+            self._last = report
+            self._totals["runs"] += 1
+            for key in ("users", "replies", "matched", "deferred", "failed"):
+                self._totals[key] += report[key]
+        return report
+
+    def stats(self):
+        with self._lock:
+            last = dict(self._last) if self._last else None
+            totals = dict(self._totals)
+        if last:
+            last.pop("by_user", None)
+        return {
+            "workers": self.workers,
+            "user_budget_s": self.user_budget,
+            "last_run": last,
+            "totals": totals,
+            "openai": openai_limit.stats(),
+        }
+
+
+openai_limit = ConcurrencyLimit("openai", OPENAI_MAX_CONCURRENCY)
+email_sync = SupplierEmailSync()
@@ -0,0 +1,179 @@
+"""
+graph_auth.py — Process-wide Microsoft Graph token manager
+==========================================================
+Usage:
+    from graph_auth import token_manager
+    token = token_manager.get_token()                      # Graph .default scope
+    token = token_manager.get_token("https://x/.default")  # any other app scope
+
+One ConfidentialClientApplication is shared by the whole process. Tokens are
+cached per scope and a daemon thread renews them REFRESH_MARGIN seconds
+before they expire, so request handlers and background ticks never wait on
+AAD in steady state.
+
+    token_manager.stats()  → {"hits": .., "misses": .., "refreshes": .., "failures": .., "scopes": [..]}
+"""
+
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from msal import ConfidentialClientApplication
+
+from logger import log
+
+load_dotenv(override=True)
+
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+# Renew a token this many seconds before it expires (background thread)
+REFRESH_MARGIN = int(os.getenv("GRAPH_TOKEN_REFRESH_MARGIN", "300"))
+# A cached token with less than this left is treated as a miss
+MIN_TOKEN_LIFETIME = 60
+
+
+class GraphTokenManager:
+    """Thread-safe client-credentials token cache with proactive refresh."""
+
+    def __init__(self, client_id, client_secret, tenant_id, refresh_margin=REFRESH_MARGIN):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.tenant_id = tenant_id
+        self.refresh_margin = refresh_margin
+
+        self._msal_app = None
+        self._tokens = {}                 # scope -> (access_token, expires_at)
+        self._lock = threading.Lock()        # guards _tokens / _counters; never held across a network call
+        self._app_lock = threading.Lock()
+        self._scope_locks = {}                # scope -> Lock; one AAD request per scope at a time
+        self._wakeup = threading.Event()
+        self._refresher = None
+        self._counters = {"hits": 0, "misses": 0, "refreshes": 0, "failures": 0}
+
+    # ----------------------------
+    # MSAL
+    # ----------------------------
+    def _app(self):
+        with self._app_lock:
+            if self._msal_app is None:
+                if not all([self.client_id, self.client_secret, self.tenant_id]):
+                    raise ValueError("CLIENT_ID, CLIENT_SECRET, and TENANT_ID must be set in .env")
+                self._msal_app = ConfidentialClientApplication(
+                    self.client_id,
+                    authority=f"https://login.microsoftonline.com/{self.tenant_id}",
+                    client_credential=self.client_secret
+                )
+            return self._msal_app
+
+    def _scope_lock(self, scope):
+        with self._lock:
+            return self._scope_locks.setdefault(scope, threading.Lock())
+
+    def _cached(self, scope):
+        """The cached token for `scope` if it still has MIN_TOKEN_LIFETIME left. Caller holds the lock."""
+        entry = self._tokens.get(scope)
+        if entry and entry[1] - time.time() > MIN_TOKEN_LIFETIME:
+            return entry[0]
+        return None
+
+    def _acquire(self, scope):
+        """Fetches a fresh token from AAD and swaps it into the cache.
+        Caller holds the scope lock, not self._lock: readers keep getting the old token meanwhile."""
+        result = self._app().acquire_token_for_client(scopes=[scope])
+        if "access_token" not in result:
+            with self._lock:
+                self._counters["failures"] += 1
+            raise Exception(f"Failed to get access token: {result.get('error_description') or result}")
+        expires_at = time.time() + int(result.get("expires_in", 3599))
+        with self._lock:
+            self._tokens[scope] = (result["access_token"], expires_at)
+        return result["access_token"]
+
+    # ----------------------------
+    # Public API
+    # ----------------------------
+    def get_token(self, scope=GRAPH_SCOPE):
+        """Returns a valid access token for `scope`, acquiring one only on a cache miss."""
+        with self._lock:
+            token = self._cached(scope)
+            if token:
+                self._counters["hits"] += 1
+                return token
+
+        with self._scope_lock(scope):
+            # Concurrent misses queue here; all but the first find the token the first one fetched
+            with self._lock:
+                token = self._cached(scope)
+                if token:
+                    self._counters["hits"] += 1
+                    return token
+                self._counters["misses"] += 1
+            token = self._acquire(scope)
+
+        self._ensure_refresher()
+        self._wakeup.set()
+        return token
+
+    def invalidate(self, scope=GRAPH_SCOPE):
+        """Drops a cached token, e.g. after Graph rejected it with 401."""
+        with self._lock:
+            self._tokens.pop(scope, None)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "scopes": sorted(self._tokens)}
+
+    # ----------------------------
+    # Background refresh
+    # ----------------------------
+    def _ensure_refresher(self):
+        if self._refresher and self._refresher.is_alive():
+            return
+        with self._lock:
+            if self._refresher and self._refresher.is_alive():
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="graph-token-refresh", daemon=True)
+            self._refresher.start()
+
+    def _next_refresh_in(self):
+        with self._lock:
+            if not self._tokens:
+                return None
+            soonest = min(expires_at for _, expires_at in self._tokens.values())
+        return max(0.0, soonest - self.refresh_margin - time.time())
+
+    def _refresh_loop(self):
+        while True:
+            delay = self._next_refresh_in()
+            self._wakeup.clear()
+            if delay is None or delay > 0:
+                self._wakeup.wait(timeout=delay)
+                continue
+
+            with self._lock:
+                due = [s for s, (_, exp) in self._tokens.items() if exp - time.time() <= self.refresh_margin]
+            for scope in due:
+                try:
+                    # Outside self._lock: callers keep being served the still-valid token meanwhile
+                    with self._scope_lock(scope):
+                        self._acquire(scope)
+                    with self._lock:
+                        self._counters["refreshes"] += 1
+                    log.debug(f"Token refreshed for {scope}", tag="AUTH")
+                except Exception as e:
+                    # Leave the old token in place; get_token() retries once it really expires
+                    log.error(f"Background token refresh failed for {scope}", tag="AUTH", exc=e)
+            with self._lock:
+                all_failed = due and all(self._tokens.get(s, (None, 0))[1] - time.time() <= self.refresh_margin
+                                         for s in due)
+            if all_failed:
+                # Every refresh failed — back off instead of spinning
+                self._wakeup.wait(timeout=30)
+
+
+token_manager = GraphTokenManager(
+    os.getenv("CLIENT_ID"),
+    os.getenv("CLIENT_SECRET"),
+    os.getenv("TENANT_ID"),
+)
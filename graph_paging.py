@@ -0,0 +1,79 @@
+"""
+graph_paging.py — Streaming iterator over paginated Graph collections
+=====================================================================
+Usage:
+    from graph_paging import iter_graph_items
+
+    # SharePoint list items, only the columns we need, 500 per page
+    for item in iter_graph_items(f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items",
+                                 fields=["Username", "Priority"], top=500):
+        ...
+
+    # Plain collections take $select
+    for user in iter_graph_items(f"{GRAPH_API}/users", select=["id", "displayName"]):
+        ...
+
+Pages are requested lazily while following @odata.nextLink, so callers
+that break out early never download the remaining pages, and no caller
+has to hold the whole collection in memory.
+"""
+
+import os
+from urllib.parse import urlencode
+
+import http_client
+from graph_auth import token_manager
+
+GRAPH_PAGE_SIZE = int(os.getenv("GRAPH_PAGE_SIZE", "500"))
+
+
+def build_query_url(url, select=None, fields=None, expand=None, top=None, odata_filter=None):
+    """
+    Appends OData query options to a Graph URL.
+
+    select  → $select=a,b                 (entity properties)
+    fields  → expand=fields($select=a,b)  (SharePoint list item columns)
+    expand  → raw expand clause, used when `fields` is not given
+    """
+    params = {}
+    if select:
+        params["$select"] = ",".join(select)
+    if fields:
+        params["expand"] = f"fields($select={','.join(fields)})"
+    elif expand:
+        params["expand"] = expand
+    if top:
+        params["$top"] = int(top)
+    if odata_filter:
+        params["$filter"] = odata_filter
+    if not params:
+        return url
+    sep = "&" if "?" in url else "?"
+    return f"{url}{sep}{urlencode(params, safe='$(),=/:')}"
+
+
+def iter_graph_pages(url, access_token=None, headers=None, on_response=None):
+    """
+    Yields the `value` array of each page, following @odata.nextLink.
+
+    on_response(resp) is called for every HTTP response before it is checked
+    (e.g. sp_ids.check_response to drop stale site/list IDs on 404).
+    """
+    request_headers = {"Authorization": f"Bearer {access_token or token_manager.get_token()}"}
+    request_headers.update(headers or {})
+    while url:
+        resp = http_client.get(url, headers=request_headers)
+        if on_response:
+            on_response(resp)
+        resp.raise_for_status()
+        data = resp.json()
+        yield data.get("value", [])
+        url = data.get("@odata.nextLink")
+
+
+def iter_graph_items(url, access_token=None, select=None, fields=None, expand=None, top=GRAPH_PAGE_SIZE,
+                     odata_filter=None, headers=None, on_response=None):
+    """Yields individual items across all pages, with optional $select / fields projection."""
+    url = build_query_url(url, select=select, fields=fields, expand=expand, top=top, odata_filter=odata_filter)
+    for page in iter_graph_pages(url, access_token, headers=headers, on_response=on_response):
+        yield from page
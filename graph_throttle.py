@@ -0,0 +1,195 @@
+"""
+graph_throttle.py — Client-side limiter for Microsoft Graph traffic
+==================================================================
+Usage:
+    from graph_throttle import graph_throttle
+    resp = graph_throttle.call(lambda: session.request("GET", url), method="GET", resource=resource_key(url))
+    graph_throttle.stats()   # throttled responses, retries, seconds spent waiting
+
+http_client routes every request to a Graph host through this limiter, so
+callers keep using http_client.get/post/... unchanged.
+
+Every call first takes a slot from a global concurrency budget and a token
+from a token bucket (steady rate + burst). A 429/503 answer (and 504 on
+idempotent requests) is retried after the Retry-After the service asked
+for, or with jittered exponential backoff when it gave none. A Retry-After
+also pauses the other callers of the same resource until it expires: the
+first two path segments after the API version (users/<id>, sites/<id>,
+...), since Graph throttles a mailbox or a site separately. A 429 on one
+mailbox during the mail sync doesn't stall the SharePoint refresh. After MAX_RETRIES the last response is returned
+as-is, so existing status-code handling still applies.
+
+Config (env):
+    GRAPH_MAX_CONCURRENCY   in-flight Graph requests, default 8
+    GRAPH_RATE_PER_SEC      sustained requests per second, default 10
+    GRAPH_BURST             token bucket size, default 20
+    GRAPH_MAX_RETRIES       retries per request, default 5
+"""
+
+import os
+import random
+import threading
+import time
+from urllib.parse import unquote, urlsplit
+
+from logger import log
+
+MAX_CONCURRENCY = int(os.getenv("GRAPH_MAX_CONCURRENCY", "8"))
+RATE_PER_SEC = float(os.getenv("GRAPH_RATE_PER_SEC", "10"))
+BURST = int(os.getenv("GRAPH_BURST", "20"))
+MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "5"))
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+THROTTLE_STATUSES = (429, 503)
+IDEMPOTENT_RETRY_STATUSES = (504,)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+
+def retry_after_seconds(headers):
+    """Parses a Retry-After header (seconds form). Returns None when absent or unusable."""
+    try:
+        value = float((headers or {}).get("Retry-After") or (headers or {}).get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, value)
+
+
+def resource_key(url):
+    """What Graph throttles a request under: 'users/<id>', 'sites/<id>', '$batch', ..."""
+    parts = [p for p in unquote(urlsplit(url).path).split("/") if p]
+    if parts and parts[0] in ("v1.0", "beta"):
+        parts = parts[1:]
+    return "/".join(parts[:2]).lower()
+
+
+def backoff_seconds(attempt):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+class GraphThrottle:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, rate_per_sec=RATE_PER_SEC, burst=BURST,
+                 max_retries=MAX_RETRIES):
+        self.max_concurrency = max_concurrency
+        self.rate_per_sec = rate_per_sec
+        self.burst = burst
+        self.max_retries = max_retries
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = {}          # resource_key -> monotonic time the Retry-After ends
+
+        self._metrics = {
+            "requests": 0,
+            "throttled_responses": 0,
+            "retries": 0,
+            "gave_up": 0,
+            "throttled_seconds": 0.0,    # sleeping on Retry-After / backoff
+            "queued_seconds": 0.0,       # waiting for a slot or a bucket token
+        }
+
+    # ----------------------------
+    # Admission
+    # ----------------------------
+    def _take_token(self, resource=None):
+        """Blocks until the bucket has a token and `resource` isn't paused. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                pause = self._paused_until.get(resource, 0.0) - now
+                if pause <= 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate_per_sec)
+                    self._refilled_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate_per_sec
+                else:
+                    delay = pause
+            time.sleep(delay)
+            waited += delay
+
+    def _add(self, key, value):
+        with self._lock:
+            self._metrics[key] += value
+
+    def pause(self, seconds, resources=()):
+        """Holds back callers of `resources` (resource_key values) for `seconds`."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = {r: t for r, t in self._paused_until.items() if t > now}
+            for resource in resources:
+                self._paused_until[resource] = max(self._paused_until.get(resource, 0.0), now + seconds)
+
+    def wait(self, seconds, reason="throttled", resources=()):
+        """Sleeps on behalf of a throttled caller and records it (used by $batch sub-request retries)."""
+        if seconds <= 0:
+            return
+        self.pause(seconds, resources)
+        log.warn(f"Graph {reason} — backing off {seconds:.1f}s", tag="THROTTLE")
+        time.sleep(seconds)
+        self._add("throttled_seconds", seconds)
+
+    # ----------------------------
+    # Calls
+    # ----------------------------
+    def _retryable(self, resp, method):
+        if resp.status_code in THROTTLE_STATUSES:
+            return True
+        return resp.status_code in IDEMPOTENT_RETRY_STATUSES and method in IDEMPOTENT_METHODS
+
+    def call(self, send, method="GET", resource=None):
+        """
+        Runs send() (which performs one HTTP request and returns a Response)
+        under the concurrency budget and rate limit, retrying throttled answers.
+        `resource` (resource_key of the URL) scopes the Retry-After pause.
+        """
+        method = method.upper()
+        for attempt in range(self.max_retries + 1):
+            start = time.monotonic()
+            with self._slots:
+                queued = time.monotonic() - start
+                queued += self._take_token(resource)
+                self._add("queued_seconds", queued)
+                self._add("requests", 1)
+                resp = send()
+
+            if not self._retryable(resp, method):
+                return resp
+
+            self._add("throttled_responses", 1)
+            if attempt >= self.max_retries:
+                self._add("gave_up", 1)
+                log.error(f"Graph still throttled after {self.max_retries} retries (HTTP {resp.status_code})",
+                          tag="THROTTLE")
+                return resp
+
+            wait = retry_after_seconds(resp.headers)
+            if wait is None:
+                wait = backoff_seconds(attempt)
+            self._add("retries", 1)
+            resp.close()
+            self.wait(wait, reason=f"HTTP {resp.status_code} on {method} {resource or ''}".rstrip(),
+                      resources=(resource,))
+        return resp
+
+    def stats(self):
+        with self._lock:
+            report = dict(self._metrics)
+            report["throttled_seconds"] = round(report["throttled_seconds"], 2)
+            report["queued_seconds"] = round(report["queued_seconds"], 2)
+            now = time.monotonic()
+            report["paused"] = {r: round(t - now, 2) for r, t in self._paused_until.items() if t > now}
+        report.update({
+            "max_concurrency": self.max_concurrency,
+            "rate_per_sec": self.rate_per_sec,
+            "burst": self.burst,
+        })
+        return report
+
+
+graph_throttle = GraphThrottle()
@@ -0,0 +1,137 @@
+"""
+http_client.py — Shared keep-alive HTTP client for Graph, SharePoint and Zoho
+============================================================================
+Usage:
+    import http_client
+    resp = http_client.get(url, headers=headers)
+    resp = http_client.post(url, headers=headers, json=payload)
+    http_client.stats()   # per-host request / error / latency / connection counters
+
+Drop-in for requests.get/post/patch/put/delete: same arguments, same
+requests.Response back, same requests exceptions. Every host gets its own
+pooled Session, so TCP+TLS handshakes are paid once per connection instead
+of once per call. Every call gets a default (connect, read) timeout and
+asks for gzip. Requests to Graph hosts also go through graph_throttle
+(concurrency budget, rate limit, Retry-After / backoff on 429 and 503).
+
+Config (env):
+    HTTP_CONNECT_TIMEOUT   seconds, default 5
+    HTTP_READ_TIMEOUT      seconds, default 60
+    HTTP_POOL_MAXSIZE      connections kept per host, default 20
+"""
+
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from graph_throttle import graph_throttle, resource_key
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+THROTTLED_HOSTS = ("graph.microsoft.com",)
+
+_sessions = {}          # host -> requests.Session
+_metrics = {}           # host -> counters
+_lock = threading.Lock()
+
+
+def _new_metrics():
+    return {"requests": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0, "status": {}}
+
+
+def _session_for(host):
+    session = _sessions.get(host)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, pool_block=False)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+            _sessions[host] = session
+            _metrics[host] = _new_metrics()
+    return session
+
+
+def _record(host, elapsed_ms, status=None, error=False):
+    with _lock:
+        m = _metrics.setdefault(host, _new_metrics())
+        m["requests"] += 1
+        m["total_ms"] += elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+        if error:
+            m["errors"] += 1
+        if status is not None:
+            m["status"][status] = m["status"].get(status, 0) + 1
+
+
+def request(method, url, **kwargs):
+    """Sends a request on the pooled session for the URL's host."""
+    host = urlsplit(url).netloc.lower()
+    session = _session_for(host)
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+
+    def send():
+        start = time.perf_counter()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            _record(host, (time.perf_counter() - start) * 1000, error=True)
+            raise
+        _record(host, (time.perf_counter() - start) * 1000, status=resp.status_code, error=resp.status_code >= 500)
+        return resp
+
+    if host in THROTTLED_HOSTS:
+        return graph_throttle.call(send, method=method, resource=resource_key(url))
+    return send()
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def patch(url, **kwargs):
+    return request("PATCH", url, **kwargs)
+
+
+def put(url, **kwargs):
+    return request("PUT", url, **kwargs)
+
+
+def delete(url, **kwargs):
+    return request("DELETE", url, **kwargs)
+
+
+def stats():
+    """Per-host counters: requests, errors, avg/max latency (ms), status codes, pooled connections."""
+    report = {}
+    with _lock:
+        for host, m in _metrics.items():
+            opened = 0
+            session = _sessions.get(host)
+            if session is not None:
+                pools = session.get_adapter("https://").poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    opened += getattr(pool, "num_connections", 0) if pool else 0
+            report[host] = {
+                "requests": m["requests"],
+                "errors": m["errors"],
+                "avg_ms": round(m["total_ms"] / m["requests"], 1) if m["requests"] else 0.0,
+                "max_ms": round(m["max_ms"], 1),
+                "status": dict(m["status"]),
+                "connections_opened": opened,
+            }
+    return report
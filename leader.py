@@ -0,0 +1,138 @@
+"""
+leader.py — One background-job leader per host, elected with an SQLite lease
+============================================================================
+Usage:
+    from leader import leader
+    leader.start()                 # joins the election, renews in the background
+    if leader.is_leader():         # cheap; check at the top of every job iteration
+        ...Graph / Cosmos / OpenAI work...
+    leader.wait(timeout=5)         # block until this worker is (or becomes) leader
+    leader.status()
+
+Every gunicorn worker imports the app and starts the same background loops.
+Only the worker holding the lease does their work; the others follow the
+snapshot the leader publishes to SQLite (shared_snapshot), so Graph,
+Cosmos and OpenAI traffic stay the same however many workers run.
+
+The lease is one row in .cache/leader.sqlite: (name, holder, expires_at).
+A worker takes it when the row is missing, expired, or already its own,
+inside BEGIN IMMEDIATE, so two workers can never both win. The holder
+renews it every LEADER_LEASE_TTL / 3 seconds from its own thread, so a
+long job iteration never lets it lapse. If the leader dies or hangs, the
+lease expires and the next follower to try takes over within one TTL.
+"""
+
+import atexit
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from local_store import cache_path
+from logger import log
+
+LEADER_DB = "leader.sqlite"
+LEADER_LEASE_TTL = float(os.getenv("LEADER_LEASE_TTL", "30"))
+
+
+class LeaderLease:
+    def __init__(self, name="background-jobs", ttl=LEADER_LEASE_TTL, db_name=LEADER_DB):
+        self.name = name
+        self.ttl = ttl
+        self.db_name = db_name
+        self._token = uuid.uuid4().hex[:8]
+        self._leader = threading.Event()
+        self._started = False
+        self.acquired_at = None
+
+    @property
+    def holder(self):
+        # pid read on every call: a worker forked after import must not share its parent's identity
+        return f"{socket.gethostname()}:{os.getpid()}:{self._token}"
+
+    def _connect(self):
+        conn = sqlite3.connect(cache_path(self.db_name), timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return conn
+
+    def try_acquire(self):
+        """Takes or renews the lease. Returns True if this worker holds it afterwards."""
+        now = time.time()
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT holder, expires_at FROM lease WHERE name = ?", (self.name,)).fetchone()
+                mine = row is None or row[0] == self.holder or row[1] < now
+                if mine:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO lease (name, holder, expires_at) VALUES (?, ?, ?)",
+                        (self.name, self.holder, now + self.ttl),
+                    )
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Can't prove we hold it: step down rather than risk two leaders
+            log.error("Leader lease check failed", tag="LEADER", exc=e)
+            mine = False
+
+        if mine and not self._leader.is_set():
+            self.acquired_at = now
+            self._leader.set()
+            log.info(f"This worker ({self.holder}) is now the background-job leader", tag="LEADER")
+        elif not mine and self._leader.is_set():
+            self._leader.clear()
+            self.acquired_at = None
+            log.warn(f"This worker ({self.holder}) lost the background-job lease", tag="LEADER")
+        return mine
+
+    def release(self):
+        """Gives the lease up (on shutdown) so a follower can take over without waiting a TTL."""
+        if not self._leader.is_set():
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM lease WHERE name = ? AND holder = ?", (self.name, self.holder))
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            pass
+        self._leader.clear()
+
+    def _renew_loop(self):
+        while True:
+            self.try_acquire()
+            time.sleep(self.ttl / 3)
+
+    def start(self):
+        """Joins the election now and keeps renewing / retrying in a daemon thread."""
+        if self._started:
+            return
+        self._started = True
+        self.try_acquire()
+        threading.Thread(target=self._renew_loop, name="leader-lease", daemon=True).start()
+        atexit.register(self.release)
+
+    def is_leader(self):
+        return self._leader.is_set()
+
+    def wait(self, timeout=None):
+        return self._leader.wait(timeout)
+
+    def status(self):
+        return {
+            "holder": self.holder,
+            "leader": self.is_leader(),
+            "since": self.acquired_at,
+            "ttl_s": self.ttl,
+        }
+
+
+leader = LeaderLease()
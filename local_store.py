@@ -0,0 +1,64 @@
+"""
+local_store.py — On-disk cache helpers shared by the SharePoint/Graph caches
+============================================================================
+Usage:
+    from local_store import load_json, save_json, cache_path
+
+Files live in HAMDAZ_CACHE_DIR (default: ./.cache next to this file).
+Writes go to a temp file first and are swapped in with os.replace, so a
+crash or a concurrent reader never sees a half-written file.
+"""
+
+import json
+import os
+import tempfile
+
+from logger import log
+
+CACHE_DIR = os.getenv(
+    "HAMDAZ_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+)
+
+
+def cache_path(name):
+    """Absolute path of a file inside the cache directory (created on demand)."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def atomic_write(name, data, mode="w"):
+    """Writes `data` to cache file `name` atomically."""
+    path = cache_path(name)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return path
+
+
+def load_json(name, default=None):
+    """Reads a JSON cache file, returning `default` if it is missing or corrupt."""
+    path = cache_path(name)
+    if not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        log.warn(f"Ignoring unreadable cache file {name}", tag="CACHE", exc=e)
+        return default
+
+
+def save_json(name, data):
+    """Writes a JSON cache file atomically. Failures are logged, never raised."""
+    try:
+        return atomic_write(name, json.dumps(data, default=str))
+    except Exception as e:
+        log.error(f"Failed to write cache file {name}", tag="CACHE", exc=e)
+        return None
@@ -0,0 +1,289 @@
+"""
+mail_delta.py — Incremental inbox sync and local supplier-reply matching
+=======================================================================
+Usage:
+    from mail_delta import mail_delta, PendingReplyIndex
+    index = PendingReplyIndex(pending_tracked_emails)          # from Cosmos
+    for msg in mail_delta.poll(user_email, access_token, since=index.oldest_created()):
+        tracked = index.match(msg)                             # None, or the tracked email it answers
+        ...
+        index.resolve(tracked["id"])                           # once the reply was recorded
+        mail_delta.retry_later(user_email, msg["id"])          # ...or, if processing failed
+        mail_delta.defer(user_email, msg["id"])                # ...or, if there was no time left to process it
+    mail_delta.take_retries(user_email, access_token)          # next cycle: the deferred and failed messages
+
+Each mailbox is read with Graph `mailFolders/<folder>/messages/delta`, once
+per folder in MAIL_DELTA_FOLDERS (well-known names or folder ids; default
+"inbox,junkemail"). The deltaLink from the last round is persisted per
+mailbox and folder in .cache/mail_delta.json, so a cycle costs one
+incremental call per folder (plus paging when many messages arrived) and
+returns only messages that are new or changed since the previous cycle.
+The first round for a folder is limited to messages received since the
+oldest pending tracked email (or MAIL_DELTA_LOOKBACK_DAYS). An expired
+delta token starts that folder over the same way.
+
+Graph has no mailbox-wide message delta, so this is a narrower scope
+than the old per-email `/messages?$search=`, which covered every folder:
+a reply that a mail rule files into some other folder is not seen unless
+that folder is added to MAIL_DELTA_FOLDERS.
+
+Matching is local. PendingReplyIndex indexes the pending tracked emails
+by the `REF:<tracking id>` token that goes out hidden in every tracked
+email, and by supplier address. A message is only considered when its
+sender is a tracked supplier (the old per-email search used `from:` too).
+It then matches by REF when the body carries one, or, without a REF, by
+subject keywords against that supplier's pending emails.
+
+The deltaLink moves past every message it returns, so a message that was
+not processed has to be remembered by id. defer() (the sync ran out of
+time for it) keeps every id, uncapped. retry_later() (processing failed)
+keeps the last MAIL_DELTA_MAX_RETRIES per mailbox, so a message that
+always fails can't grow the state file forever; each id dropped that way
+is logged and counted in stats(). take_retries() re-reads the queued ids
+through Graph $batch (20 per round trip), at most MAIL_DELTA_MAX_REREAD
+per mailbox per cycle, oldest first; the rest wait for the next cycle.
+It keeps an id queued when Graph could not return the message, and drops
+it only when the message is gone (404).
+
+MAIL_GRAPH_API sets the Graph base URL (the $batch calls included), so a
+local fake server can stand in for Graph (see scratch/fake_graph_mail.py).
+"""
+
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+import http_client
+from graph_batch import execute_batch
+from local_store import load_json, save_json
+from logger import log
+
+MAIL_GRAPH_API = os.getenv("MAIL_GRAPH_API", "https://graph.microsoft.com/v1.0").rstrip("/")
+MAIL_DELTA_LOOKBACK_DAYS = int(os.getenv("MAIL_DELTA_LOOKBACK_DAYS", "30"))
+MAIL_DELTA_PAGE_SIZE = int(os.getenv("MAIL_DELTA_PAGE_SIZE", "50"))
+MAIL_DELTA_FOLDERS = [f.strip() for f in os.getenv("MAIL_DELTA_FOLDERS", "inbox,junkemail").split(",") if f.strip()]
+MAIL_DELTA_MAX_RETRIES = 50      # failed message ids kept per mailbox (deferred ones are never dropped)
+MAIL_DELTA_MAX_REREAD = int(os.getenv("MAIL_DELTA_MAX_REREAD", "100"))   # queued ids re-read per mailbox per cycle
+STATE_FILE = "mail_delta.json"
+MESSAGE_FIELDS = "id,subject,bodyPreview,body,from,receivedDateTime"
+
+REF_PATTERN = re.compile(r'REF:([a-f0-9\-]{36})')
+_SUBJECT_NOISE = ("Re:", "RE:", "Fwd:", "Procurement Inquiry for")
+
+
+def subject_keywords(subject):
+    """The first few significant words of a tracked subject (same rule the old KQL search used)."""
+    clean = subject or ""
+    for noise in _SUBJECT_NOISE:
+        clean = clean.replace(noise, "")
+    return [k.lower() for k in clean.split() if len(k) > 2][:4]
+
+
+def _graph_time(value):
+    """ISO timestamp (naive means UTC) -> the 'YYYY-MM-DDTHH:MM:SSZ' form Graph filters accept."""
+    ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _sender(msg):
+    return ((msg.get("from") or {}).get("emailAddress") or {}).get("address", "").lower()
+
+
+class PendingReplyIndex:
+    """Pending tracked emails, indexed by tracking id and by supplier address."""
+
+    def __init__(self, pending):
+        self.by_id = {}
+        self.by_supplier = {}
+        for pe in sorted(pending, key=lambda p: p.get("created_at") or ""):
+            self.by_id[pe["id"]] = pe
+            self.by_supplier.setdefault((pe.get("to_email") or "").lower(), []).append(pe)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def oldest_created(self):
+        dates = [pe.get("created_at") for pe in self.by_id.values() if pe.get("created_at")]
+        return min(dates) if dates else None
+
+    def match(self, msg):
+        """The pending tracked email `msg` replies to, or None."""
+        candidates = self.by_supplier.get(_sender(msg))
+        if not candidates:
+            return None
+        body = (msg.get("body") or {}).get("content", "")
+        found_ref = REF_PATTERN.search(body)
+        if found_ref:
+            pe = self.by_id.get(found_ref.group(1))
+            return pe if pe in candidates else None
+        subject = (msg.get("subject") or "").lower()
+        for pe in candidates:
+            if all(k in subject for k in subject_keywords(pe.get("subject", ""))):
+                return pe
+        return None
+
+    def resolve(self, tracking_id):
+        """Drops a tracked email once its reply is recorded, so later messages can't match it again."""
+        pe = self.by_id.pop(tracking_id, None)
+        if pe is not None:
+            self.by_supplier[(pe.get("to_email") or "").lower()].remove(pe)
+
+
+class MailboxDelta:
+    def __init__(self, base_url=MAIL_GRAPH_API, state_file=STATE_FILE, folders=MAIL_DELTA_FOLDERS):
+        self.base_url = base_url.rstrip("/")
+        self.state_file = state_file
+        self.folders = list(folders)
+        self._lock = threading.Lock()
+        # mailbox -> {"delta_links": {folder: link}, "retry": [id], "deferred": [id]}
+        self._state = load_json(state_file, default={}) or {}
+        self._counters = {"deferred": 0, "retried": 0, "evicted": 0, "gone": 0, "refetch_failed": 0}
+
+    def _mailbox(self, mailbox):
+        with self._lock:
+            state = self._state.setdefault(mailbox.lower(), {"delta_links": {}, "retry": []})
+            state.setdefault("deferred", [])
+            if "delta_link" in state:
+                # State written before folders were tracked separately: that link was the inbox's
+                state.setdefault("delta_links", {})["inbox"] = state.pop("delta_link")
+            return state
+
+    def _save(self):
+        with self._lock:
+            save_json(self.state_file, self._state)
+
+    def message_url(self, mailbox, message_id):
+        """URL of one message, for fetching it or marking it read."""
+        return f"{self.base_url}/users/{quote(mailbox)}/messages/{quote(message_id, safe='')}"
+
+    def _initial_url(self, mailbox, folder, since):
+        if not since:
+            since = datetime.now(timezone.utc) - timedelta(days=MAIL_DELTA_LOOKBACK_DAYS)
+        since = _graph_time(since if isinstance(since, str) else since.isoformat())
+        return (f"{self.base_url}/users/{quote(mailbox)}/mailFolders/{quote(folder)}/messages/delta"
+                f"?$select={MESSAGE_FIELDS}&$filter=receivedDateTime+ge+{since}")
+
+    def _poll_folder(self, mailbox, folder, delta_link, headers, since):
+        """(messages, new delta link) for one folder, reading every page."""
+        url = delta_link or self._initial_url(mailbox, folder, since)
+        messages, delta_link, restarted = [], None, False
+        while url:
+            resp = http_client.get(url, headers=headers)
+            expired = resp.status_code == 410 or (resp.status_code == 400 and "syncStateNotFound" in resp.text)
+            if expired and not restarted:
+                log.warn(f"Mail delta token expired for {mailbox}/{folder}, starting over", tag="MAIL-DELTA")
+                restarted = True
+                url, messages = self._initial_url(mailbox, folder, since), []
+                continue
+            if resp.status_code != 200:
+                raise Exception(f"Mail delta failed for {mailbox}/{folder}: HTTP {resp.status_code} {resp.text[:200]}")
+            data = resp.json()
+            messages.extend(m for m in data.get("value", []) if "@removed" not in m)
+            url = data.get("@odata.nextLink")
+            delta_link = data.get("@odata.deltaLink") or delta_link
+        return messages, delta_link
+
+    def poll(self, mailbox, access_token, since=None):
+        """Messages new or changed in the tracked folders since the last poll (removed ones are left out)."""
+        state = self._mailbox(mailbox)
+        headers = {"Authorization": f"Bearer {access_token}", "Prefer": f"odata.maxpagesize={MAIL_DELTA_PAGE_SIZE}"}
+        messages, links = [], {}
+        for folder in self.folders:
+            found, links[folder] = self._poll_folder(mailbox, folder, state["delta_links"].get(folder), headers, since)
+            messages.extend(found)
+
+        # Only advance once every folder was read in full; a failure above replays this round next time
+        advanced = {folder: link for folder, link in links.items() if link}
+        if advanced:
+            state["delta_links"].update(advanced)
+            self._save()
+        return messages
+
+    def fetch_message(self, mailbox, message_id, access_token):
+        resp = http_client.get(
+            f"{self.message_url(mailbox, message_id)}?$select={MESSAGE_FIELDS}",
+            headers={"Authorization": f"Bearer {access_token}"},
+        )
+        return resp.json() if resp.status_code == 200 else None
+
+    def defer(self, mailbox, message_id):
+        """Remembers a message the sync had no time left for; never dropped until take_retries() reads it."""
+        state = self._mailbox(mailbox)
+        with self._lock:
+            if message_id in state["deferred"]:
+                return
+            state["deferred"].append(message_id)
+            self._counters["deferred"] += 1
+        self._save()
+
+    def retry_later(self, mailbox, message_id):
+        """Remembers a message whose processing failed; take_retries() hands it back next cycle."""
+        state = self._mailbox(mailbox)
+        with self._lock:
+            retry = state["retry"]
+            if message_id in retry:
+                return
+            retry.append(message_id)
+            self._counters["retried"] += 1
+            evicted = retry[:-MAIL_DELTA_MAX_RETRIES]
+            del retry[:-MAIL_DELTA_MAX_RETRIES]
+            self._counters["evicted"] += len(evicted)
+        for mid in evicted:
+            log.warn(f"Retry queue for {mailbox} is full, giving up on message {mid}", tag="MAIL-DELTA")
+        self._save()
+
+    def take_retries(self, mailbox, access_token, limit=MAIL_DELTA_MAX_REREAD):
+        """Re-reads up to `limit` deferred and failed messages (oldest first) through Graph $batch.
+        An id stays queued when Graph couldn't return the message; it is dropped only once the message is gone."""
+        state = self._mailbox(mailbox)
+        with self._lock:
+            queued = [("deferred", mid) for mid in state["deferred"]] + [("retry", mid) for mid in state["retry"]]
+            queued = queued[:limit]
+            for queue, mid in queued:
+                state[queue].remove(mid)
+        if not queued:
+            return []
+
+        sub_requests = [
+            {"method": "GET", "url": f"/users/{quote(mailbox)}/messages/{quote(mid, safe='')}?$select={MESSAGE_FIELDS}"}
+            for _, mid in queued
+        ]
+        try:
+            results = execute_batch(sub_requests, access_token, graph_api=self.base_url)
+        except Exception as e:
+            log.warn(f"Could not re-read {len(queued)} message(s) for {mailbox}, keeping them queued",
+                     tag="MAIL-DELTA", exc=e)
+            results = [{"status": 0, "body": None, "headers": {}}] * len(queued)
+
+        messages, keep = [], {"deferred": [], "retry": []}
+        for (queue, mid), result in zip(queued, results):
+            if result["status"] == 200 and result["body"]:
+                messages.append(result["body"])
+            elif result["status"] == 404 and result["body"]:
+                # A 404 from the $batch call itself has no body; only a sub-response 404 means the message is gone
+                with self._lock:
+                    self._counters["gone"] += 1
+            else:
+                keep[queue].append(mid)
+                with self._lock:
+                    self._counters["refetch_failed"] += 1
+        with self._lock:
+            # Ids we put back go first, ahead of what was past the limit and anything queued meanwhile
+            state["deferred"] = keep["deferred"] + [m for m in state["deferred"] if m not in keep["deferred"]]
+            state["retry"] = keep["retry"] + [m for m in state["retry"] if m not in keep["retry"]]
+        self._save()
+        return messages
+
+    def stats(self):
+        with self._lock:
+            report = dict(self._counters)
+            report["queued_deferred"] = sum(len(s.get("deferred", [])) for s in self._state.values())
+            report["queued_retry"] = sum(len(s.get("retry", [])) for s in self._state.values())
+        return report
+
+
+mail_delta = MailboxDelta()
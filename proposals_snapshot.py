@@ -0,0 +1,161 @@
+"""
+proposals_snapshot.py — Shared, versioned read-only view of the Proposals list
+=============================================================================
+Usage:
+    from proposals_snapshot import proposals
+    snap = proposals.current()
+    snap.version, len(snap)
+    snap.get(item_id)                          # by id
+    snap.for_user("JohnDoe")                   # AssignedTo, spaces/case ignored
+    snap.where("Status", "Ongoing")            # exact value on an indexed field
+    snap.where_match("AssignedTo", lambda v: "john" in str(v).lower())
+    snap.df                                    # typed DataFrame, shared and read-only
+    df = snap.frame()                          # private copy, when you need to add columns
+
+The background delta loop is the only writer: it calls
+proposals.apply_delta(changed, removed_ids) and a new snapshot is built and
+swapped in atomically. Request handlers only ever read the snapshot they
+were handed, so a refresh never changes data under a running request.
+Derived views register with proposals.subscribe(callback) and get
+callback(snapshot, changed, removed_ids) for every new version. `changed`
+is None when the whole list was replaced.
+
+Items and the DataFrame are shared between requests and must not be
+mutated — copy an item (dict(item)) before decorating it. The DataFrame is
+typed once at ingest (items_to_dataframe: tz-aware dates, categorical
+statuses, normalized AssignedTo), so analytics helpers read snap.df
+directly. pandas has no read-only frames, so this is by convention: a
+helper that needs extra columns works on frame() or its own filtered copy.
+"""
+
+import threading
+import time
+
+from logger import log
+from sharepoint_items import fetch_sharepoint_list, items_to_dataframe
+
+SITE_DOMAIN = "hamdaz1.sharepoint.com"
+SITE_PATH = "/sites/ProposalTeam"
+LIST_NAME = "Proposals"
+
+INDEXED_FIELDS = ("AssignedTo", "Status", "SubmissionStatus")
+
+
+def _index_key(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return str(value)
+
+
+def _normalize_user(name):
+    return str(name or "").replace(" ", "").lower()
+
+
+class ProposalsSnapshot:
+    """One immutable version of the list plus its secondary indexes."""
+
+    def __init__(self, items, version, df=None):
+        self.version = version
+        self.built_at = time.time()
+        self.items = tuple(items)
+        self.by_id = {t["id"]: t for t in self.items if "id" in t}
+
+        # field -> value -> positions in self.items (ascending, so list order is kept)
+        self.indexes = {}
+        for field in INDEXED_FIELDS:
+            index = {}
+            for pos, t in enumerate(self.items):
+                index.setdefault(_index_key(t.get(field, "")), []).append(pos)
+            self.indexes[field] = index
+
+        self.users = {}             # normalized AssignedTo -> raw AssignedTo values
+        for value in self.indexes["AssignedTo"]:
+            self.users.setdefault(_normalize_user(value), []).append(value)
+
+        self.df = df if df is not None else items_to_dataframe(list(self.items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def _collect(self, field, values):
+        index = self.indexes[field]
+        if len(values) == 1:
+            return [self.items[p] for p in index.get(values[0], ())]
+        positions = sorted(p for v in values for p in index.get(v, ()))
+        return [self.items[p] for p in positions]
+
+    def get(self, item_id):
+        return self.by_id.get(item_id)
+
+    def where(self, field, value):
+        """Items whose `field` equals `value` exactly (field must be in INDEXED_FIELDS)."""
+        return self._collect(field, [_index_key(value)])
+
+    def where_match(self, field, predicate):
+        """Items whose `field` value satisfies predicate(value); tested once per distinct value."""
+        return self._collect(field, [v for v in self.indexes[field] if predicate(v)])
+
+    def for_user(self, username):
+        """Items assigned to `username`, ignoring spaces and case."""
+        return self._collect("AssignedTo", self.users.get(_normalize_user(username), []))
+
+    def frame(self):
+        """A private copy of the DataFrame, safe to modify."""
+        return self.df.copy()
+
+
+class ProposalsStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = ProposalsSnapshot([], version=0)
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """callback(snapshot, changed, removed_ids) runs after every publish (changed=None on a full one)."""
+        self._subscribers.append(callback)
+
+    def current(self):
+        """The latest snapshot. Loads the list on first use if nothing was published yet."""
+        snap = self._current
+        if snap.version == 0:
+            snap = self.load(lambda: fetch_sharepoint_list(SITE_DOMAIN, SITE_PATH, LIST_NAME))
+        return snap
+
+    def load(self, fetch):
+        """Publishes fetch() unless a snapshot exists already; concurrent callers wait for the first load."""
+        with self._lock:
+            if self._current.version == 0:
+                self._publish(fetch())
+            return self._current
+
+    def _publish(self, items, changed=None, removed_ids=()):
+        snap = ProposalsSnapshot(items, version=self._current.version + 1)
+        self._current = snap
+        log.debug(f"Proposals snapshot v{snap.version}: {len(snap)} item(s)", tag="SNAPSHOT")
+        for callback in list(self._subscribers):
+            try:
+                callback(snap, changed, removed_ids)
+            except Exception as e:
+                log.error("Proposals snapshot subscriber failed", tag="SNAPSHOT", exc=e)
+        return snap
+
+    def publish(self, items):
+        """Replaces the whole snapshot (initial load, or full resync after a lost delta token)."""
+        with self._lock:
+            return self._publish(items)
+
+    def apply_delta(self, changed, removed_ids=()):
+        """Builds the next snapshot from the current one plus a delta. Returns it."""
+        changed, removed_ids = list(changed), list(removed_ids)
+        with self._lock:
+            by_id = dict(self._current.by_id)
+            for t in changed:
+                by_id[t["id"]] = t
+            for rid in removed_ids:
+                by_id.pop(rid, None)
+            return self._publish(list(by_id.values()), changed=changed, removed_ids=removed_ids)
+
+
+proposals = ProposalsStore()
@@ -0,0 +1,143 @@
+"""
+quotes_cache.py — Delta-synced replica of the SharePoint Quotes list
+===================================================================
+Usage:
+    from quotes_cache import quotes
+    quote = quotes.get(quote_id)                   # point lookup, None if unknown
+    mine = quotes.by_creator(user_name)            # QuoteCreator index
+    open_ = quotes.by_status("Pending", "Approved")  # ApprovalStatus index
+    quotes.mark_stale()                            # after writing to the list
+
+The first read loads the whole list once. After that, a read that finds the
+replica older than QUOTES_SYNC_INTERVAL seconds serves the current data and
+starts a background delta sync (get_latest_delta_link / fetch_sharepoint_delta),
+so requests never wait on Graph. A get() for an id the replica has not seen
+yet (a quote created a moment ago) syncs synchronously before giving up,
+but at most once per QUOTES_MISS_SYNC_INTERVAL seconds: a bogus or deleted
+id just returns None and leaves catching up to the scheduled quotes_sync.
+
+Returned quotes are shared — copy them (dict(quote)) before adding fields.
+"""
+
+import os
+import threading
+import time
+
+from logger import log
+from sharepoint_items import fetch_sharepoint_delta, fetch_sharepoint_list, get_latest_delta_link
+
+SITE_DOMAIN = "hamdaz1.sharepoint.com"
+SITE_PATH = "/sites/Test"
+LIST_NAME = "Quotes"
+QUOTES_SYNC_INTERVAL = int(os.getenv("QUOTES_SYNC_INTERVAL", "30"))
+QUOTES_MISS_SYNC_INTERVAL = int(os.getenv("QUOTES_MISS_SYNC_INTERVAL", "10"))
+
+
+class _QuotesView:
+    """Immutable indexes over one version of the list."""
+
+    def __init__(self, by_id):
+        self.by_id = by_id
+        self.creator = {}
+        self.status = {}
+        for q in by_id.values():
+            self.creator.setdefault(q.get("QuoteCreator"), []).append(q)
+            self.status.setdefault(q.get("ApprovalStatus"), []).append(q)
+
+
+class QuotesReplica:
+    def __init__(self, site_domain=SITE_DOMAIN, site_path=SITE_PATH, list_name=LIST_NAME,
+                 sync_interval=QUOTES_SYNC_INTERVAL, miss_sync_interval=QUOTES_MISS_SYNC_INTERVAL):
+        self.site_domain = site_domain
+        self.site_path = site_path
+        self.list_name = list_name
+        self.sync_interval = sync_interval
+        self.miss_sync_interval = miss_sync_interval
+
+        self._lock = threading.Lock()
+        self._view = None
+        self._delta_link = None
+        self._last_sync = 0.0
+        self._syncing = False
+        self._last_miss_sync = 0.0
+
+    # ----------------------------
+    # Sync
+    # ----------------------------
+    def _full_load(self):
+        # Take the delta token first so nothing changed during the download is lost
+        delta_link = get_latest_delta_link(self.site_domain, self.site_path, self.list_name)
+        items = fetch_sharepoint_list(self.site_domain, self.site_path, self.list_name)
+        self._view = _QuotesView({str(q.get("id")): q for q in items})
+        self._delta_link = delta_link
+        log.info(f"Quotes replica loaded: {len(items)} quote(s).", tag="QUOTES")
+
+    def sync(self):
+        """Applies list changes since the last sync (full load on first run or expired token)."""
+        with self._lock:
+            try:
+                if self._view is None or not self._delta_link:
+                    self._full_load()
+                else:
+                    try:
+                        changed, removed_ids, next_delta = fetch_sharepoint_delta(
+                            self.site_domain, self.site_path, self.list_name, self._delta_link)
+                    except ValueError:
+                        log.warn("Quotes delta token expired — reloading list.", tag="QUOTES")
+                        self._full_load()
+                    else:
+                        if changed or removed_ids:
+                            by_id = dict(self._view.by_id)
+                            for q in changed:
+                                by_id[str(q.get("id"))] = q
+                            for rid in removed_ids:
+                                by_id.pop(str(rid), None)
+                            self._view = _QuotesView(by_id)
+                            log.debug(f"Quotes delta: {len(changed)} changed, {len(removed_ids)} removed.", tag="QUOTES")
+                        self._delta_link = next_delta or self._delta_link
+                self._last_sync = time.time()
+            finally:
+                self._syncing = False
+            return self._view
+
+    def _sync_in_background(self):
+        try:
+            self.sync()
+        except Exception as e:
+            log.error("Quotes background sync failed", tag="QUOTES", exc=e)
+
+    def _current(self):
+        view = self._view
+        if view is None:
+            return self.sync()
+        if time.time() - self._last_sync > self.sync_interval and not self._syncing:
+            self._syncing = True
+            threading.Thread(target=self._sync_in_background, daemon=True).start()
+        return view
+
+    def mark_stale(self):
+        """Forces the next read to pick up changes (call after adding/updating a quote)."""
+        self._last_sync = 0.0
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def get(self, quote_id):
+        quote = self._current().by_id.get(str(quote_id))
+        if quote is None and time.time() - self._last_miss_sync > self.miss_sync_interval:
+            self._last_miss_sync = time.time()
+            quote = self.sync().by_id.get(str(quote_id))
+        return quote
+
+    def by_creator(self, creator):
+        return list(self._current().creator.get(creator, []))
+
+    def by_status(self, *statuses):
+        view = self._current()
+        return [q for status in dict.fromkeys(statuses) for q in view.status.get(status, [])]
+
+    def all(self):
+        return list(self._current().by_id.values())
+
+
+quotes = QuotesReplica()
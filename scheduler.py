@@ -0,0 +1,213 @@
+"""
+scheduler.py — Background jobs: fixed-rate / fixed-delay, overlap guard, metrics
+================================================================================
+Usage:
+    from scheduler import scheduler
+    scheduler.add("proposals_refresh", refresh, every=60)                  # fixed delay (default)
+    scheduler.add("email_sync", sync_emails, every=45, mode="rate")        # fixed rate
+    scheduler.add("quotes_sync", quotes.sync, every=None)                  # on demand only
+    scheduler.add("leave_expiry", expire, every=1800, condition=leader.is_leader)
+    scheduler.start()
+
+    scheduler.trigger("quotes_sync")     # run as soon as possible (e.g. after a quote submit)
+    scheduler.stats()                    # what /api/admin/jobs reports
+
+Fixed delay waits `every` seconds after a run finishes. Fixed rate starts
+runs `every` seconds apart, measured from the previous start; runs that
+were missed while a slow one was still going are skipped, not queued. Both
+add up to `jitter` × every of random spread (SCHEDULER_JITTER, default 10%)
+so workers and jobs don't fire in lockstep.
+
+Each job runs in its own thread and never overlaps itself: a run that comes
+due while the previous one is still going is skipped and counted. A
+trigger() that arrives mid-run is remembered and runs once right after.
+`condition` (e.g. leader.is_leader) is checked before every run, triggered
+ones included; when it is false the run is skipped quietly (not counted as
+a failure).
+
+Per job the scheduler keeps run / failure / skip counts, a duration
+histogram (DURATION_BUCKETS seconds), the last duration, the last success
+time and the last error.
+"""
+
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+
+from logger import log
+
+SCHEDULER_JITTER = float(os.getenv("SCHEDULER_JITTER", "0.1"))
+DURATION_BUCKETS = (0.1, 0.5, 1, 5, 15, 60, 300)      # seconds; one more bucket catches the rest
+
+
+class _Job:
+    def __init__(self, name, fn, every, mode, jitter, initial_delay, condition):
+        if mode not in ("delay", "rate"):
+            raise ValueError(f"Unknown schedule mode '{mode}' for job '{name}'")
+        self.name = name
+        self.fn = fn
+        self.every = every
+        self.mode = mode
+        self.jitter = jitter
+        self.condition = condition
+        self.next_run = time.time() + initial_delay if every else None
+        self.running = False
+        self.triggered = False
+
+        self.runs = 0
+        self.failures = 0
+        self.skipped_overlap = 0
+        self.skipped_condition = 0
+        self.histogram = [0] * (len(DURATION_BUCKETS) + 1)
+        self.last_started = None
+        self.last_duration = None
+        self.last_success = None
+        self.last_error = None          # {"at": ts, "error": message}
+
+    def spread(self):
+        return random.uniform(0, self.jitter * self.every) if self.every and self.jitter else 0.0
+
+    def stats(self):
+        return {
+            "mode": self.mode if self.every else "on-demand",
+            "every_s": self.every,
+            "running": self.running,
+            "next_run": self.next_run,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped_overlap": self.skipped_overlap,
+            "skipped_condition": self.skipped_condition,
+            "last_started": self.last_started,
+            "last_duration_s": self.last_duration,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "duration_histogram": {
+                **{f"le_{b}s": n for b, n in zip(DURATION_BUCKETS, self.histogram)},
+                "inf": self.histogram[-1],
+            },
+        }
+
+
+class Scheduler:
+    def __init__(self):
+        self._jobs = {}
+        self._cond = threading.Condition()
+        self._started = False
+
+    def add(self, name, fn, every=None, mode="delay", jitter=SCHEDULER_JITTER, initial_delay=0.0, condition=None):
+        """Registers a job. every=None makes it on-demand only (trigger())."""
+        with self._cond:
+            self._jobs[name] = _Job(name, fn, every, mode, jitter, initial_delay, condition)
+            self._cond.notify()
+
+    def start(self):
+        """Starts the dispatcher thread. Safe to call twice."""
+        if self._started:
+            return
+        self._started = True
+        threading.Thread(target=self._dispatch, name="scheduler", daemon=True).start()
+
+    def trigger(self, name):
+        """Runs the job as soon as possible. Returns False for an unknown job."""
+        with self._cond:
+            job = self._jobs.get(name)
+            if job is None:
+                return False
+            job.triggered = True
+            self._cond.notify()
+        return True
+
+    # ----------------------------
+    # Dispatch
+    # ----------------------------
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                now = time.time()
+                for job in self._jobs.values():
+                    due = job.triggered or (job.next_run is not None and job.next_run <= now)
+                    if not due:
+                        continue
+                    if job.running:
+                        if not job.triggered:
+                            # Scheduled run came due mid-run: skip it, keep the trigger flag for after
+                            job.skipped_overlap += 1
+                            self._reschedule(job, now, finished=False)
+                        continue
+                    if job.condition is not None and not self._check(job):
+                        job.skipped_condition += 1
+                        job.triggered = False
+                        self._reschedule(job, now, finished=True)
+                        continue
+                    job.triggered = False
+                    job.running = True
+                    if job.mode == "rate":
+                        self._reschedule(job, now, finished=False)
+                    else:
+                        job.next_run = None          # set again when the run finishes
+                    threading.Thread(target=self._run, args=(job,), name=f"job-{job.name}", daemon=True).start()
+
+                pending = [j.next_run for j in self._jobs.values() if j.next_run is not None and not j.running]
+                pending += [now for j in self._jobs.values() if j.triggered and not j.running]
+                timeout = max(0.0, min(pending) - now) if pending else None
+                self._cond.wait(timeout)
+
+    @staticmethod
+    def _check(job):
+        try:
+            return bool(job.condition())
+        except Exception as e:
+            log.error(f"Condition for job '{job.name}' failed", tag="SCHED", exc=e)
+            return False
+
+    @staticmethod
+    def _reschedule(job, now, finished):
+        if not job.every:
+            job.next_run = None
+        elif job.mode == "delay":
+            job.next_run = now + job.every + job.spread() if finished else None
+        else:
+            # Fixed rate: next slot after now, skipping slots missed during a slow run
+            nxt = (job.next_run or now) + job.every
+            if nxt <= now:
+                nxt += job.every * (int((now - nxt) // job.every) + 1)
+            job.next_run = nxt + job.spread()
+
+    def _run(self, job):
+        started = time.time()
+        job.last_started = started
+        error = None
+        try:
+            job.fn()
+        except Exception as e:
+            error = e
+            log.error(f"Job '{job.name}' failed", tag="SCHED", exc=e)
+        duration = time.time() - started
+
+        with self._cond:
+            job.running = False
+            job.runs += 1
+            job.last_duration = round(duration, 3)
+            job.histogram[bisect_left(DURATION_BUCKETS, duration)] += 1
+            if error is None:
+                job.last_success = time.time()
+            else:
+                job.failures += 1
+                job.last_error = {"at": time.time(), "error": str(error)}
+            now = time.time()
+            if job.mode == "delay":
+                self._reschedule(job, now, finished=True)
+            elif job.next_run is not None and job.next_run <= now:
+                # Fixed rate, and the run overran its slot(s): skip them and wait for the next one
+                job.skipped_overlap += int((now - job.next_run) // job.every) + 1
+                self._reschedule(job, now, finished=False)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            return {name: job.stats() for name, job in self._jobs.items()}
+
+
+scheduler = Scheduler()
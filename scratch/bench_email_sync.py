@@ -0,0 +1,60 @@
+"""
+Simulated supplier-reply sync: sequential loop vs the email_sync pipeline.
+
+    python scratch/bench_email_sync.py
+
+Each user's mailbox read sleeps 0.2 s (one slow mailbox 3 s); each reply's
+extraction sleeps 0.3 s under openai_limit. Checks that the pipeline's wall
+time stays near the slowest user, not the sum, that the budget defers new
+work, and that a slow mailbox read doesn't spend the budget before its
+replies get a turn, nor defer carried-over replies again.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from email_sync import SupplierEmailSync, openai_limit  # noqa: E402
+
+USERS = [f"user{i}@hamdaz.test" for i in range(20)]
+
+
+def collect(user):
+    time.sleep(3.0 if user == "user0@hamdaz.test" else 0.2)
+    return [], [f"{user}#{n}" for n in range(2)]
+
+
+def process(user, task):
+    with openai_limit:
+        time.sleep(0.3)
+    return True
+
+
+deferred = []
+
+started = time.monotonic()
+for user in USERS:
+    for task in collect(user)[1]:
+        process(user, task)
+print(f"sequential: {time.monotonic() - started:.1f}s")
+
+report = SupplierEmailSync(workers=8, user_budget=30).run(USERS, collect, process, lambda u, t: deferred.append(t))
+print(f"pipeline:   {report['duration_s']}s, {report['matched']} matched, {report['replies_per_s']}/s")
+
+report = SupplierEmailSync(workers=8, user_budget=0.5).run(USERS, collect, process, lambda u, t: deferred.append(t))
+print(f"tight budget: {report['matched']} matched, {report['deferred']} deferred")
+print(f"openai limit: {openai_limit.stats()}")
+
+
+def busy_collect(user):
+    # Re-reading 10 carried-over replies costs 0.1 s each, longer than the whole budget
+    time.sleep(1.0)
+    return [f"{user}#carried{n}" for n in range(10)], [f"{user}#new"]
+
+
+report = SupplierEmailSync(workers=8, user_budget=0.5).run(["busy@hamdaz.test"], busy_collect,
+                                                           lambda u, t: True, lambda u, t: deferred.append(t))
+print(f"slow collect: {report['matched']} matched, {report['deferred']} deferred")
+assert report["matched"] == 11 and report["deferred"] == 0
@@ -0,0 +1,107 @@
+"""
+Benchmark: generate_user_analytics (single-pass groupby) vs the old per-user loop
+on synthetic Proposals data.
+
+    python scratch/bench_user_analytics.py [rows]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv(override=True)
+
+import pandas as pd
+
+from sharepoint_items import generate_user_analytics, items_to_dataframe, exclusion_mask
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+USERS = [f"User {i}" for i in range(80)]
+
+
+def synthetic_items(n, seed=7):
+    rnd = random.Random(seed)
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    items = []
+    for i in range(n):
+        created = start + timedelta(hours=rnd.randint(0, 24 * 900))
+        items.append({
+            "id": str(i),
+            "Title": f"Proposal {i}",
+            "AssignedTo": rnd.choice(USERS) if rnd.random() > 0.03 else None,
+            "Created": created.isoformat(),
+            "StartDate": (created + timedelta(days=rnd.randint(0, 5))).isoformat() if rnd.random() > 0.1 else None,
+            "BCD": (created + timedelta(days=rnd.randint(-10, 900))).isoformat() if rnd.random() > 0.05 else None,
+            "SubmissionStatus": rnd.choice(["Submitted", "Pending", None]),
+            "Status": rnd.choice(["Received", "Open", "Lost"]),
+        })
+    return items
+
+
+def legacy_generate_user_analytics(df, user_column='AssignedTo', title_column='Title', due_column='BCD',
+                                   start_column='StartDate', assigned_column='AssignedDate',
+                                   orders_column='OrdersReceived', exclude_users=None):
+    """The previous implementation: three filtered sub-DataFrames per user."""
+    df = df.copy()
+    df[due_column] = pd.to_datetime(df[due_column], utc=True, errors='coerce')
+    df[start_column] = pd.to_datetime(df[start_column], utc=True, errors='coerce')
+    if assigned_column in df.columns:
+        df[assigned_column] = pd.to_datetime(df[assigned_column], utc=True, errors='coerce')
+    else:
+        df[assigned_column] = df[start_column]
+    now_utc = pd.Timestamp.now(tz='UTC')
+    df_filtered = df[~exclusion_mask(df[user_column], exclude_users)].copy()
+    analytics = []
+    for user, group in df_filtered.groupby(user_column):
+        completed = group[group['SubmissionStatus'] == 'Submitted']
+        ongoing = group[(group['SubmissionStatus'] != 'Submitted') &
+                        ((group[due_column] >= now_utc) | (group[start_column] >= now_utc))]
+        missed = group[(group['SubmissionStatus'] != 'Submitted') & (group[due_column] < now_utc)]
+        last = group[assigned_column].max() if not group[assigned_column].dropna().empty else None
+        analytics.append({
+            'User': user,
+            'TotalTasks': len(group),
+            'CompletedTasksCount': len(completed),
+            'OngoingTasksCount': len(ongoing),
+            'MissedTasksCount': len(missed),
+            'CompletedTasks': completed[title_column].tolist(),
+            'OngoingTasks': ongoing[title_column].tolist(),
+            'MissedTasks': missed[title_column].tolist(),
+            'LastAssignedDate': last.isoformat() if last is not None else None,
+            'OrdersReceived': group[orders_column].sum() if orders_column in group.columns else 0,
+        })
+    return pd.DataFrame(analytics)
+
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+
+if __name__ == "__main__":
+    df = items_to_dataframe(synthetic_items(ROWS))
+    exclude = ["User 3", "user 7"]
+
+    t_old, old = timed(lambda: legacy_generate_user_analytics(df, exclude_users=exclude))
+    t_new, new = timed(lambda: generate_user_analytics(df, exclude_users=exclude))
+    t_titles, with_titles = timed(lambda: generate_user_analytics(df, exclude_users=exclude, include_titles=True))
+
+    counts = ['User', 'TotalTasks', 'CompletedTasksCount', 'OngoingTasksCount', 'MissedTasksCount', 'LastAssignedDate']
+    same_counts = old[counts].reset_index(drop=True).equals(new[counts].reset_index(drop=True))
+    same_titles = all(old[c].tolist() == with_titles[c].tolist() for c in ['CompletedTasks', 'OngoingTasks', 'MissedTasks'])
+
+    print(f"rows={ROWS} users={len(new)}")
+    print(f"legacy loop            : {t_old * 1000:8.1f} ms")
+    print(f"groupby engine         : {t_new * 1000:8.1f} ms  ({t_old / t_new:.1f}x)")
+    print(f"groupby engine + titles: {t_titles * 1000:8.1f} ms  ({t_old / t_titles:.1f}x)")
+    print(f"counts match: {same_counts}  titles match: {same_titles}")
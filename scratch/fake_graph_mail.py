@@ -0,0 +1,171 @@
+"""
+Fake Graph mailbox for exercising mail_delta without a tenant.
+
+    HAMDAZ_CACHE_DIR=/tmp/mail_delta_check python scratch/fake_graph_mail.py
+
+Serves /users/<u>/mailFolders/<folder>/messages/delta (paged with
+nextLink, ending with a deltaLink), /users/<u>/messages/<id> and $batch, then
+checks that a second poll returns only what arrived in between (inbox and
+Junk), that REF and subject matching pick the right tracked email, and
+that deferred / failed message ids survive until they can be re-read.
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from mail_delta import MailboxDelta, PendingReplyIndex  # noqa: E402
+
+PAGE = 2
+FOLDERS = {"inbox": [], "junkemail": [], "archive": []}     # folder -> messages in arrival order; archive isn't polled
+INBOX = FOLDERS["inbox"]
+REQUESTS = []         # paths served, for the call count
+
+
+def message(n, sender, subject, body=""):
+    return {
+        "id": f"m{n}",
+        "subject": subject,
+        "bodyPreview": body[:50],
+        "body": {"contentType": "html", "content": body},
+        "from": {"emailAddress": {"address": sender}},
+        "receivedDateTime": f"2026-10-17T08:{n:02d}:00Z",
+    }
+
+
+class FakeGraph(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        REQUESTS.append(self.path)
+        if urlparse(self.path).path != "/$batch":
+            return self._send(404, {"error": {"code": "NotFound"}})
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        responses = []
+        for req in payload["requests"]:
+            status, body = self._route(req["url"])
+            responses.append({"id": req["id"], "status": status, "body": body})
+        self._send(200, {"responses": responses})
+
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        self._send(*self._route(self.path))
+
+    def _route(self, path):
+        url = urlparse(path)
+        query = parse_qs(url.query)
+        base = f"http://{self.server.server_address[0]}:{self.server.server_address[1]}"
+        folder = re.search(r"/mailFolders/([^/]+)/messages/delta$", url.path)
+        if folder:
+            box = FOLDERS[folder.group(1)]
+            if "deltatoken" in query:
+                start = int(query["deltatoken"][0])
+            else:
+                start = int(query.get("skiptoken", ["0"])[0])
+            page = box[start:start + PAGE]
+            nxt = start + len(page)
+            payload = {"value": page}
+            if nxt < len(box) and page:
+                payload["@odata.nextLink"] = f"{base}{url.path}?skiptoken={nxt}"
+            else:
+                payload["@odata.deltaLink"] = f"{base}{url.path}?deltatoken={nxt}"
+            return 200, payload
+        if "/messages/" in url.path:
+            mid = url.path.rsplit("/", 1)[1]
+            if mid == "flaky":
+                return 500, {"error": {"code": "InternalServerError"}}
+            found = next((m for box in FOLDERS.values() for m in box if m["id"] == mid), None)
+            return (200, found) if found else (404, {"error": {"code": "ErrorItemNotFound"}})
+        return 404, {"error": {"code": "NotFound"}}
+
+
+def main():
+    server = HTTPServer(("127.0.0.1", 0), FakeGraph)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    ref_id = "0f8e4a52-2b1c-4a8e-9d3e-5d1f0c2b7a11"
+    pending = [
+        {"id": ref_id, "to_email": "sales@acme.test", "subject": "Procurement Inquiry for Steel Beams",
+         "created_at": "2026-10-01T09:00:00"},
+        {"id": "a1b2c3d4-0000-4000-8000-000000000002", "to_email": "quotes@globex.test",
+         "subject": "Procurement Inquiry for Copper Cable Drums", "created_at": "2026-10-02T09:00:00"},
+    ]
+
+    INBOX.extend([
+        message(1, "newsletter@spam.test", "Weekly deals"),
+        message(2, "sales@acme.test", "Re: something else", f"<p>Price attached</p><span>REF:{ref_id}</span>"),
+        message(3, "colleague@hamdaz.test", "Lunch?"),
+    ])
+
+    delta = MailboxDelta(base_url=base_url, state_file="mail_delta_fake.json")
+    index = PendingReplyIndex(pending)
+
+    first = delta.poll("buyer@hamdaz.test", "token", since=index.oldest_created())
+    print(f"first poll: {[m['id'] for m in first]} in {len(REQUESTS)} request(s)")
+    matched = [(m["id"], index.match(m)["id"][:8]) for m in first if index.match(m)]
+    print(f"  matched: {matched}")
+    assert matched == [("m2", ref_id[:8])]
+    index.resolve(ref_id)
+
+    INBOX.append(message(5, "sales@acme.test", "Re: Steel Beams", "<p>follow-up, no ref</p>"))
+    FOLDERS["junkemail"].append(
+        message(4, "quotes@globex.test", "RE: Procurement Inquiry for Copper Cable Drums", "<p>See our offer</p>"))
+    REQUESTS.clear()
+    second = delta.poll("buyer@hamdaz.test", "token")
+    print(f"second poll: {[m['id'] for m in second]} in {len(REQUESTS)} request(s)")
+    assert sorted(m["id"] for m in second) == ["m4", "m5"]
+    matched = [(m["id"], index.match(m)["id"][:8]) for m in second if index.match(m)]
+    print(f"  matched: {matched}  (m5 answers an email that was already resolved)")
+    assert matched == [("m4", "a1b2c3d4")]
+
+    delta.retry_later("buyer@hamdaz.test", "m4")
+    retried = delta.take_retries("buyer@hamdaz.test", "token")
+    print(f"retry queue handed back: {[m['id'] for m in retried]}")
+    assert [m["id"] for m in retried] == ["m4"] and not delta.take_retries("buyer@hamdaz.test", "token")
+
+    # A busy mailbox: every deferred id comes back, MAIL_DELTA_MAX_REREAD (100) per cycle, in $batch calls
+    FOLDERS["archive"].extend(message(100 + n, "sales@acme.test", f"Quote {n}") for n in range(120))
+    for m in FOLDERS["archive"]:
+        delta.defer("buyer@hamdaz.test", m["id"])
+    REQUESTS.clear()
+    first_cycle = delta.take_retries("buyer@hamdaz.test", "token")
+    print(f"deferred 120, first cycle handed back {len(first_cycle)} in {len(REQUESTS)} request(s)")
+    assert [m["id"] for m in first_cycle] == [m["id"] for m in FOLDERS["archive"][:100]] and len(REQUESTS) == 5
+    second_cycle = delta.take_retries("buyer@hamdaz.test", "token")
+    print(f"  second cycle handed back {len(second_cycle)}")
+    assert [m["id"] for m in second_cycle] == [m["id"] for m in FOLDERS["archive"][100:]]
+
+    # Failed ids are capped; each eviction is counted. 503 keeps an id queued, 404 drops it
+    for m in FOLDERS["archive"][:55]:
+        delta.retry_later("buyer@hamdaz.test", m["id"])
+    delta.retry_later("buyer@hamdaz.test", "missing")
+    delta.retry_later("buyer@hamdaz.test", "flaky")
+    retried = delta.take_retries("buyer@hamdaz.test", "token")
+    stats = delta.stats()
+    print(f"retried 57 (cap 50): handed back {len(retried)}, stats {stats}")
+    assert len(retried) == 48 and stats["evicted"] == 7 and stats["gone"] == 1 and stats["queued_retry"] == 1
+
+    REQUESTS.clear()
+    print(f"idle poll: {len(delta.poll('buyer@hamdaz.test', 'token'))} message(s) in {len(REQUESTS)} request(s)")
+    server.shutdown()
+    print("ok")
+
+
+if __name__ == "__main__":
+    main()
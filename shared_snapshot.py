@@ -0,0 +1,199 @@
+"""
+shared_snapshot.py — Cross-worker Proposals snapshot in SQLite (WAL)
+====================================================================
+Usage:
+    from shared_snapshot import shared_snapshot
+
+    # leader (the only writer)
+    shared_snapshot.publish(items, delta_link)                  # full replace; required before any delta
+    shared_snapshot.apply_delta(changed, removed_ids, delta_link)
+    shared_snapshot.put_frame("user_analytics", user_analytics, ignore=("PriorityKey",))   # skipped if unchanged
+
+    # any worker
+    stamp = shared_snapshot.stamp()          # (generation, version); one indexed read
+    change = shared_snapshot.changes_since(my_stamp)
+    #  None                                  -> nothing new
+    #  ("full", items, stamp)                -> publish the whole list
+    #  ("delta", changed, removed_ids, stamp)-> apply_delta
+    shared_snapshot.get_frame("user_analytics", my_version)   # (frame, version); frame None if not newer
+    shared_snapshot.delta_link()
+
+The store lives in .cache/snapshot.sqlite in WAL mode, so readers never
+block the writer or each other, and every read sees one committed
+version. Each item row records the version that last wrote it, and
+removals leave a tombstone, so a worker that is a few versions behind
+pulls just those rows and feeds them to proposals.apply_delta(). The
+cube and dashboard views then update incrementally in that worker too. A
+full replace (first load, delta-token resync) starts a new generation;
+workers on an older generation reload everything.
+
+Workers compare the (generation, version) stamp before reading anything,
+so an idle tick costs one small query. The same goes for frames: put_frame
+doesn't write (or bump the version) when the frame equals the last one
+this process stored, so followers only unpickle a frame that changed. This is not shared memory: each
+worker still decodes the rows it pulls into its own Python objects, so
+it removes drift between workers and repeated Graph loads, not the
+per-worker copy itself.
+"""
+
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from local_store import cache_path
+from logger import log
+
+SNAPSHOT_DB = os.getenv("SHARED_SNAPSHOT_DB", "snapshot.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta   (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS items  (id TEXT PRIMARY KEY, version INTEGER NOT NULL, body TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS removed(id TEXT PRIMARY KEY, version INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS frames (name TEXT PRIMARY KEY, version INTEGER NOT NULL, body BLOB NOT NULL);
+CREATE INDEX IF NOT EXISTS items_version   ON items(version);
+CREATE INDEX IF NOT EXISTS removed_version ON removed(version);
+"""
+
+
+class SharedSnapshot:
+    def __init__(self, db_name=SNAPSHOT_DB):
+        self.db_name = db_name
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._last_frames = {}       # name -> last frame this process stored (minus ignored columns)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(cache_path(self.db_name), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @staticmethod
+    def _meta(conn, key, default=None):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    @staticmethod
+    def _set_meta(conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                         [(k, None if v is None else str(v)) for k, v in values.items()])
+
+    def _read_stamp(self, conn):
+        generation = self._meta(conn, "generation")
+        if generation is None:
+            return None
+        return int(generation), int(self._meta(conn, "version", 0))
+
+    # ----------------------------
+    # Writes (leader only)
+    # ----------------------------
+    def _write(self, fn):
+        started = time.perf_counter()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                stamp = fn(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        log.debug(f"Shared snapshot now {stamp} ({(time.perf_counter() - started) * 1000:.0f} ms)", tag="SHARED")
+        return stamp
+
+    def publish(self, items, delta_link):
+        """Replaces every item and starts a new generation."""
+        def write(conn):
+            stamp = self._read_stamp(conn)
+            generation = stamp[0] + 1 if stamp else 1
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM removed")
+            conn.executemany("INSERT INTO items (id, version, body) VALUES (?, 1, ?)",
+                             [(t.get("id"), json.dumps(t, default=str)) for t in items])
+            self._set_meta(conn, generation=generation, version=1, delta_link=delta_link, saved_at=time.time())
+            return generation, 1
+        return self._write(write)
+
+    def apply_delta(self, changed, removed_ids, delta_link):
+        """Upserts changed items, tombstones removed ones, bumps the version. Needs a publish() first."""
+        def write(conn):
+            stamp = self._read_stamp(conn)
+            if stamp is None:
+                raise ValueError("Shared snapshot is empty: publish() the full list before applying a delta")
+            generation, version = stamp
+            version += 1
+            conn.executemany("INSERT OR REPLACE INTO items (id, version, body) VALUES (?, ?, ?)",
+                             [(t.get("id"), version, json.dumps(t, default=str)) for t in changed])
+            if removed_ids:
+                conn.executemany("DELETE FROM items WHERE id = ?", [(rid,) for rid in removed_ids])
+                conn.executemany("INSERT OR REPLACE INTO removed (id, version) VALUES (?, ?)",
+                                 [(rid, version) for rid in removed_ids])
+            conn.execute("DELETE FROM removed WHERE id IN (SELECT id FROM items)")   # re-added items
+            self._set_meta(conn, version=version, delta_link=delta_link, saved_at=time.time())
+            return generation, version
+        return self._write(write)
+
+    def put_frame(self, name, frame, ignore=()):
+        """
+        Stores a derived DataFrame (pickled) under `name` with its own version counter.
+        Skipped when it equals the last frame stored here, apart from the `ignore`
+        columns (values that drift every tick without changing anything readers use).
+        Returns True when it was written.
+        """
+        compared = frame.drop(columns=[c for c in ignore if c in frame.columns])
+        with self._write_lock:
+            last = self._last_frames.get(name)
+            if last is not None and last.equals(compared):
+                return False
+            body = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+            self._conn().execute(
+                "INSERT INTO frames (name, version, body) VALUES (?, 1, ?) "
+                "ON CONFLICT(name) DO UPDATE SET version = version + 1, body = excluded.body",
+                (name, body),
+            )
+            self._last_frames[name] = compared
+        return True
+
+    # ----------------------------
+    # Reads (any worker)
+    # ----------------------------
+    def stamp(self):
+        """(generation, version) of the committed snapshot, or None if nothing was published."""
+        return self._read_stamp(self._conn())
+
+    def delta_link(self):
+        return self._meta(self._conn(), "delta_link")
+
+    def changes_since(self, stamp):
+        """What a worker at `stamp` needs to catch up; None when it is current (or the store is empty)."""
+        conn = self._conn()
+        conn.execute("BEGIN")            # one consistent read across the queries below
+        try:
+            current = self._read_stamp(conn)
+            if current is None or current == stamp:
+                return None
+            if stamp is None or stamp[0] != current[0]:
+                rows = conn.execute("SELECT body FROM items").fetchall()
+                return "full", [json.loads(body) for (body,) in rows], current
+            rows = conn.execute("SELECT body FROM items WHERE version > ?", (stamp[1],)).fetchall()
+            removed = conn.execute("SELECT id FROM removed WHERE version > ?", (stamp[1],)).fetchall()
+            return "delta", [json.loads(body) for (body,) in rows], [rid for (rid,) in removed], current
+        finally:
+            conn.execute("COMMIT")
+
+    def get_frame(self, name, known_version=0):
+        """(frame, version); frame is None when there is none or it is not newer than known_version."""
+        row = self._conn().execute("SELECT version, body FROM frames WHERE name = ?", (name,)).fetchone()
+        if row is None or row[0] <= known_version:
+            return None, known_version
+        return pickle.loads(row[1]), row[0]
+
+
+shared_snapshot = SharedSnapshot()
@@ -2,14 +2,20 @@
 from asyncio import tasks
 import os
 import requests
-from msal import ConfidentialClientApplication
+import http_client
 from dotenv import load_dotenv
 import os
 import requests
 import pandas as pd
+import numpy as np
 from logger import log
+from graph_auth import token_manager, GRAPH_SCOPE
+from sp_resolver import sp_ids
+from directory_cache import org_directory
+from graph_batch import execute_batch
+from graph_paging import iter_graph_items, GRAPH_PAGE_SIZE
+from useranalytics_store import useranalytics
 from datetime import datetime
-import pytz
 from collections import defaultdict
 import re
 import base64
@@ -45,88 +51,52 @@ WORKSHEET_NAME = os.getenv("ONEDRIVE_WORKSHEET_NAME", "Sheet1")
 CONTACT_WORKSHEET_NAME= "Sheet1"
 GRAPH_API_ENDPOINT = "https://graph.microsoft.com/v1.0"
 
-onedrive_msal_app = ConfidentialClientApplication(
-    CLIENT_ID_ONEDRIVE,
-    authority=AUTHORITY_ONEDRIVE,
-    client_credential=CLIENT_SECRET_ONEDRIVE
-)
-
 # ----------------------------
 # MSAL Authentication
 # ----------------------------
 def get_access_token():
-    """Returns a Graph API access token using client credentials."""
-    authority = f"https://login.microsoftonline.com/{TENANT_ID}"
-    app = ConfidentialClientApplication(
-        CLIENT_ID,
-        authority=authority,
-        client_credential=CLIENT_SECRET
-    )
-    token_response = app.acquire_token_for_client(scopes=["https://graph.microsoft.com/.default"])
-    if "access_token" not in token_response:
-        raise Exception(f"Failed to get access token: {token_response}")
-    return token_response["access_token"]
+    """Returns a Graph API access token using client credentials (cached process-wide)."""
+    return token_manager.get_token(GRAPH_SCOPE)
 
 # ----------------------------
 # Fetch all users in org
 # ----------------------------
 def get_all_users(access_token):
-    """Fetch all users and return a cache: user_id -> displayName"""
-    headers = {"Authorization": f"Bearer {access_token}"}
-    users = []
-    url = f"{GRAPH_API}/users?$select=id,displayName,mail"
-    while url:
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            raise Exception(f"Error fetching users: {resp.text}")
-        data = resp.json()
-        users.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")
-    return {u['id']: u.get('displayName', u.get('mail')) for u in users}
+    """Return the shared user cache: user_id -> displayName (see directory_cache.py)"""
+    return org_directory.names(access_token)
 
 
 # ----------------------------
-# Get SharePoint site ID
+# Get SharePoint site ID / list ID (cached, see sp_resolver.py)
 # ----------------------------
 def get_site_id(access_token, site_domain, site_path):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{GRAPH_API}/sites/{site_domain}:{site_path}"
-    resp = requests.get(url, headers=headers)
-    if resp.status_code != 200:
-        raise Exception(f"Error fetching site ID: {resp.text}")
-    return resp.json().get("id")
+    return sp_ids.site_id(access_token, site_domain, site_path)
 
 
-# ----------------------------
-# Get SharePoint list ID
-# ----------------------------
 def get_list_id(access_token, site_id, list_name):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    url = f"{GRAPH_API}/sites/{site_id}/lists"
-    resp = requests.get(url, headers=headers)
-    if resp.status_code != 200:
-        raise Exception(f"Error fetching lists: {resp.text}")
-    for l in resp.json().get("value", []):
-        if l.get("name") == list_name:
-            return l.get("id")
-    raise Exception(f"List '{list_name}' not found.")
+    return sp_ids.list_id(access_token, site_id, list_name)
 
 
 # ----------------------------
 # Get list items
 # ----------------------------
+def iter_list_items(access_token, site_id, list_id, fields=None, expand="fields", top=GRAPH_PAGE_SIZE):
+    """
+    Streams list items page by page (see graph_paging.py).
+    Pass `fields` to download only those columns.
+    """
+    return iter_graph_items(
+        f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items",
+        access_token,
+        fields=fields,
+        expand=expand,
+        top=top,
+        on_response=lambda resp: sp_ids.check_response(resp, site_id, list_id),
+    )
+
+
 def get_list_items(access_token, site_id, list_id):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    items = []
-    url = f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items?expand=fields($expand=AssignedTo,Author,Editor)"
-    while url:
-        resp = requests.get(url, headers=headers)
-        if resp.status_code != 200:
-            raise Exception(f"Error fetching items: {resp.text}")
-        data = resp.json()
-        items.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")
-    return items
+    return list(iter_list_items(access_token, site_id, list_id, expand="fields($expand=AssignedTo,Author,Editor)"))
 
 
 # ----------------------------
@@ -192,7 +162,7 @@ def get_latest_delta_link(site_domain, site_path, list_name):
     list_id = get_list_id(access_token, site_id, list_name)
     headers = {"Authorization": f"Bearer {access_token}"}
     url = f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items/delta?token=latest"
-    resp = requests.get(url, headers=headers)
+    resp = sp_ids.check_response(http_client.get(url, headers=headers), site_id, list_id)
     if resp.status_code == 200:
         return resp.json().get("@odata.deltaLink")
     else:
@@ -203,6 +173,8 @@ def fetch_sharepoint_delta(site_domain, site_path, list_name, delta_link):
     """
     Fetches only the changed SharePoint list items using the provided delta_link.
     Returns: (processed_items, removed_ids, next_delta_link)
+    Raises if a changed item can't be fetched, so the caller keeps its old
+    delta_link and the next call replays the round instead of losing the change.
     """
     access_token = get_access_token()
     site_id = get_site_id(access_token, site_domain, site_path)
@@ -215,7 +187,7 @@ def fetch_sharepoint_delta(site_domain, site_path, list_name, delta_link):
     next_delta_link = None
     
     while url:
-        resp = requests.get(url, headers=headers)
+        resp = sp_ids.check_response(http_client.get(url, headers=headers), site_id, list_id)
         if resp.status_code == 410:
             raise ValueError("Delta token expired")
         elif resp.status_code != 200:
@@ -229,27 +201,57 @@ def fetch_sharepoint_delta(site_domain, site_path, list_name, delta_link):
         if not url:
             next_delta_link = data.get("@odata.deltaLink")
             
-    processed_items = []
-    removed_ids = []
-    for item in items:
-        if "@removed" in item:
-            removed_ids.append(item.get("id"))
-        else:
-            # For added/modified items, fetch them individually to get the $expand properly!
-            item_id = item.get("id")
-            full_item = fetch_sharepoint_item_by_id(site_domain, site_path, list_name, item_id)
-            if full_item:
-                full_item["id"] = item_id
-                processed_items.append(full_item)
-            
+    removed_ids = [item.get("id") for item in items if "@removed" in item]
+    # Delta rows don't carry the $expand'ed person fields, so hydrate added/modified items in bulk
+    changed_ids = list(dict.fromkeys(item.get("id") for item in items if "@removed" not in item))
+    hydrated = fetch_sharepoint_items_by_ids(site_domain, site_path, list_name, changed_ids, strict=True) \
+        if changed_ids else {}
+    processed_items = [hydrated[item_id] for item_id in changed_ids if item_id in hydrated]
+    # Deleted between the delta read and the fetch (404): drop it now rather than wait for the tombstone
+    removed_ids += [item_id for item_id in changed_ids if item_id not in hydrated]
+
     return processed_items, removed_ids, next_delta_link
 
-def fetch_sharepoint_item_by_id(site_domain, site_path, list_name, item_id):
+def fetch_sharepoint_items_by_ids(site_domain, site_path, list_name, item_ids, user_cache=None, strict=False):
+    """
+    Fetches many SharePoint items through Graph $batch (20 per round trip) and flattens them.
+    Returns: {item_id: flattened_fields}; items that fail are logged and left out.
+    With strict=True only missing items (404) are left out; any other failure raises.
+    """
+    access_token = get_access_token()
+    if user_cache is None:
+        user_cache = get_all_users(access_token)
+    site_id = get_site_id(access_token, site_domain, site_path)
+    list_id = get_list_id(access_token, site_id, list_name)
+
+    sub_requests = [
+        {"method": "GET", "url": f"/sites/{site_id}/lists/{list_id}/items/{item_id}?expand=fields($expand=AssignedTo,Author,Editor)"}
+        for item_id in item_ids
+    ]
+    results = execute_batch(sub_requests, access_token)
+
+    flattened = {}
+    failed = []
+    for item_id, result in zip(item_ids, results):
+        if result["status"] != 200 or not result["body"]:
+            log.error(f"Failed to fetch SP item {item_id}: HTTP {result['status']}", tag="SP")
+            if result["status"] != 404:
+                failed.append(item_id)
+            continue
+        flat = flatten_fields(result["body"].get("fields", {}), user_cache)
+        flat["id"] = item_id
+        flattened[item_id] = flat
+    if strict and failed:
+        raise Exception(f"Failed to fetch {len(failed)} of {len(item_ids)} SP item(s)")
+    return flattened
+
+def fetch_sharepoint_item_by_id(site_domain, site_path, list_name, item_id, user_cache=None):
     """
     Fetches a single SharePoint item by its ID and flattens its fields.
     """
     access_token = get_access_token()
-    user_cache = get_all_users(access_token)
+    if user_cache is None:
+        user_cache = get_all_users(access_token)
 
     site_id = get_site_id(access_token, site_domain, site_path)
     list_id = get_list_id(access_token, site_id, list_name)
@@ -257,7 +259,7 @@ def fetch_sharepoint_item_by_id(site_domain, site_path, list_name, item_id):
     headers = {"Authorization": f"Bearer {access_token}"}
     url = f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items/{item_id}?expand=fields($expand=AssignedTo,Author,Editor)"
     
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get(url, headers=headers)
     if resp.status_code != 200:
         log.error(f"Failed to fetch SP item {item_id}: HTTP {resp.status_code}", tag="SP")
         return None
@@ -278,7 +280,7 @@ def get_item_attachments(site_domain, site_path, list_name, item_id):
     # In Graph API, attachments are under /items/{id}/attachments
     url = f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items/{item_id}/attachments"
     
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get(url, headers=headers)
     if resp.status_code != 200:
         log.error(f"Failed to fetch attachments for SP item {item_id}: HTTP {resp.status_code}", tag="SP")
         return []
@@ -296,10 +298,77 @@ def get_item_attachments(site_domain, site_path, list_name, item_id):
 
 
 
+# ----------------------------
+# Excluded-user filtering
+# ----------------------------
+# frozenset(normalized exclusion list) -> {raw AssignedTo value: excluded?}
+# A new exclusion list gets a fresh entry, so the cache follows list versions.
+_EXCLUSION_CACHE = {}
+_EXCLUSION_CACHE_SIZE = 4
+
+
+def exclusion_mask(series, excluded_users):
+    """
+    Boolean mask, True for rows where any comma-separated name in `series`
+    is in `excluded_users` (case-insensitive).
+
+    Rows are factorized to their distinct values; values not seen before are
+    lowercased, split/exploded and matched with isin() once per exclusion
+    list, and the mask is gathered from the cached per-value result.
+    """
+    excl = frozenset(str(u).strip().lower() for u in (excluded_users or []) if u)
+    if not excl:
+        return pd.Series(False, index=series.index)
+
+    known = _EXCLUSION_CACHE.get(excl)
+    if known is None:
+        if len(_EXCLUSION_CACHE) >= _EXCLUSION_CACHE_SIZE:
+            _EXCLUSION_CACHE.pop(next(iter(_EXCLUSION_CACHE)))
+        known = _EXCLUSION_CACHE[excl] = {}
+
+    codes, uniques = pd.factorize(series)       # missing values -> code -1
+    missing = [v for v in uniques if v not in known]
+    if missing:
+        names = pd.Series(missing).astype(str).str.lower().str.split(',').explode().str.strip()
+        hits = names.isin(excl).groupby(level=0).any()
+        known.update(zip(missing, hits.tolist()))
+
+    # Trailing False is what code -1 (NaN/None) picks up
+    per_value = np.array([known[v] for v in uniques] + [False], dtype=bool)
+    return pd.Series(per_value[codes], index=series.index)
+
+
+# ----------------------------
+# Ingest: typed Proposals frame
+# ----------------------------
+UAE_TZ = "Asia/Dubai"
+DATE_COLUMNS = ('DueDate', 'BCD', 'Created', 'Modified', 'StartDate', 'Start Date', 'AssignedDate')
+CATEGORY_COLUMNS = ('Status', 'SubmissionStatus')
+
+
+def normalize_assignees(series):
+    """'Jane Doe ,John  Roe' -> 'Jane Doe, John Roe'; computed once per distinct value."""
+    codes, uniques = pd.factorize(series)
+    cleaned = [
+        ", ".join(p.strip() for p in v.split(",") if p.strip()) if isinstance(v, str) else v
+        for v in uniques
+    ]
+    values = np.array(cleaned + [None], dtype=object)
+    return pd.Series(values[codes], index=series.index)
+
+
 def items_to_dataframe(items):
     """
-    Convert a list of SharePoint item dictionaries into a Pandas DataFrame.
-    
+    Convert a list of SharePoint item dictionaries into a typed Pandas DataFrame.
+
+    This is the single ingest step for Proposals data:
+      - date columns are parsed once, tz-aware in Asia/Dubai
+      - Status / SubmissionStatus are categorical
+      - AssignedTo is whitespace-normalized
+    so analytics code can compare and group without converting again.
+    Frames built here are shared (see proposals_snapshot) — treat them as
+    read-only and copy before assigning columns.
+
     Args:
         items (list): List of dictionaries, each representing a SharePoint item.
         
@@ -311,11 +380,14 @@ def items_to_dataframe(items):
     
     df = pd.DataFrame(items)
     
-    # Convert common date columns to datetime, if they exist
-    date_cols = ['DueDate', 'BCD', 'Created', 'Modified']
-    for col in date_cols:
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce', utc=True).dt.tz_convert(UAE_TZ)
+    for col in CATEGORY_COLUMNS:
         if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors='coerce')
+            df[col] = df[col].astype('category')
+    if 'AssignedTo' in df.columns:
+        df['AssignedTo'] = normalize_assignees(df['AssignedTo'])
     
     return df
 
@@ -337,25 +409,18 @@ def compute_overall_analytics(df, period=None, excluded_users=None):
 
     # Strictly filter out excluded users BEFORE computing anything
     if excluded_users:
-        _excl_norm = [str(u).strip().lower() for u in excluded_users if u]
         # Exclude row if ANY user in AssignedTo is in the excluded list
-        df = df[~df["AssignedTo"].fillna("").astype(str).str.lower().apply(
-            lambda x: any(u.strip() in _excl_norm for u in x.split(','))
-        )].copy()
+        df = df[~exclusion_mask(df["AssignedTo"], excluded_users)]
 
     if df.empty:
         return {"total_users": 0, "total_tasks": 0, "tasks_completed": 0, "tasks_pending": 0, "tasks_missed": 0, "orders_received": 0, "changes": {}}
 
-    uae_tz = pytz.timezone("Asia/Dubai")
-    now_uae = datetime.now(uae_tz)
-    
-    # Convert dates to UAE timezone
-    df['BCD'] = pd.to_datetime(df['BCD'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
-    df['Created'] = pd.to_datetime(df['Created'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
+    # BCD / Created are typed at ingest (items_to_dataframe); nothing below writes to df
+    now_uae = pd.Timestamp.now(tz=UAE_TZ)
 
     # Apply period filter if specified
     if period and period['type'] != 'all':
-        filtered_df = df.copy()
+        filtered_df = df
         if period['type'] == 'month':
             filtered_df = df[
                 (df['Created'].dt.year == period['year']) & 
@@ -418,21 +483,12 @@ def compute_user_analytics(df, excluded_users=None):
 
     # Strictly filter out excluded users
     if excluded_users:
-        _excl_norm = [str(u).strip().lower() for u in excluded_users if u]
-        df = df[~df["AssignedTo"].fillna("").astype(str).str.lower().apply(
-            lambda x: any(u.strip() in _excl_norm for u in x.split(','))
-        )].copy()
+        df = df[~exclusion_mask(df["AssignedTo"], excluded_users)]
     if df.empty:
         return {}
 
-    uae_tz = pytz.timezone("Asia/Dubai")
-    now_uae = datetime.now(uae_tz)
-
-    # Convert dates to timezone-aware
-    if 'BCD' in df.columns:
-        df['BCD'] = pd.to_datetime(df['BCD'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
-    if 'Start Date' in df.columns:
-        df['Start Date'] = pd.to_datetime(df['Start Date'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
+    # BCD / Start Date are typed at ingest (items_to_dataframe); nothing below writes to df
+    now_uae = pd.Timestamp.now(tz=UAE_TZ)
 
     analytics = {}
     for user, user_df in df.groupby('AssignedTo'):
@@ -462,22 +518,12 @@ def compute_user_analytics_with_last_date(df, EXCLUDED_USERS, period=None):
 
     if df.empty or 'AssignedTo' not in df.columns:
         return {}
-    # Normalize for exclusion
-    exclude_users_normalized = [str(u).strip().lower() for u in EXCLUDED_USERS if u]
-
-    # ✅ Make a copy to avoid SettingWithCopyWarning
-    df = df[~df['AssignedTo'].fillna('').astype(str).str.lower().apply(
-        lambda x: any(u.strip() in exclude_users_normalized for u in x.split(','))
-    )].copy()
+    df = df[~exclusion_mask(df['AssignedTo'], EXCLUDED_USERS)]
     if df.empty:
         return {}
 
-    uae_tz = pytz.timezone("Asia/Dubai")
-    now_uae = datetime.now(uae_tz)
-
-    # ✅ Safely update datetime fields
-    df['Created'] = pd.to_datetime(df['Created'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
-    df['BCD'] = pd.to_datetime(df['BCD'], errors='coerce', utc=True).dt.tz_convert(uae_tz)
+    # Created / BCD are typed at ingest (items_to_dataframe); nothing below writes to df
+    now_uae = pd.Timestamp.now(tz=UAE_TZ)
 
     # Apply period filter if specified
     if period and period['type'] != 'all':
@@ -485,19 +531,22 @@ def compute_user_analytics_with_last_date(df, EXCLUDED_USERS, period=None):
             df = df[
                 (df['Created'].dt.year == period['year']) &
                 (df['Created'].dt.month == period['month'])
-            ].copy()
+            ]
         elif period['type'] == 'year':
-            df = df[df['Created'].dt.year == period['year']].copy()
+            df = df[df['Created'].dt.year == period['year']]
 
     # Detect Start Date column (case/space tolerant)
     start_col = next((col for col in df.columns if col.lower().replace(" ", "") == "startdate"), None)
 
+    start = None
     if start_col:
-        df[start_col] = pd.to_datetime(df[start_col], errors='coerce', utc=True).dt.tz_convert(uae_tz)
+        # Only the spellings in DATE_COLUMNS are typed at ingest; parse any other one locally
+        start = df[start_col] if start_col in DATE_COLUMNS else \
+            pd.to_datetime(df[start_col], errors='coerce', utc=True).dt.tz_convert(UAE_TZ)
 
     analytics = {}
     for user, user_df in df.groupby('AssignedTo'):
-        last_assigned = user_df[start_col].max() if start_col else None
+        last_assigned = start.loc[user_df.index].max() if start_col else None
 
         analytics[user] = {
             "total_tasks": len(user_df),
@@ -552,7 +601,7 @@ def get_user_details(access_token, usernames):
     for username in usernames:
         # Microsoft Graph API: Get user by UPN/email
         url = f"https://graph.microsoft.com/v1.0/users/{username}"
-        resp = requests.get(url, headers=headers)
+        resp = http_client.get(url, headers=headers)
         if resp.status_code == 200:
             user_details.append(resp.json())
         else:
@@ -564,78 +613,77 @@ def get_user_details(access_token, usernames):
 def generate_user_analytics(df, user_column='AssignedTo', status_column='Status', 
                             title_column='Title', due_column='BCD', start_column='StartDate',
                             assigned_column='AssignedDate', orders_column='OrdersReceived',
-                            exclude_users=None):
+                            exclude_users=None, include_titles=False):
     """
-    Generate per-user analytics with counts, lists of tasks, last assigned date,
-    and orders received, excluding specific users. Considers tasks with future start dates as ongoing.
-    """
-    if exclude_users is None:
-        exclude_users = []
-
-    analytics = []
+    Generate per-user analytics with counts, last assigned date and orders
+    received, excluding specific users. Considers tasks with future start
+    dates as ongoing.
 
+    Completed / ongoing / missed are computed once as boolean columns and
+    aggregated with a single groupby. The CompletedTasks / OngoingTasks /
+    MissedTasks title lists are only built with include_titles=True.
+    The input DataFrame is not modified.
+    """
     if df.empty:
-        return pd.DataFrame(analytics)
+        return pd.DataFrame([])
 
-    # Ensure date columns are datetime with UTC timezone
-    df[due_column] = pd.to_datetime(df[due_column], utc=True, errors='coerce')
-    df[start_column] = pd.to_datetime(df[start_column], utc=True, errors='coerce')
-    
-    if assigned_column in df.columns:
-        df[assigned_column] = pd.to_datetime(df[assigned_column], utc=True, errors='coerce')
-    else:
-        df[assigned_column] = df[start_column]  # fallback if no assigned date column
-
-    now_utc = pd.Timestamp.now(tz='UTC')
-
-    # Filter out excluded users
-    exclude_users_normalized = [str(u).strip().lower() for u in exclude_users if u]
-    df_filtered = df[~df[user_column].fillna('').astype(str).str.lower().apply(
-        lambda x: any(u.strip() in exclude_users_normalized for u in x.split(','))
-    )].copy()
-
-
-    # Group by user
-    grouped = df_filtered.groupby(user_column)
-
-    for user, group in grouped:
-        total_tasks = len(group)
-
-        # Completed tasks
-        completed_tasks_df = group[group['SubmissionStatus'] == 'Submitted']
-
-        # Ongoing tasks: Not submitted + either due date in future or start date in future
-        ongoing_tasks_df = group[
-            (group['SubmissionStatus'] != 'Submitted') & 
-            ((group[due_column] >= now_utc) | (group[start_column] >= now_utc))
-        ]
+    df_filtered = df[~exclusion_mask(df[user_column], exclude_users)]
+    if df_filtered.empty:
+        return pd.DataFrame([])
 
-        # Missed tasks: Not submitted + due date in past
-        missed_tasks_df = group[
-            (group['SubmissionStatus'] != 'Submitted') & 
-            (group[due_column] < now_utc)
-        ]
+    def _dates(col):
+        if col in df_filtered.columns:
+            return pd.to_datetime(df_filtered[col], utc=True, errors='coerce')
+        return pd.Series(pd.NaT, index=df_filtered.index, dtype='datetime64[ns, UTC]')
 
-        # ✅ Last assigned date: use AssignedDate if exists
-        last_assigned_date = group[assigned_column].max() if not group[assigned_column].dropna().empty else None
-
-        # Orders received
-        orders_received = group[orders_column].sum() if orders_column in group.columns else 0
-
-        analytics.append({
-            'User': user,
-            'TotalTasks': total_tasks,
-            'CompletedTasksCount': len(completed_tasks_df),
-            'OngoingTasksCount': len(ongoing_tasks_df),
-            'MissedTasksCount': len(missed_tasks_df),
-            'CompletedTasks': completed_tasks_df[title_column].tolist(),
-            'OngoingTasks': ongoing_tasks_df[title_column].tolist(),
-            'MissedTasks': missed_tasks_df[title_column].tolist(),
-            'LastAssignedDate': last_assigned_date.isoformat() if last_assigned_date is not None else None,
-            'OrdersReceived': orders_received
-        })
+    due = _dates(due_column)
+    start = _dates(start_column)
+    # fallback if no assigned date column
+    assigned = _dates(assigned_column) if assigned_column in df_filtered.columns else start
 
-    analytics_df = pd.DataFrame(analytics)
+    now_utc = pd.Timestamp.now(tz='UTC')
+    submission = df_filtered['SubmissionStatus'] if 'SubmissionStatus' in df_filtered.columns else pd.Series(None, index=df_filtered.index)
+    completed = submission == 'Submitted'
+    flags = pd.DataFrame({
+        'user': df_filtered[user_column],
+        'completed': completed,
+        # Ongoing: not submitted + either due date in future or start date in future
+        'ongoing': ~completed & ((due >= now_utc) | (start >= now_utc)),
+        # Missed: not submitted + due date in past
+        'missed': ~completed & (due < now_utc),
+        'assigned': assigned,
+        'orders': (pd.to_numeric(df_filtered[orders_column], errors='coerce').fillna(0)
+                   if orders_column in df_filtered.columns else 0),
+    })
+
+    agg = flags.groupby('user').agg(
+        TotalTasks=('completed', 'size'),
+        CompletedTasksCount=('completed', 'sum'),
+        OngoingTasksCount=('ongoing', 'sum'),
+        MissedTasksCount=('missed', 'sum'),
+        LastAssignedDate=('assigned', 'max'),
+        OrdersReceived=('orders', 'sum'),
+    )
+    if agg.empty:
+        return pd.DataFrame([])
+
+    analytics_df = pd.DataFrame({
+        'User': agg.index,
+        'TotalTasks': agg['TotalTasks'].astype(int).values,
+        'CompletedTasksCount': agg['CompletedTasksCount'].astype(int).values,
+        'OngoingTasksCount': agg['OngoingTasksCount'].astype(int).values,
+        'MissedTasksCount': agg['MissedTasksCount'].astype(int).values,
+    })
+
+    if include_titles:
+        titles = df_filtered[title_column] if title_column in df_filtered.columns else pd.Series(None, index=df_filtered.index)
+        for name, mask in (('CompletedTasks', flags['completed']), ('OngoingTasks', flags['ongoing']),
+                           ('MissedTasks', flags['missed'])):
+            per_user = titles[mask].groupby(flags.loc[mask, 'user']).agg(list)
+            analytics_df[name] = [per_user.get(u, []) for u in agg.index]
+
+    analytics_df['LastAssignedDate'] = [d.isoformat() if pd.notna(d) else None for d in agg['LastAssignedDate']]
+    analytics_df['OrdersReceived'] = agg['OrdersReceived'].values
     return analytics_df
 
 
@@ -655,8 +703,8 @@ def get_user_analytics_specific(df: pd.DataFrame, username: str) -> dict:
             'MissedTasks': []
         }
 
-    # Ensure DueDate is datetime with UTC timezone
-    df['DueDate'] = pd.to_datetime(df['DueDate'], utc=True)
+    # DueDate is tz-aware from ingest (items_to_dataframe); compared as-is
+    due_date = df['DueDate']
 
     # Safe UTC now
     now_utc = pd.Timestamp.utcnow()
@@ -666,18 +714,20 @@ def get_user_analytics_specific(df: pd.DataFrame, username: str) -> dict:
         now_utc = now_utc.tz_convert('UTC')
 
     # Filter tasks for the user
-    user_tasks = df[df['AssignedTo'] == username]
+    is_user = df['AssignedTo'] == username
+    user_tasks = df[is_user]
+    user_due = due_date[is_user]
 
     completed_tasks = user_tasks[user_tasks['SubmissionStatus'] == 'Submitted']
 
     ongoing_tasks = user_tasks[
         (user_tasks['SubmissionStatus'] != 'Submitted') &
-        (user_tasks['DueDate'] >= now_utc)
+        (user_due >= now_utc)
     ]
 
     missed_tasks = user_tasks[
         (user_tasks['SubmissionStatus'] != 'Submitted') &
-        (user_tasks['DueDate'] < now_utc)
+        (user_due < now_utc)
     ]
 
     return {
@@ -701,13 +751,7 @@ def get_user_analytics_specific(df: pd.DataFrame, username: str) -> dict:
 
 def get_onedrive_access_token():
     """Acquires an access token for OneDrive operations."""
-    result = onedrive_msal_app.acquire_token_silent(SCOPE_ONEDRIVE, account=None)
-    if not result:
-        result = onedrive_msal_app.acquire_token_for_client(scopes=SCOPE_ONEDRIVE)
-    if "access_token" in result:
-        return result['access_token']
-    else:
-        raise Exception(f"Failed to acquire OneDrive token: {result.get('error_description')}")
+    return token_manager.get_token(SCOPE_ONEDRIVE[0])
 
 def get_all_contacts_from_onedrive():
     """Fetches all data from the Contacts.xlsx file in the specified user's OneDrive."""
@@ -719,7 +763,7 @@ def get_all_contacts_from_onedrive():
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_USER_ID}/drive/root:/"
             f"{FILE_PATH}:/workbook/worksheets('{CONTACT_WORKSHEET_NAME}')/usedRange"
         )
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         
@@ -748,7 +792,7 @@ def update_contact_in_onedrive_excel(row_id, updated_data_dict):
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_USER_ID}/drive/root:/"
             f"{FILE_PATH}:/workbook/worksheets('{CONTACT_WORKSHEET_NAME}')/range(address='A1:Z1')"
         )
-        header_res = requests.get(header_url, headers=headers)
+        header_res = http_client.get(header_url, headers=headers)
         header_res.raise_for_status()
         header = header_res.json().get("values", [[]])[0]
         if not header: raise Exception("Could not retrieve header row.")
@@ -762,7 +806,7 @@ def update_contact_in_onedrive_excel(row_id, updated_data_dict):
             f"{FILE_PATH}:/workbook/worksheets('{CONTACT_WORKSHEET_NAME}')/range(address='{range_address}')"
         )
         
-        patch_res = requests.patch(update_url, headers=headers, json={"values": [values_to_update]})
+        patch_res = http_client.patch(update_url, headers=headers, json={"values": [values_to_update]})
         patch_res.raise_for_status()
         return True
     except Exception as e:
@@ -783,7 +827,7 @@ def get_all_customers_from_onedrive():
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/"
             f"Customers.xlsx:/workbook/worksheets('Sheet1')/usedRange"
         )
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         
@@ -812,7 +856,7 @@ def get_user_details_from_excell():
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/"
             f"Userdatas.xlsx:/workbook/worksheets('Sheet1')/usedRange"
         )
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         
@@ -842,7 +886,7 @@ def get_user_tasks_details_from_excell():
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/"
             f"Sharepoint Datas.xlsx:/workbook/worksheets('Sheet1')/usedRange"
         )
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
         
@@ -886,7 +930,7 @@ def upload_photo_to_onedrive(photo_file, user_id, email):
         upload_url = (
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/{filename}:/content"
         )
-        response = requests.put(upload_url, headers=headers, data=file_content)
+        response = http_client.put(upload_url, headers=headers, data=file_content)
         response.raise_for_status()
         uploaded_file = response.json()
 
@@ -895,7 +939,7 @@ def upload_photo_to_onedrive(photo_file, user_id, email):
             f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/items/{uploaded_file['id']}/createLink"
         )
         payload = {"type": "view", "scope": "anonymous"}  # anonymous view link
-        link_response = requests.post(link_url, headers=headers, json=payload)
+        link_response = http_client.post(link_url, headers=headers, json=payload)
         link_response.raise_for_status()
 
         share_link = link_response.json()['link']['webUrl']
@@ -928,13 +972,13 @@ def add_or_update_user_in_excel(email, user_id, name, role, photo_file=None):
             row_id = user["row_id"]
             update_values = [[name, email, role, dp_url, 1]]  # columns: name, email, role, dp_url, flag
             update_url = f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/Userdatas.xlsx:/workbook/worksheets('Sheet1')/range(address='A{row_id}:E{row_id}')"
-            response = requests.patch(update_url, headers=headers, json={"values": update_values})
+            response = http_client.patch(update_url, headers=headers, json={"values": update_values})
             response.raise_for_status()
         else:
             # Append new row (Graph API user ID as unique identifier)
             append_values = [[user_id, name, email, role, dp_url, 1]]  # columns: user_id, name, email, role, dp_url, flag
             append_url = f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/root:/Userdatas.xlsx:/workbook/worksheets('Sheet1')/tables('Table1')/rows/add"
-            response = requests.post(append_url, headers=headers, json={"values": append_values})
+            response = http_client.post(append_url, headers=headers, json={"values": append_values})
             response.raise_for_status()
 
         return True
@@ -959,7 +1003,12 @@ def get_task_details(df: pd.DataFrame, task_title: str) -> dict:
     if task_row.empty:
         return {}
 
-    return task_row.iloc[0].to_dict()
+    task = task_row.iloc[0].to_dict()
+    # Typed date columns go back out as ISO strings, as they came from SharePoint
+    for col in DATE_COLUMNS:
+        if col in task:
+            task[col] = task[col].isoformat() if pd.notna(task[col]) else None
+    return task
 
 
 DOMAIN=os.getenv("DOMAIN")
@@ -1036,7 +1085,7 @@ def send_quote_approval_email(quote_data, submitter_email, admin_emails):
 
     # ✅ 3️⃣ Send the mail
     url = f"{GRAPH_API_ENDPOINT}/users/{submitter_email}/sendMail"
-    response = requests.post(url, headers=headers, json=message)
+    response = http_client.post(url, headers=headers, json=message)
     response.raise_for_status()
 
     log.info("Approval email sent successfully.", tag="MAIL")
@@ -1053,7 +1102,7 @@ def add_sharepoint_list_item(item_fields):
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = sp_ids.check_response(http_client.post(url, headers=headers, json=payload), site_id, list_id)
         resp.raise_for_status()
         log.debug(f"Quote item added: {item_fields.get('Reference')}", tag="SP")
         return resp.json()
@@ -1078,7 +1127,7 @@ def update_sharepoint_item(reference, update_fields):
     # Search for item with the reference
     url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?filter=fields/Reference eq '{reference}'"
     headers = {"Authorization": f"Bearer {token}"}
-    resp = requests.get(url, headers=headers)
+    resp = sp_ids.check_response(http_client.get(url, headers=headers), site_id, list_id)
     resp.raise_for_status()
     items = resp.json().get("value", [])
     if not items:
@@ -1086,7 +1135,7 @@ def update_sharepoint_item(reference, update_fields):
 
     item_id = items[0]["id"]
     update_url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items/{item_id}/fields"
-    resp = requests.patch(update_url, headers=headers, json=update_fields)
+    resp = http_client.patch(update_url, headers=headers, json=update_fields)
     resp.raise_for_status()
     return resp.json()
 
@@ -1101,7 +1150,7 @@ def get_list_columns(site_domain, site_path, list_name):
     
     url = f"https://graph.microsoft.com/v1.0/sites/{site_id}/lists/{list_id}/columns"
     headers = {"Authorization": f"Bearer {token}"}
-    response = requests.get(url, headers=headers)
+    response = sp_ids.check_response(http_client.get(url, headers=headers), site_id, list_id)
     response.raise_for_status()
     columns = response.json().get("value", [])
     # for col in columns:
@@ -1158,7 +1207,7 @@ def fetch_filtered_sharepoint_data(access_token, endpoint_url):
     full_url = f"{base_url}{endpoint_url}"
 
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(full_url, headers=headers)
+    resp = http_client.get(full_url, headers=headers)
     resp.raise_for_status()
     items = resp.json().get("value", [])
     return items
@@ -1176,7 +1225,7 @@ def ensure_sharepoint_folder(access_token, site_id, library_name, folder_path):
     """
     headers = {"Authorization": f"Bearer {access_token}"}
     url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/drive/root:/{folder_path}"
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get(url, headers=headers)
     
     if resp.status_code == 404:
         # Folder does not exist, create it
@@ -1187,7 +1236,7 @@ def ensure_sharepoint_folder(access_token, site_id, library_name, folder_path):
             "folder": {},
             "@microsoft.graph.conflictBehavior": "rename"
         }
-        resp = requests.post(create_url, headers={**headers, "Content-Type": "application/json"}, json=payload)
+        resp = http_client.post(create_url, headers={**headers, "Content-Type": "application/json"}, json=payload)
         resp.raise_for_status()
         return resp.json()["id"]
     else:
@@ -1200,7 +1249,7 @@ def upload_file_to_sharepoint(access_token, site_id, folder_path, file_name, fil
     """
     url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/drive/root:/{folder_path}/{file_name}:/content"
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.put(url, headers=headers, data=file_bytes)
+    resp = http_client.put(url, headers=headers, data=file_bytes)
     resp.raise_for_status()
     return resp.json()["webUrl"]  # Download link
 
@@ -1288,7 +1337,7 @@ def get_excel_data_from_onedrive(file_name, sheet_name):
         )
 
         log.debug(f"Fetching from OneDrive: {url}", tag="ONEDRIVE")
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
 
@@ -1319,7 +1368,7 @@ def get_user_profile_photo():
     access_token = get_access_token()
     url ="https://graph.microsoft.com/v1.0/me/photo/$value"
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get(url, headers=headers)
     return resp
 
 
@@ -1338,7 +1387,7 @@ def upload_file_to_sharepoint_folder(folder_path, file_name, file_bytes):
         "Authorization": f"Bearer {token}",
         "Accept": "application/json"
     }
-    resp = requests.put(upload_url, headers=headers, data=file_bytes)
+    resp = http_client.put(upload_url, headers=headers, data=file_bytes)
     resp.raise_for_status()
     share_link = resp.json()["webUrl"]
     return share_link # returns metadata including 'id', 'webUrl' etc.
@@ -1361,7 +1410,7 @@ def update_sharepoint_item_with_link(item_id, link_url):
         "attachmentlink": f"{link_url}"
     }
 
-    resp = requests.patch(patch_url, headers=headers, json=data)
+    resp = http_client.patch(patch_url, headers=headers, json=data)
     resp.raise_for_status()
     return resp.json()
 
@@ -1381,8 +1430,9 @@ def update_user_analytics_in_sharepoint(item_id, item_fields):
     }
 
     # ✅ Send fields dictionary directly
-    resp = requests.patch(patch_url, headers=headers, json=item_fields)
+    resp = http_client.patch(patch_url, headers=headers, json=item_fields)
     resp.raise_for_status()
+    useranalytics.apply_update(item_id, item_fields)
     return resp.json()
 
 
@@ -1398,32 +1448,20 @@ def add_item_to_sharepoint(item_fields):
     headers = {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
     try:
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = sp_ids.check_response(http_client.post(url, headers=headers, json=payload), site_id, list_id)
         resp.raise_for_status()
         log.debug(f"User analytics item added: {item_fields.get('Username')}", tag="SP")
-        return resp.json()
+        created = resp.json()
+        useranalytics.apply_insert(created)
+        return created
     except requests.exceptions.RequestException as e:
         log.error(f"Failed to add user analytics for {item_fields.get('Username')}", tag="SP", exc=e)
         return None
 
 
 def get_existing_useranalytics_items():
-    token = get_access_token()
-    site_id = get_site_id(token, "hamdaz1.sharepoint.com", "/sites/Test")
-    list_id = get_list_id(token, site_id, "useranalytics")
-    url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-    headers = {"Authorization": f"Bearer {token}"}
-
-    all_items = []
-
-    while url:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        all_items.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")  # Fetch next page if exists
-
-    return all_items
+    """useranalytics items ({"id", "fields"}) from the shared in-memory copy."""
+    return useranalytics.items()
 
 
 
@@ -1433,36 +1471,42 @@ from datetime import datetime, timezone
 
 from datetime import datetime, timezone
 
+# Idle days used when a user has never been assigned anything
+NEVER_ASSIGNED_IDLE_DAYS = 9999
+# PriorityKey = active tasks * scale - idle days (ascending = higher priority);
+# the scale only has to exceed any idle-days value
+_PRIORITY_KEY_SCALE = 1_000_000
+
+
+def _priority_columns(df, now):
+    """Adds PriorityScore (tuple, as before) plus the numeric columns the ranking sorts on."""
+    active = pd.to_numeric(df["OngoingTasksCount"], errors="coerce").fillna(0).astype(int)
+    last_assigned = pd.to_datetime(df["LastAssignedDate"], utc=True, errors="coerce")
+    idle_days = ((now - last_assigned).dt.total_seconds() / (24 * 3600)).fillna(NEVER_ASSIGNED_IDLE_DAYS)
+
+    # Primary: negative active tasks (so fewer tasks → higher score)
+    # Secondary: days_since_last (more idle → higher score)
+    df["PriorityScore"] = list(zip((-active).tolist(), idle_days.tolist()))
+    df["PriorityKey"] = active.values * _PRIORITY_KEY_SCALE - idle_days.values
+    return df
+
+
 def calculate_priority_score(user_analytics):
     """
     Calculate priority score based on:
     1. Low active tasks → higher priority
     2. Among similar tasks, longer idle → higher priority
+
+    PriorityScore keeps the (-active_tasks, days_since_last) tuple; the
+    numeric PriorityKey column carries the same ordering for sorting.
     """
     now = pd.Timestamp.now(tz='UTC')
-    scores = []
-
-    for _, row in user_analytics.iterrows():
-        active_tasks = int(row["OngoingTasksCount"])
-        last_assigned = row["LastAssignedDate"]
-
-        if pd.isna(last_assigned) or last_assigned is None:
-            days_since_last = 9999
-        else:
-            if isinstance(last_assigned, str):
-                last_assigned = pd.to_datetime(last_assigned, utc=True)
-            elif isinstance(last_assigned, datetime):
-                last_assigned = pd.to_datetime(last_assigned, utc=True)
-                
-            days_since_last = (now - last_assigned).total_seconds() / (24 * 3600)
-
-        # Primary: negative active tasks (so fewer tasks → higher score)
-        # Secondary: days_since_last (more idle → higher score)
-        score = (-active_tasks, days_since_last)
-        scores.append(score)
-
     df = user_analytics.copy()
-    df["PriorityScore"] = scores
+    if df.empty:
+        df["PriorityScore"] = []
+        return df
+    df = _priority_columns(df, now)
+    df.attrs["priority_as_of"] = now
     return df
 
 
@@ -1470,17 +1514,57 @@ def assign_priority_rank(user_analytics):
     """
     Assign priority rank based on tuple sorting:
     - Highest priority: lowest active tasks, then longest idle
+    Ties keep their input order (stable sort).
     """
     df = user_analytics.copy()
+    if "PriorityKey" not in df.columns:
+        # Frames scored elsewhere only carry the tuple
+        df["PriorityKey"] = [-a * _PRIORITY_KEY_SCALE - idle for a, idle in df["PriorityScore"]]
 
-    # Sort by tuple: (-active_tasks, days_since_last)
-    df = df.sort_values(by="PriorityScore", ascending=False).reset_index(drop=True)
+    df = df.sort_values(by="PriorityKey", kind="mergesort").reset_index(drop=True)
 
     # Assign rank
     df["PriorityRank"] = df.index + 1
     return df
 
 
+def rerank_priorities(ranked, updates):
+    """
+    Incremental re-rank after a few users' counts change.
+
+    `ranked` is the output of assign_priority_rank(calculate_priority_score(...));
+    `updates` maps User -> {"OngoingTasksCount": ..., "LastAssignedDate": ...}.
+    Only the updated rows are re-scored (against the same reference time as
+    the rest) and moved to their new position; everyone else keeps their
+    relative order. Returns a new frame with PriorityRank recomputed.
+    """
+    if ranked.empty or not updates:
+        return ranked
+    now = ranked.attrs.get("priority_as_of") or pd.Timestamp.now(tz='UTC')
+
+    df = ranked.copy()
+    moved_mask = df["User"].isin(list(updates))
+    moved = df[moved_mask].copy()
+    for pos, user in zip(moved.index, moved["User"]):
+        for col, value in updates[user].items():
+            moved.at[pos, col] = value
+    # Sorted among themselves first, so moved rows sharing a slot come out in key order
+    moved = _priority_columns(moved, now).sort_values(by="PriorityKey", kind="mergesort")
+
+    rest = df[~moved_mask]
+    # Each moved row goes in front of rest row `slot` (i.e. after any equal keys)
+    slots = np.searchsorted(rest["PriorityKey"].to_numpy(), moved["PriorityKey"].to_numpy(), side="right")
+    combined = pd.concat([rest, moved], ignore_index=True)
+    primary = np.concatenate([np.arange(len(rest)), slots])
+    secondary = np.concatenate([np.ones(len(rest)), np.zeros(len(moved))])
+    order = np.lexsort((np.arange(len(combined)), secondary, primary))
+
+    out = combined.iloc[order].reset_index(drop=True)
+    out["PriorityRank"] = out.index + 1
+    out.attrs["priority_as_of"] = now
+    return out
+
+
 
 def find_existing_user_item(existing_items, username):
     """Find existing SharePoint row matching the username (case-insensitive)."""
@@ -1504,24 +1588,12 @@ def list_org_users(access_token):
     Returns:
         list: List of users with basic info (id, displayName, mail, userPrincipalName)
     """
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-
-    users = []
-    url = f"{GRAPH_API_ENDPOINT}/users"
-    
-    while url:
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            raise Exception(f"Error fetching users: {response.status_code} - {response.text}")
-        
-        data = response.json()
-        users.extend(data.get("value", []))
-        
-        # Pagination: check if there is a next page
-        url = data.get("@odata.nextLink", None)
+    users = iter_graph_items(
+        f"{GRAPH_API_ENDPOINT}/users",
+        access_token,
+        select=["id", "displayName", "mail", "userPrincipalName"],
+        top=999,
+    )
 
     # Return simplified list
     return [
@@ -1548,7 +1620,7 @@ def get_partnership_data():
             f"competitor_contact_info_full.xlsx:/workbook/worksheets('Sheet1')/usedRange"
         )
 
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, headers=headers)
         response.raise_for_status()
         data = response.json()
 
@@ -1593,7 +1665,7 @@ def save_partnership_update(product_group, product_name, manufacturer, competito
             f"competitor_contact_info_full.xlsx:"
             f"/workbook/worksheets('Sheet1')/usedRange"
         )
-        read_resp = requests.get(read_url, headers=headers)
+        read_resp = http_client.get(read_url, headers=headers)
         read_resp.raise_for_status()
         read_values = read_resp.json().get('values', [])
 
@@ -1649,7 +1721,7 @@ def save_partnership_update(product_group, product_name, manufacturer, competito
         )
 
         payload = {"values": [[new_value]]}
-        patch_resp = requests.patch(update_url, headers=headers, json=payload)
+        patch_resp = http_client.patch(update_url, headers=headers, json=payload)
         patch_resp.raise_for_status()
 
         log.debug(f"Partnership updated: {field} for {manufacturer} ({product_name}) → {new_value}", tag="DATA")
@@ -1677,7 +1749,7 @@ def get_child_files():
         "Authorization": f"Bearer {access_token}"
     }
 
-    res = requests.get(url, headers=headers)
+    res = http_client.get(url, headers=headers)
     res.raise_for_status()
 
     return res.json().get("value", [])
@@ -1699,7 +1771,7 @@ def download_docx(file_id):
 
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     response.raise_for_status()
 
     # Save to a temporary DOCX
@@ -1720,13 +1792,13 @@ def download_file(file_id):
     # 1. Get file metadata to find the original name
     meta_url = f"https://graph.microsoft.com/v1.0/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/items/{file_id}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    meta_response = requests.get(meta_url, headers=headers)
+    meta_response = http_client.get(meta_url, headers=headers)
     meta_response.raise_for_status()
     file_name = meta_response.json().get("name")
     
     # 2. Get file content
     content_url = f"https://graph.microsoft.com/v1.0/users/{ONEDRIVE_PRIMARY_USER_ID}/drive/items/{file_id}/content"
-    content_response = requests.get(content_url, headers=headers)
+    content_response = http_client.get(content_url, headers=headers)
     content_response.raise_for_status()
 
     # 3. Save to a temporary file with original extension
@@ -1826,7 +1898,7 @@ def fetch_user_planner_tasks():
     access_token = get_access_token()
     headers = {"Authorization": f"Bearer {access_token}"}
     url = "https://graph.microsoft.com/v1.0/me/planner/tasks"
-    resp = requests.get(url, headers=headers)
+    resp = http_client.get(url, headers=headers)
     resp.raise_for_status()
     tasks = resp.json().get("value", [])
     
@@ -1840,7 +1912,7 @@ def get_user_teams_chats():
 
     # Step 1: Get all chats for the user
     chat_list_url = f"{GRAPH_API_ENDPOINT}/users/{ONEDRIVE_USER_ID}/chats"
-    chat_list_response = requests.get(chat_list_url, headers=headers)
+    chat_list_response = http_client.get(chat_list_url, headers=headers)
     chat_list_response.raise_for_status()
     chats = chat_list_response.json().get("value", [])
 
@@ -1850,7 +1922,7 @@ def get_user_teams_chats():
     for chat in chats:
         chat_id = chat["id"]
         messages_url = f"{GRAPH_API_ENDPOINT}/chats/{chat_id}/messages"
-        messages_response = requests.get(messages_url, headers=headers)
+        messages_response = http_client.get(messages_url, headers=headers)
         messages_response.raise_for_status()
 
         all_chat_messages[chat_id] = messages_response.json().get("value", [])
@@ -1874,7 +1946,7 @@ def save_distributors_data_to_sharepoint(distributors_data):
 
     for distributor in distributors_data:
         payload = {"fields": distributor}
-        resp = requests.post(url, headers=headers, json=payload)
+        resp = sp_ids.check_response(http_client.post(url, headers=headers, json=payload), site_id, list_id)
         resp.raise_for_status()
 
     log.debug(f"Saved {len(distributors_data)} distributor(s) to SharePoint.", tag="SP")
@@ -1887,15 +1959,7 @@ def excludeusers_from_sl():
         access_token = get_access_token()
         site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
         list_id = get_list_id(access_token, site_id, "excludeusers")
-        url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        all_items = []
-        while url:
-            resp = requests.get(url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            all_items.extend(data.get("value", []))
-            url = data.get("@odata.nextLink")  # Fetch next page if exists
+        all_items = iter_list_items(access_token, site_id, list_id, fields=["Usernames"])
         
         excluded_users = []
         for item in all_items:
@@ -1914,15 +1978,7 @@ def superusers_from_sl():
         access_token = get_access_token()
         site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
         list_id = get_list_id(access_token, site_id, "superusers")
-        url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        all_items = []
-        while url:
-            resp = requests.get(url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            all_items.extend(data.get("value", []))
-            url = data.get("@odata.nextLink")
+        all_items = iter_list_items(access_token, site_id, list_id, fields=["mail"])
         
         superusers = []
         for item in all_items:
@@ -1941,15 +1997,7 @@ def approvers_from_sl():
         access_token = get_access_token()
         site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
         list_id = get_list_id(access_token, site_id, "approvers")
-        url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        headers = {"Authorization": f"Bearer {access_token}"}
-        all_items = []
-        while url:
-            resp = requests.get(url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            all_items.extend(data.get("value", []))
-            url = data.get("@odata.nextLink")
+        all_items = iter_list_items(access_token, site_id, list_id, fields=["mail"])
         
         approvers = []
         for item in all_items:
@@ -1964,20 +2012,7 @@ def approvers_from_sl():
         return []
 
 def user_with_jobs_ls():
-    access_token = get_access_token()
-    site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
-    list_id = get_list_id(access_token, site_id, "useranalytics")
-    url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    all_items = []
-    while url:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        all_items.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")  # Fetch next page if exists
-    users_and_jobs = {item['fields']['Username'].strip(): item['fields']['Jobs'] for item in all_items}
-    users_and_jobscount = {item['fields']['Username'].strip(): len([job for job in item['fields']['Jobs'].split(",") if job.strip()]) for item in all_items}
+    users_and_jobscount = {row.username: row.job_count for row in useranalytics.rows()}
     # removed: log.debug(str(users_and_jobscount), tag="SWP")  # too verbose
     return users_and_jobscount
 
@@ -1994,37 +2029,13 @@ def user_with_jobs_ls():
 # -----------------------------------------------------------------------------------------------------------
 
 def get_users_with_priority():
-    access_token = get_access_token()
-    site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
-    list_id = get_list_id(access_token, site_id, "useranalytics")
-    url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    all_items = []
-    while url:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        all_items.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")  # Fetch next page if exists
-        username_and_priority = {item['fields']['Username'].strip(): item['fields']['Priority'] for item in all_items}
-        # removed: log.debug(str(username_and_priority), tag="SWP")  # too verbose
+    username_and_priority = {row.username: row.priority for row in useranalytics.rows() if row.priority is not None}
+    # removed: log.debug(str(username_and_priority), tag="SWP")  # too verbose
     return username_and_priority
 
 
 def get_users_sawpcount():
-    access_token = get_access_token()
-    site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/Test")
-    list_id = get_list_id(access_token, site_id, "useranalytics")
-    url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    all_items = []
-    while url:
-        resp = requests.get(url, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        all_items.extend(data.get("value", []))
-        url = data.get("@odata.nextLink")  # Fetch next page if exists
-    users_and_sawpcount = {item['fields']['Username'].strip(): item['fields']['swapcounter'] for item in all_items}
+    users_and_sawpcount = {row.username: row.swapcounter for row in useranalytics.rows()}
     # removed: log.debug(str(users_and_sawpcount), tag="SWP")  # too verbose
     return users_and_sawpcount
 
@@ -2070,11 +2081,9 @@ def swp():
 
         log.info(f"Swap: {busy_user} <-> {swap_partner}", tag="SWP")
 
-        # Get existing SharePoint items to find the item IDs
-        existing_items = get_existing_useranalytics_items()
-
-        busy_user_item = find_existing_user_item(existing_items, busy_user)
-        swap_partner_item = find_existing_user_item(existing_items, swap_partner)
+        # Username -> item lookup on the shared useranalytics copy
+        busy_user_item = useranalytics.row_for(busy_user)
+        swap_partner_item = useranalytics.row_for(swap_partner)
 
         if not busy_user_item or not swap_partner_item:
             log.warn("Could not find SharePoint items for one or both swap candidates.", tag="SWP")
@@ -2091,12 +2100,12 @@ def swp():
         swap_counts[busy_user] += 1
         
         # Update SharePoint items
-        update_user_analytics_in_sharepoint(busy_user_item['id'], {
+        update_user_analytics_in_sharepoint(busy_user_item.item_id, {
             "Priority": priorities[busy_user],
             "swapcounter": swap_counts[busy_user]
         })
         
-        update_user_analytics_in_sharepoint(swap_partner_item['id'], {
+        update_user_analytics_in_sharepoint(swap_partner_item.item_id, {
             "Priority": priorities[swap_partner]
         })
 
@@ -2111,7 +2120,7 @@ def get_teams_stauts(user_id):
     url = f"{GRAPH_API_ENDPOINT}/users/{user_id}/presence"
     headers = {"Authorization": f"Bearer {get_access_token()}"}
     
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     response.raise_for_status()
     
     return response.json()
@@ -2139,17 +2148,18 @@ def add_user_to_excludelist(username: str) -> bool:
         list_id = get_list_id(access_token, site_id, "excludeusers")
         auth_headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
 
-        check_url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        check_resp = requests.get(check_url, headers={"Authorization": f"Bearer {access_token}"})
-        if check_resp.ok:
-            for item in check_resp.json().get("value", []):
+        try:
+            # Stops paging as soon as the user is found
+            for item in iter_list_items(access_token, site_id, list_id, fields=["Usernames"]):
                 if item.get("fields", {}).get("Usernames", "").strip().lower() == username.strip().lower():
                     log.debug(f"{username} already in exclude list — skipping.", tag="SP")
                     return True
+        except Exception as check_err:
+            log.warn("Exclude-list duplicate check failed — adding anyway", tag="SP", exc=check_err)
 
         url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items"
         payload = {"fields": {"Usernames": username}}
-        resp = requests.post(url, headers=auth_headers, json=payload)
+        resp = sp_ids.check_response(http_client.post(url, headers=auth_headers, json=payload), site_id, list_id)
         resp.raise_for_status()
         log.info(f"Added {username} to exclude list.", tag="SP")
         return True
@@ -2169,13 +2179,8 @@ def remove_user_from_excludelist(username: str) -> bool:
         list_id = get_list_id(access_token, site_id, "excludeusers")
         headers = {"Authorization": f"Bearer {access_token}"}
 
-        search_url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        resp = requests.get(search_url, headers=headers)
-        resp.raise_for_status()
-        items = resp.json().get("value", [])
-
         item_id = None
-        for item in items:
+        for item in iter_list_items(access_token, site_id, list_id, fields=["Usernames"]):
             if item.get("fields", {}).get("Usernames", "").strip().lower() == username.strip().lower():
                 item_id = item["id"]
                 break
@@ -2185,7 +2190,7 @@ def remove_user_from_excludelist(username: str) -> bool:
             return True
 
         delete_url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items/{item_id}"
-        del_resp = requests.delete(delete_url, headers=headers)
+        del_resp = http_client.delete(delete_url, headers=headers)
         del_resp.raise_for_status()
         log.info(f"Removed {username} from exclude list.", tag="SP")
         return True
@@ -2205,16 +2210,10 @@ def get_ongoing_proposals_for_user(username: str) -> list:
         access_token = get_access_token()
         site_id = get_site_id(access_token, "hamdaz1.sharepoint.com", "/sites/ProposalTeam")
         list_id = get_list_id(access_token, site_id, "Proposals")
-        headers = {"Authorization": f"Bearer {access_token}"}
-
-        url = f"{GRAPH_API_ENDPOINT}/sites/{site_id}/lists/{list_id}/items?expand=fields"
-        all_items = []
-        while url:
-            resp = requests.get(url, headers=headers)
-            resp.raise_for_status()
-            data = resp.json()
-            all_items.extend(data.get("value", []))
-            url = data.get("@odata.nextLink")
+        all_items = iter_list_items(
+            access_token, site_id, list_id,
+            fields=["Title", "BCD", "Status", "SubmissionStatus", "AssignedTo"],
+        )
 
         results = []
         for item in all_items:
@@ -2262,7 +2261,7 @@ def handoff_proposals_to_user(from_username: str, to_username: str, proposal_ids
                     "AssignedTo": to_username,
                     "PreviousOwner": from_username,
                 }
-                resp = requests.patch(patch_url, headers=headers, json=payload)
+                resp = http_client.patch(patch_url, headers=headers, json=payload)
                 resp.raise_for_status()
                 log.debug(f"Handing off proposal {item_id}: {from_username} → {to_username}", tag="SP")
                 success_ids.append(item_id)
@@ -0,0 +1,125 @@
+"""
+sp_resolver.py — Cached SharePoint site-ID / list-ID resolution
+===============================================================
+Usage:
+    from sp_resolver import sp_ids
+    site_id, list_id = sp_ids.resolve(access_token, "hamdaz1.sharepoint.com", "/sites/Test", "Quotes")
+
+Site and list IDs never change, so they are resolved once and persisted to
+.cache/sp_ids.json. An entry is only dropped when Graph answers 404 for it
+(list deleted / recreated), via sp_ids.check_response(resp, site_id, list_id)
+on list-level requests.
+
+Resolving a list downloads the site's list catalogue once and caches every
+list on that site, so later lookups on the same site are free.
+"""
+
+import threading
+
+import http_client
+from local_store import load_json, save_json
+from logger import log
+
+GRAPH_API = "https://graph.microsoft.com/v1.0"
+CACHE_FILE = "sp_ids.json"
+
+
+class SharePointIdResolver:
+    def __init__(self, cache_file=CACHE_FILE):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        data = load_json(cache_file, default={}) or {}
+        self._sites = data.get("sites", {})   # "domain:path"      -> site_id
+        self._lists = data.get("lists", {})   # "site_id|listname" -> list_id
+
+    # ----------------------------
+    # Keys / persistence
+    # ----------------------------
+    @staticmethod
+    def _site_key(site_domain, site_path):
+        return f"{site_domain.lower()}:{site_path.rstrip('/').lower()}"
+
+    @staticmethod
+    def _list_key(site_id, list_name):
+        return f"{site_id}|{list_name}"
+
+    def _persist(self):
+        save_json(self.cache_file, {"sites": self._sites, "lists": self._lists})
+
+    # ----------------------------
+    # Lookups
+    # ----------------------------
+    def site_id(self, access_token, site_domain, site_path):
+        key = self._site_key(site_domain, site_path)
+        cached = self._sites.get(key)
+        if cached:
+            return cached
+
+        headers = {"Authorization": f"Bearer {access_token}"}
+        resp = http_client.get(f"{GRAPH_API}/sites/{site_domain}:{site_path}", headers=headers)
+        if resp.status_code != 200:
+            raise Exception(f"Error fetching site ID: {resp.text}")
+        site_id = resp.json().get("id")
+        with self._lock:
+            self._sites[key] = site_id
+            self._persist()
+        return site_id
+
+    def list_id(self, access_token, site_id, list_name):
+        cached = self._lists.get(self._list_key(site_id, list_name))
+        if cached:
+            return cached
+
+        headers = {"Authorization": f"Bearer {access_token}"}
+        url = f"{GRAPH_API}/sites/{site_id}/lists?$select=id,name"
+        catalogue = {}
+        while url:
+            resp = http_client.get(url, headers=headers)
+            if resp.status_code != 200:
+                raise Exception(f"Error fetching lists: {resp.text}")
+            data = resp.json()
+            for l in data.get("value", []):
+                if l.get("name") and l.get("id"):
+                    catalogue[self._list_key(site_id, l["name"])] = l["id"]
+            url = data.get("@odata.nextLink")
+
+        with self._lock:
+            self._lists.update(catalogue)
+            self._persist()
+
+        list_id = catalogue.get(self._list_key(site_id, list_name))
+        if not list_id:
+            raise Exception(f"List '{list_name}' not found.")
+        return list_id
+
+    def resolve(self, access_token, site_domain, site_path, list_name):
+        """Returns (site_id, list_id) for a (domain, path, list name) triple."""
+        site_id = self.site_id(access_token, site_domain, site_path)
+        return site_id, self.list_id(access_token, site_id, list_name)
+
+    # ----------------------------
+    # Invalidation
+    # ----------------------------
+    def invalidate(self, site_id, list_id=None):
+        """
+        Forgets a cached site and its list(s). With list_id only that list is
+        dropped from the catalogue; the site mapping is re-resolved either way
+        because a 404 does not say which of the two went away.
+        """
+        with self._lock:
+            self._sites = {k: v for k, v in self._sites.items() if v != site_id}
+            if list_id is None:
+                self._lists = {k: v for k, v in self._lists.items() if not k.startswith(f"{site_id}|")}
+            else:
+                self._lists = {k: v for k, v in self._lists.items() if v != list_id}
+            self._persist()
+        log.warn(f"SharePoint ID cache invalidated (site={site_id}, list={list_id})", tag="SP")
+
+    def check_response(self, resp, site_id, list_id=None):
+        """Invalidates the cached IDs when Graph says the site/list no longer exists."""
+        if resp is not None and resp.status_code == 404:
+            self.invalidate(site_id, list_id)
+        return resp
+
+
+sp_ids = SharePointIdResolver()
@@ -0,0 +1,121 @@
+"""
+startup.py — Background warm-up tasks and readiness tracking
+============================================================
+Usage:
+    from startup import warmup
+    warmup.add("acl", lambda: acl.refresh(force=True))
+    warmup.add("proposals", load_proposals, after=("acl",))
+    warmup.add("pinecone", connect_pinecone, required=False)
+    warmup.start()                        # returns immediately
+
+    warmup.is_ready("proposals")          # cheap check for request handlers
+    warmup.wait("proposals", timeout=5)   # block (background loops) until ready
+    warmup.status()                       # what /readyz reports
+
+Each task runs once in its own daemon thread, after the tasks named in
+`after` are ready. A task that raises is retried with exponential backoff
+(WARMUP_RETRY_BASE seconds, doubling up to WARMUP_RETRY_MAX), so a slow or
+briefly unavailable dependency delays only the features that need it,
+never the process start. The app counts as ready when every required
+task is ready; optional tasks are reported but do not gate readiness.
+"""
+
+import os
+import threading
+import time
+
+from logger import log
+
+WARMUP_RETRY_BASE = float(os.getenv("WARMUP_RETRY_BASE", "5"))
+WARMUP_RETRY_MAX = float(os.getenv("WARMUP_RETRY_MAX", "60"))
+
+
+class _Task:
+    __slots__ = ("name", "fn", "required", "after", "state", "attempts", "error", "duration_ms", "ready")
+
+    def __init__(self, name, fn, required, after):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.after = tuple(after)
+        self.state = "pending"          # pending -> running -> ready, or failed (and retrying)
+        self.attempts = 0
+        self.error = None
+        self.duration_ms = None
+        self.ready = threading.Event()
+
+
+class WarmUp:
+    def __init__(self):
+        self._tasks = {}
+        self._started = False
+        self.started_at = time.time()
+
+    def add(self, name, fn, required=True, after=()):
+        """Registers a warm-up step. Call before start()."""
+        self._tasks[name] = _Task(name, fn, required, after)
+
+    def start(self):
+        """Starts every registered task in the background. Safe to call twice."""
+        if self._started:
+            return
+        self._started = True
+        self.started_at = time.time()
+        for task in self._tasks.values():
+            threading.Thread(target=self._run, args=(task,), name=f"warmup-{task.name}", daemon=True).start()
+
+    def _run(self, task):
+        for dep in task.after:
+            self.wait(dep)
+        delay = WARMUP_RETRY_BASE
+        while True:
+            task.state = "running"
+            task.attempts += 1
+            started = time.perf_counter()
+            try:
+                task.fn()
+            except Exception as e:
+                task.state = "failed"
+                task.error = str(e)
+                log.error(f"Warm-up '{task.name}' failed (attempt {task.attempts}), retrying in {delay:.0f}s",
+                          tag="STARTUP", exc=e)
+                time.sleep(delay)
+                delay = min(delay * 2, WARMUP_RETRY_MAX)
+                continue
+            task.duration_ms = round((time.perf_counter() - started) * 1000)
+            task.state = "ready"
+            task.error = None
+            task.ready.set()
+            log.info(f"Warm-up '{task.name}' ready in {task.duration_ms} ms", tag="STARTUP")
+            return
+
+    def is_ready(self, name=None):
+        """One task's readiness, or (name=None) whether every required task is ready."""
+        if name is not None:
+            task = self._tasks.get(name)
+            return task is not None and task.ready.is_set()
+        return all(t.ready.is_set() for t in self._tasks.values() if t.required)
+
+    def wait(self, name, timeout=None):
+        """Blocks until the task is ready. Returns False on timeout (or an unknown task)."""
+        task = self._tasks.get(name)
+        return task is not None and task.ready.wait(timeout)
+
+    def status(self):
+        return {
+            "ready": self.is_ready(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "tasks": {
+                t.name: {
+                    "state": t.state,
+                    "required": t.required,
+                    "attempts": t.attempts,
+                    "duration_ms": t.duration_ms,
+                    "error": t.error,
+                }
+                for t in self._tasks.values()
+            },
+        }
+
+
+warmup = WarmUp()
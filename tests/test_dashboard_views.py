@@ -0,0 +1,79 @@
+"""Dashboard views must give what the routes computed from get_user_analytics_specific before them."""
+
+import pandas as pd
+
+from dashboard_views import UAE_TZ, DashboardViews
+from sharepoint_items import get_user_analytics_specific, items_to_dataframe
+
+
+def _baseline_dashboard(df, username, now_utc):
+    """The / route before dashboard_views: ongoing tasks narrowed to BCD still ahead."""
+    data = get_user_analytics_specific(df, username)
+    ongoing = [
+        t for t in data['OngoingTasks']
+        if t['BCD'] > now_utc and t.get('SubmissionStatus', '') != 'Submitted'
+    ]
+    data['OngoingTasks'] = ongoing
+    data['OngoingTasksCount'] = len(ongoing)
+    # Due today is taken on the Dubai calendar (the route used the UTC date)
+    today = now_utc.tz_convert(UAE_TZ).date()
+    due_today = len([t for t in ongoing if pd.to_datetime(t['BCD']).date() == today])
+    return data, due_today
+
+
+def _items(now):
+    soon = (now + pd.Timedelta(seconds=1)).isoformat()
+    later = (now + pd.Timedelta(days=10)).isoformat()
+    earlier = (now - pd.Timedelta(days=10)).isoformat()
+    rows = [
+        ("past-due", "2020-01-01T00:00:00Z", later, "In Progress"),
+        ("no-due", None, later, "In Progress"),
+        ("ongoing", later, later, "In Progress"),
+        ("bcd-passed", later, earlier, "In Progress"),
+        ("submitted", later, later, "Submitted"),
+        ("due-today", later, soon, "In Progress"),
+        ("past-due-today", "2020-01-01T00:00:00Z", soon, "In Progress"),
+    ]
+    items = []
+    for item_id, due, bcd, submission in rows:
+        item = {"id": item_id, "AssignedTo": "Alice", "BCD": bcd, "SubmissionStatus": submission,
+                "Order Status": "Received"}
+        if due is not None:
+            item["DueDate"] = due
+        items.append(item)
+    items.append({"id": "other", "AssignedTo": "Bob", "DueDate": later, "BCD": later,
+                  "SubmissionStatus": "In Progress"})
+    return items
+
+
+def _ids(tasks):
+    return sorted(t["id"] for t in tasks)
+
+
+def test_dashboard_matches_baseline_on_past_due_and_missing_due_date():
+    now = pd.Timestamp.now(tz="UTC")
+    df = items_to_dataframe(_items(now))
+    view = DashboardViews._build(df)["Alice"]
+
+    expected, expected_due_today = _baseline_dashboard(df, "Alice", now)
+    actual = view.dashboard(now)
+
+    assert _ids(actual["OngoingTasks"]) == _ids(expected["OngoingTasks"]) == ["due-today", "ongoing"]
+    for key in ("TotalTasks", "OngoingTasksCount", "CompletedTasksCount", "MissedTasksCount", "OrdersReceived"):
+        assert actual[key] == expected[key], key
+    assert _ids(actual["MissedTasks"]) == _ids(expected["MissedTasks"])
+    assert _ids(actual["CompletedTasks"]) == _ids(expected["CompletedTasks"])
+    assert view.due_today_count(now) == expected_due_today == 1
+
+
+def test_analytics_matches_get_user_analytics_specific():
+    now = pd.Timestamp.now(tz="UTC")
+    df = items_to_dataframe(_items(now))
+    views = DashboardViews._build(df)
+    for user in ("Alice", "Bob"):
+        expected = get_user_analytics_specific(df, user)
+        actual = views[user].analytics(now)
+        for key in ("TotalTasks", "OngoingTasksCount", "CompletedTasksCount", "MissedTasksCount", "OrdersReceived"):
+            assert actual[key] == expected[key], (user, key)
+        for key in ("OngoingTasks", "CompletedTasks", "MissedTasks", "user_tasks"):
+            assert _ids(actual[key]) == _ids(expected[key]), (user, key)
@@ -0,0 +1,57 @@
+"""rerank_priorities must give the same order as a full calculate_priority_score + assign_priority_rank."""
+
+import random
+
+import pandas as pd
+
+from sharepoint_items import _priority_columns, assign_priority_rank, calculate_priority_score, rerank_priorities
+
+
+def _analytics(counts, last_assigned):
+    return pd.DataFrame({
+        "User": list(counts),
+        "OngoingTasksCount": list(counts.values()),
+        "LastAssignedDate": [last_assigned[u] for u in counts],
+    })
+
+
+def _full_rank(counts, last_assigned, as_of):
+    scored = calculate_priority_score(_analytics(counts, last_assigned))
+    # Same reference time as the incremental path, so idle days line up exactly
+    scored = _priority_columns(scored, as_of)
+    return assign_priority_rank(scored)
+
+
+def test_moved_rows_sharing_a_slot_are_ordered_by_key():
+    dates = {u: "2026-10-01T00:00:00Z" for u in "abc"}
+    ranked = assign_priority_rank(calculate_priority_score(_analytics({"a": 0, "b": 1, "c": 2}, dates)))
+    out = rerank_priorities(ranked, {"a": {"OngoingTasksCount": 5}, "b": {"OngoingTasksCount": 3}})
+    assert out["User"].tolist() == ["c", "b", "a"]
+    assert out["PriorityRank"].tolist() == [1, 2, 3]
+
+
+def test_incremental_rerank_matches_full_rank():
+    rng = random.Random(7)
+    base = pd.Timestamp("2026-01-01", tz="UTC")
+    for _ in range(50):
+        users = [f"user{i}" for i in range(30)]
+        counts = {u: rng.randint(0, 6) for u in users}
+        # Distinct timestamps, so there are no exact key ties whose order is arbitrary
+        offsets = rng.sample(range(1, 500_000), len(users))
+        dates = {u: (base + pd.Timedelta(minutes=m)).isoformat() for u, m in zip(users, offsets)}
+
+        ranked = assign_priority_rank(calculate_priority_score(_analytics(counts, dates)))
+        as_of = ranked.attrs["priority_as_of"]
+
+        updates = {}
+        for u in rng.sample(users, rng.randint(1, 8)):
+            counts[u] = rng.randint(0, 6)
+            updates[u] = {"OngoingTasksCount": counts[u]}
+            if rng.random() < 0.5:
+                dates[u] = (base + pd.Timedelta(minutes=rng.randint(500_000, 600_000))).isoformat()
+                updates[u]["LastAssignedDate"] = dates[u]
+
+        incremental = rerank_priorities(ranked, updates)
+        full = _full_rank(counts, dates, as_of)
+        assert incremental["User"].tolist() == full["User"].tolist()
+        assert incremental["PriorityRank"].tolist() == list(range(1, len(users) + 1))
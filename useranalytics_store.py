@@ -0,0 +1,147 @@
+"""
+useranalytics_store.py — In-memory copy of the SharePoint useranalytics list
+===========================================================================
+Usage:
+    from useranalytics_store import useranalytics
+    useranalytics.reload()                 # once per background tick
+    for row in useranalytics.rows():       # typed rows
+        row.username, row.priority, row.job_count, row.swapcounter
+    useranalytics.row_for("JohnDoe")       # username -> row, case-insensitive
+    useranalytics.items()                  # raw {"id", "fields"} items (read-only)
+
+    # after a successful write to the list
+    useranalytics.apply_update(item_id, fields)
+    useranalytics.apply_insert(created_item)
+
+Priority, jobs and swap counters all live on the same list, so one read
+serves every consumer (swp, the analytics write-back, get_priority_one_user).
+Reads reload the list only when the copy is older than
+USERANALYTICS_MAX_AGE seconds. Successful write-backs are applied locally so
+the copy stays current between reloads without another fetch.
+"""
+
+import os
+import threading
+import time
+
+from graph_auth import token_manager
+from graph_paging import iter_graph_items
+from logger import log
+from sp_resolver import sp_ids
+
+GRAPH_API = "https://graph.microsoft.com/v1.0"
+SITE_DOMAIN = "hamdaz1.sharepoint.com"
+SITE_PATH = "/sites/Test"
+LIST_NAME = "useranalytics"
+USERANALYTICS_MAX_AGE = int(os.getenv("USERANALYTICS_MAX_AGE", "120"))
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value, default=0):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return default
+
+
+class UserAnalyticsRow:
+    """One useranalytics item with its columns parsed."""
+
+    __slots__ = ("item_id", "username", "priority", "jobs", "swapcounter", "active_tasks", "fields")
+
+    def __init__(self, item):
+        fields = item.get("fields", {})
+        self.item_id = item.get("id")
+        self.fields = fields
+        self.username = str(fields.get("Username") or "").strip()
+        self.priority = _to_float(fields.get("Priority"))
+        self.jobs = tuple(j.strip() for j in str(fields.get("Jobs") or "").split(",") if j.strip())
+        self.swapcounter = _to_int(fields.get("swapcounter"))
+        self.active_tasks = _to_int(fields.get("ActiveTasks"))
+
+    @property
+    def job_count(self):
+        return len(self.jobs)
+
+
+class UserAnalyticsStore:
+    def __init__(self, max_age=USERANALYTICS_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._items = {}            # item_id -> raw item
+        self._rows = {}             # item_id -> UserAnalyticsRow
+        self._by_username = {}      # lowercase username -> item_id
+        self._loaded_at = 0.0
+
+    def reload(self):
+        """Reads the whole list once and replaces the local copy."""
+        access_token = token_manager.get_token()
+        site_id, list_id = sp_ids.resolve(access_token, SITE_DOMAIN, SITE_PATH, LIST_NAME)
+        items = list(iter_graph_items(
+            f"{GRAPH_API}/sites/{site_id}/lists/{list_id}/items",
+            access_token=access_token,
+            expand="fields",
+            on_response=lambda resp: sp_ids.check_response(resp, site_id, list_id),
+        ))
+        with self._lock:
+            self._items = {i.get("id"): i for i in items}
+            self._rows = {i.get("id"): UserAnalyticsRow(i) for i in items}
+            self._by_username = {r.username.lower(): r.item_id for r in self._rows.values() if r.username}
+            self._loaded_at = time.time()
+        log.debug(f"useranalytics loaded: {len(items)} row(s)", tag="UA")
+
+    def _ensure_fresh(self):
+        if time.time() - self._loaded_at > self.max_age:
+            self.reload()
+
+    # ----------------------------
+    # Reads
+    # ----------------------------
+    def items(self):
+        self._ensure_fresh()
+        return list(self._items.values())
+
+    def rows(self):
+        """Typed rows that have a Username."""
+        self._ensure_fresh()
+        return [r for r in self._rows.values() if r.username]
+
+    def row_for(self, username):
+        """The row whose Username matches (case-insensitive), or None."""
+        self._ensure_fresh()
+        item_id = self._by_username.get(str(username or "").strip().lower())
+        return self._rows.get(item_id) if item_id is not None else None
+
+    # ----------------------------
+    # Write-backs
+    # ----------------------------
+    def apply_update(self, item_id, fields):
+        """Merges fields that were PATCHed successfully into the local copy."""
+        with self._lock:
+            item = self._items.get(item_id)
+            if item is None:
+                return
+            updated = {**item, "fields": {**item.get("fields", {}), **fields}}
+            self._items[item_id] = updated
+            self._rows[item_id] = row = UserAnalyticsRow(updated)
+            if row.username:
+                self._by_username[row.username.lower()] = item_id
+
+    def apply_insert(self, item):
+        """Adds an item returned by a successful POST to the list."""
+        if not item or not item.get("id"):
+            return
+        with self._lock:
+            self._items[item["id"]] = item
+            self._rows[item["id"]] = row = UserAnalyticsRow(item)
+            if row.username:
+                self._by_username[row.username.lower()] = item["id"]
+
+
+useranalytics = UserAnalyticsStore()
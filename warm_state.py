@@ -0,0 +1,158 @@
+"""
+warm_state.py — On-disk copy of the Proposals snapshot for fast restarts
+=======================================================================
+Usage:
+    from warm_state import warm_state
+    warm = warm_state.load()              # None if missing, too old or unreadable
+    if warm:
+        proposals.publish(warm.items)
+        delta_link = warm.delta_link      # resume the delta feed where we left off
+    ...
+    warm_state.save(snapshot.items, delta_link, user_analytics)
+    warm_state.stamp()                    # saved_at of the state on disk; followers poll this
+
+What is saved is the raw Proposals items, the delta link that goes with
+them, and the last generate_user_analytics frame. Everything else (typed
+frame, indexes, cube, dashboard views) is rebuilt from the items by the
+publish, so a restart reads one file instead of paging the whole list out
+of SharePoint.
+
+The items are written as Parquet when pyarrow is installed, and as a
+pickle otherwise (or when a column has values Arrow can't type). A small
+JSON manifest (warm_state.json) is written last and names the format, so
+a crash mid-save leaves the previous state readable. State older than
+WARM_STATE_MAX_AGE seconds is ignored; an expired delta link is handled by
+the caller's normal full resync.
+"""
+
+import io
+import math
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+from local_store import atomic_write, cache_path, load_json, save_json
+from logger import log
+
+try:
+    import pyarrow  # noqa: F401  (optional: enables the Parquet format)
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
+MANIFEST_FILE = "warm_state.json"
+ITEMS_PARQUET = "warm_proposals.parquet"
+ANALYTICS_PARQUET = "warm_user_analytics.parquet"
+PICKLE_FILE = "warm_state.pkl"
+WARM_STATE_VERSION = 1          # bump when the item layout (flatten_fields) changes
+WARM_STATE_MAX_AGE = int(os.getenv("WARM_STATE_MAX_AGE", str(3 * 24 * 3600)))
+
+WarmSnapshot = namedtuple("WarmSnapshot", "items delta_link user_analytics saved_at")
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _parquet_bytes(frame):
+    buf = io.BytesIO()
+    frame.to_parquet(buf, index=False)
+    return buf.getvalue()
+
+
+class WarmState:
+    def __init__(self, max_age=WARM_STATE_MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    # ----------------------------
+    # Save
+    # ----------------------------
+    def _save_parquet(self, items, user_analytics):
+        atomic_write(ITEMS_PARQUET, _parquet_bytes(pd.DataFrame(list(items))), mode="wb")
+        atomic_write(ANALYTICS_PARQUET, _parquet_bytes(user_analytics), mode="wb")
+
+    def _save_pickle(self, items, user_analytics):
+        payload = {"items": list(items), "user_analytics": user_analytics}
+        atomic_write(PICKLE_FILE, pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL), mode="wb")
+
+    def save(self, items, delta_link, user_analytics=None):
+        """Writes the items, their delta link and the analytics frame. Failures are logged, never raised."""
+        if user_analytics is None:
+            user_analytics = pd.DataFrame()
+        started = time.perf_counter()
+        with self._lock:
+            fmt = "pickle"
+            if HAS_PARQUET:
+                try:
+                    self._save_parquet(items, user_analytics)
+                    fmt = "parquet"
+                except Exception as e:
+                    log.warn("Warm state not Parquet-compatible, using pickle", tag="WARM", exc=e)
+            try:
+                if fmt == "pickle":
+                    self._save_pickle(items, user_analytics)
+            except Exception as e:
+                log.error("Failed to write warm state", tag="WARM", exc=e)
+                return False
+            save_json(MANIFEST_FILE, {
+                "version": WARM_STATE_VERSION,
+                "format": fmt,
+                "saved_at": time.time(),
+                "delta_link": delta_link,
+                "count": len(items),
+            })
+        log.debug(f"Warm state saved: {len(items)} item(s) as {fmt} in {(time.perf_counter() - started) * 1000:.0f} ms", tag="WARM")
+        return True
+
+    # ----------------------------
+    # Load
+    # ----------------------------
+    @staticmethod
+    def stamp():
+        """saved_at of the state on disk (None if there is none); cheap, reads only the manifest."""
+        manifest = load_json(MANIFEST_FILE)
+        return manifest.get("saved_at") if manifest else None
+
+    @staticmethod
+    def _load_parquet():
+        items = [
+            {k: v for k, v in row.items() if not _is_missing(v)}
+            for row in pd.read_parquet(cache_path(ITEMS_PARQUET)).to_dict("records")
+        ]
+        return items, pd.read_parquet(cache_path(ANALYTICS_PARQUET))
+
+    @staticmethod
+    def _load_pickle():
+        with open(cache_path(PICKLE_FILE), "rb") as f:
+            payload = pickle.load(f)
+        return payload["items"], payload["user_analytics"]
+
+    def load(self):
+        """The saved state, or None when there is nothing usable to resume from."""
+        manifest = load_json(MANIFEST_FILE)
+        if not manifest or manifest.get("version") != WARM_STATE_VERSION or not manifest.get("delta_link"):
+            return None
+        age = time.time() - manifest.get("saved_at", 0)
+        if age > self.max_age:
+            log.info(f"Warm state is {age / 3600:.1f} h old, ignoring it", tag="WARM")
+            return None
+        if manifest.get("format") == "parquet" and not HAS_PARQUET:
+            return None
+
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                items, user_analytics = self._load_parquet() if manifest["format"] == "parquet" else self._load_pickle()
+        except Exception as e:
+            log.warn("Ignoring unreadable warm state", tag="WARM", exc=e)
+            return None
+        log.info(f"Warm state loaded: {len(items)} item(s) in {(time.perf_counter() - started) * 1000:.0f} ms", tag="WARM")
+        return WarmSnapshot(items, manifest["delta_link"], user_analytics, manifest["saved_at"])
+
+
+warm_state = WarmState()
@@ -1,4 +1,5 @@
 import requests
+import http_client
 import pandas as pd
 import os
 import json
@@ -38,7 +39,7 @@ def get_access_token():
         "client_secret": CLIENT_SECRET,
         "grant_type": "refresh_token"
     }
-    response = requests.post(url, params=params)
+    response = http_client.post(url, params=params)
     data = response.json()
 
     if "access_token" in data:
@@ -65,7 +66,7 @@ def fetch_data_paginated(endpoint, key):
         url = f"{BASE_URL}/{endpoint}?organization_id={ORGANIZATION_ID}&page={page}&per_page=200"
         headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
         
-        response = requests.get(url, headers=headers).json()
+        response = http_client.get(url, headers=headers).json()
         records = response.get(key, [])
         all_records.extend(records)
         
@@ -88,14 +89,14 @@ def get_specific_quote(estimate_id):
     access_token = get_access_token()
     url = f"{BASE_URL}/estimates/{estimate_id}?organization_id={ORGANIZATION_ID}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     return response.json().get("estimate")
 
 def get_specific_purchase_order(purchaseorder_id):
     access_token = get_access_token()
     url = f"{BASE_URL}/purchaseorders/{purchaseorder_id}?organization_id={ORGANIZATION_ID}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     return response.json().get("purchaseorder")
 
 def fetch_all_quotes_everything():
@@ -237,7 +238,7 @@ def fetch_data(endpoint, key):
     access_token = get_access_token()
     url = f"{BASE_URL}/{endpoint}?organization_id={ORGANIZATION_ID}"
     headers = {"Authorization": f"Zoho-oauthtoken {access_token}"}
-    response = requests.get(url, headers=headers)
+    response = http_client.get(url, headers=headers)
     data = response.json()
     return data.get(key, [])
 